@@ -1,50 +1,349 @@
+from datetime import timedelta
 from django.contrib import admin
-from .models import Area, Enquete, Pergunta, Opcao, Aluno, Resposta, MultiplaEscolhaResposta
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Min, QuerySet
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .models import Area, Tecnologia, Enquete, Pergunta, Opcao, Aluno, Resposta, MultiplaEscolhaResposta, Submissao, ArquivoRespostas
+from . import busca
 
-class OpcaoInline(admin.TabularInline):  
+# Acima deste número de linhas, o changelist sem filtros mostra uma contagem estimada
+LIMIAR_CONTAGEM_ESTIMADA = 100000
+
+
+def estimar_linhas(model):
+    """Estimativa barata do total de linhas da tabela, sem COUNT(*). Retorna None se indisponível."""
+    tabela = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [tabela])
+        elif connection.vendor == 'mysql':
+            cursor.execute("SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s", [tabela])
+        elif connection.vendor == 'sqlite':
+            # MAX(rowid) é lido direto da árvore da tabela; superestima só quando há linhas apagadas
+            cursor.execute(f'SELECT MAX(rowid) FROM "{tabela}"')
+        else:
+            return None
+        linha = cursor.fetchone()
+    if not linha or linha[0] is None or linha[0] < 0:
+        return None
+    return int(linha[0])
+
+
+# Respostas mais recentes lidas para estimar a proporção de grupos de múltipla escolha
+AMOSTRA_MULTIPLA_ESCOLHA = 1000
+
+
+class PaginadorEstimado(Paginator):
+    def sem_filtros(self):
+        return not self.object_list.query.where
+
+    def estimar(self):
+        return estimar_linhas(self.object_list.model)
+
+    @cached_property
+    def count(self):
+        if self.sem_filtros():
+            estimativa = self.estimar()
+            if estimativa is not None and estimativa > LIMIAR_CONTAGEM_ESTIMADA:
+                return estimativa
+        return super().count
+
+
+class PaginadorMultiplaEscolha(PaginadorEstimado):
+    """
+    O manager de MultiplaEscolhaResposta sempre filtra a primeira linha de cada
+    (submissao, pergunta), com um GROUP BY na tabela de respostas inteira. Sem filtros do
+    admin além desse, o total é estimado: linhas da tabela vezes a proporção de grupos de
+    múltipla escolha entre as respostas mais recentes (busca pela chave primária).
+    """
+
+    def sem_filtros(self):
+        filtros_do_manager = MultiplaEscolhaResposta.objects.all().query.where.children
+        return len(self.object_list.query.where.children) <= len(filtros_do_manager)
+
+    def estimar(self):
+        total = estimar_linhas(Resposta)
+        if total is None:
+            return None
+        amostra = list(
+            Resposta.objects.order_by('-id').values_list('submissao_id', 'pergunta_id', 'pergunta__tipo')[:AMOSTRA_MULTIPLA_ESCOLHA]
+        )
+        if not amostra:
+            return 0
+        grupos = {(submissao_id, pergunta_id) for submissao_id, pergunta_id, tipo in amostra if tipo == Pergunta.MULTIPLA_ESCOLHA}
+        return round(total * len(grupos) / len(amostra))
+
+
+class DatasIndexadasQuerySet(QuerySet):
+    """
+    O date_hierarchy do admin lista anos/meses/dias com SELECT DISTINCT sobre a tabela inteira.
+    Aqui cada data distinta é encontrada com um MIN(campo) WHERE campo >= limite, que usa o
+    índice de data_resposta: no máximo 31 buscas pelo índice em vez de varrer a tabela.
+    """
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if kind not in ('year', 'month', 'day') or order != 'ASC' or tzinfo is not None:
+            return super().datetimes(field_name, kind, order, tzinfo)
+        datas = []
+        atual = self.aggregate(primeira=Min(field_name))['primeira']
+        while atual is not None:
+            inicio = timezone.localtime(atual).replace(hour=0, minute=0, second=0, microsecond=0)
+            if kind == 'day':
+                proximo = inicio + timedelta(days=1)
+            elif kind == 'month':
+                inicio = inicio.replace(day=1)
+                proximo = (inicio + timedelta(days=32)).replace(day=1)
+            else:
+                inicio = inicio.replace(month=1, day=1)
+                proximo = inicio.replace(year=inicio.year + 1)
+            datas.append(inicio)
+            proximo = timezone.make_aware(proximo.replace(tzinfo=None))
+            atual = self.filter(**{f'{field_name}__gte': proximo}).aggregate(primeira=Min(field_name))['primeira']
+        return datas
+
+
+class TabelaGrandeAdmin(admin.ModelAdmin):
+    """Changelist para tabelas muito grandes: contagem estimada e sem o COUNT(*) total extra."""
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return DatasIndexadasQuerySet(model=queryset.model, query=queryset.query.chain(), using=queryset.db)
+
+
+class FiltroDataResposta(admin.SimpleListFilter):
+    title = 'data da resposta'
+    parameter_name = 'periodo'
+
+    def lookups(self, request, model_admin):
+        return [('hoje', 'Hoje'), ('7d', 'Últimos 7 dias'), ('30d', 'Últimos 30 dias')]
+
+    def queryset(self, request, queryset):
+        dias = {'hoje': 0, '7d': 7, '30d': 30}.get(self.value())
+        if dias is None:
+            return queryset
+        inicio = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=dias)
+        return queryset.filter(data_resposta__gte=inicio)
+
+
+class FiltroEnqueteAtiva(admin.SimpleListFilter):
+    """Lista só as enquetes ativas, em vez de todas as enquetes cadastradas."""
+    title = 'enquete'
+    parameter_name = 'enquete'
+    campo = 'enquete'
+
+    def lookups(self, request, model_admin):
+        return list(Enquete.objects.filter(ativa=True).order_by('titulo').values_list('id', 'titulo'))
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{f'{self.campo}_id': self.value()})
+        return queryset
+
+
+class FiltroEnqueteDaPergunta(FiltroEnqueteAtiva):
+    campo = 'pergunta__enquete'
+
+
+class FiltroPorId(admin.SimpleListFilter):
+    """
+    Filtro por um único objeto relacionado (?aluno=<id>, ?pergunta=<id>), usado pelos links
+    das listagens de alunos e perguntas. Só o objeto selecionado é carregado na barra lateral.
+    """
+    modelo = None
+
+    def lookups(self, request, model_admin):
+        if self.value():
+            objeto = self.modelo.objects.filter(pk=self.value()).first()
+            if objeto is not None:
+                return [(str(objeto.pk), str(objeto))]
+        return []
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{f'{self.parameter_name}_id': self.value()})
+        return queryset
+
+
+class FiltroAluno(FiltroPorId):
+    title = 'aluno'
+    parameter_name = 'aluno'
+    modelo = Aluno
+
+
+class FiltroPergunta(FiltroPorId):
+    title = 'pergunta'
+    parameter_name = 'pergunta'
+    modelo = Pergunta
+
+
+class OpcaoInline(admin.TabularInline):
     model = Opcao
-    extra = 3  
+    extra = 3
 
 class PerguntaAdmin(admin.ModelAdmin):
     inlines = [OpcaoInline]
-    list_display = ('texto', 'tipo', 'enquete', 'ativa')
-    list_filter = ('enquete', 'tipo', 'ativa')
+    list_display = ('texto', 'tipo', 'enquete', 'ativa', 'link_respostas')
+    list_filter = (FiltroEnqueteAtiva, 'tipo', 'ativa')
+    list_select_related = ('enquete',)
     search_fields = ('texto',)
+    autocomplete_fields = ('enquete', 'tecnologia')
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Usa o índice FTS (sem acentos) em vez de LIKE '%termo%' na tabela toda
+        if search_term and busca.disponivel():
+            return busca.filtrar_perguntas(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
+    @admin.display(description='Respostas')
+    def link_respostas(self, obj):
+        if obj.tipo == Pergunta.MULTIPLA_ESCOLHA:
+            url = reverse('admin:enquete_multiplaescolharesposta_changelist')
+        else:
+            url = reverse('admin:enquete_resposta_changelist')
+        return format_html('<a href="{}?pergunta={}">ver respostas</a>', url, obj.pk)
 
 class EnqueteAdmin(admin.ModelAdmin):
     list_display = ('titulo', 'area', 'data_criacao', 'ativa')
     list_filter = ('area', 'ativa')
+    list_select_related = ('area',)
     search_fields = ('titulo', 'descricao')
     date_hierarchy = 'data_criacao'
-    filter_horizontal = ('tecnologias',)  
+    filter_horizontal = ('tecnologias',)
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term and busca.disponivel():
+            return busca.filtrar_enquetes(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
 
 class AreaAdmin(admin.ModelAdmin):
-    list_display = ('nome', 'descricao')
+    list_display = ('nome', 'descricao', 'num_enquetes', 'num_enquetes_ativas')
     search_fields = ('nome',)
     prepopulated_fields = {'slug': ('nome',)}
 
+class TecnologiaAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'descricao')
+    search_fields = ('nome',)
+
+class OpcaoAdmin(admin.ModelAdmin):
+    list_display = ('texto', 'pergunta', 'ativa', 'ordem', 'peso')
+    list_filter = ('ativa',)
+    list_select_related = ('pergunta',)
+    search_fields = ('texto',)
+    autocomplete_fields = ('pergunta',)
+    show_full_result_count = False
+
 class AlunoAdmin(admin.ModelAdmin):
-    list_display = ('nome', 'email', 'data_inscricao', 'nivel')
+    list_display = ('nome', 'email', 'data_inscricao', 'nivel', 'link_respostas')
     list_filter = ('nivel',)
     search_fields = ('nome', 'email')
     filter_horizontal = ('tecnologias_interesse',)
+    autocomplete_fields = ('user',)
+    show_full_result_count = False
+
+    @admin.display(description='Respostas')
+    def link_respostas(self, obj):
+        return format_html(
+            '<a href="{}?aluno={}">única</a> · <a href="{}?aluno={}">múltipla</a>',
+            reverse('admin:enquete_resposta_changelist'), obj.pk,
+            reverse('admin:enquete_multiplaescolharesposta_changelist'), obj.pk,
+        )
 
-class RespostaAdmin(admin.ModelAdmin):
+class RespostaAdmin(TabelaGrandeAdmin):
     list_display = ('aluno', 'pergunta', 'opcao', 'data_resposta')
-    list_filter = ('pergunta', 'aluno')
+    list_filter = (FiltroDataResposta, FiltroEnqueteDaPergunta, FiltroPergunta, FiltroAluno)
+    list_select_related = ('aluno', 'pergunta', 'opcao')
+    autocomplete_fields = ('aluno', 'pergunta', 'opcao')
+    raw_id_fields = ('submissao',)
     date_hierarchy = 'data_resposta'
 
-class MultiplaEscolhaRespostaAdmin(admin.ModelAdmin):
-    list_display = ('aluno', 'pergunta', 'data_resposta')
-    list_filter = ('pergunta', 'aluno')
+class ChangeListMultiplaEscolha(ChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        # Opções de todas as linhas da página em uma consulta, em vez de uma por linha
+        MultiplaEscolhaResposta.carregar_opcoes(self.result_list)
+
+
+class MultiplaEscolhaRespostaAdmin(TabelaGrandeAdmin):
+    """Visão agrupada (uma linha por aluno/pergunta) das respostas de múltipla escolha; somente leitura."""
+    list_display = ('aluno', 'pergunta', 'opcoes_escolhidas', 'data_resposta')
+    list_filter = (FiltroDataResposta, FiltroEnqueteDaPergunta, FiltroPergunta, FiltroAluno)
+    list_select_related = ('aluno', 'pergunta')
+    fields = ('aluno', 'pergunta', 'opcoes_escolhidas', 'data_resposta')
+    readonly_fields = fields
     date_hierarchy = 'data_resposta'
-    filter_horizontal = ('opcoes',)
+    paginator = PaginadorMultiplaEscolha
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListMultiplaEscolha
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def delete_queryset(self, request, queryset):
+        # Apaga as respostas agrupadas inteiras (todas as opções marcadas), não só a linha exibida
+        MultiplaEscolhaResposta.objects.filter(pk__in=queryset.values('pk')).delete()
+
+    @admin.display(description='Opções')
+    def opcoes_escolhidas(self, obj):
+        return ', '.join(opcao.texto for opcao in obj.opcoes)
+
+class RespostaSubmissaoInline(admin.TabularInline):
+    model = Resposta
+    fields = ('pergunta', 'opcao', 'data_resposta')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('pergunta', 'opcao')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+class SubmissaoAdmin(TabelaGrandeAdmin):
+    list_display = ('id', 'aluno', 'enquete', 'origem', 'pontos', 'criada_em', 'atualizada_em')
+    list_filter = ('origem', FiltroEnqueteAtiva, FiltroAluno)
+    list_select_related = ('aluno', 'enquete')
+    fields = ('aluno', 'enquete', 'origem', 'pontos', 'criada_em', 'atualizada_em')
+    readonly_fields = fields
+    inlines = [RespostaSubmissaoInline]
+
+    def has_add_permission(self, request):
+        return False
+
+class ArquivoRespostasAdmin(admin.ModelAdmin):
+    list_display = ('enquete', 'arquivo', 'linhas', 'tamanho_bytes', 'atualizado_em')
+    list_select_related = ('enquete',)
+    readonly_fields = (
+        'enquete', 'arquivo', 'linhas', 'tamanho_bytes', 'primeira_resposta', 'ultima_resposta', 'atualizado_em',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Apagar o registro apaga o arquivo, que é a única cópia das respostas arquivadas
+        return False
 
 
 admin.site.register(Area, AreaAdmin)
+admin.site.register(Tecnologia, TecnologiaAdmin)
 admin.site.register(Enquete, EnqueteAdmin)
 admin.site.register(Pergunta, PerguntaAdmin)
-admin.site.register(Opcao)  
+admin.site.register(Opcao, OpcaoAdmin)
 admin.site.register(Aluno, AlunoAdmin)
 admin.site.register(Resposta, RespostaAdmin)
-admin.site.register(MultiplaEscolhaResposta, MultiplaEscolhaRespostaAdmin)
\ No newline at end of file
+admin.site.register(MultiplaEscolhaResposta, MultiplaEscolhaRespostaAdmin)
+admin.site.register(Submissao, SubmissaoAdmin)
+admin.site.register(ArquivoRespostas, ArquivoRespostasAdmin)
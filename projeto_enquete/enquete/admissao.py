@@ -0,0 +1,147 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+
+# Valores padrão; podem ser sobrescritos pela configuração ADMISSAO em settings.py
+CONFIGURACAO_PADRAO = {
+    # Número máximo de requisições de escrita processadas ao mesmo tempo neste processo
+    'MAX_ESCRITAS_SIMULTANEAS': 4,
+    # Tempo (em segundos) que uma escrita espera por uma vaga antes de ser recusada com 503
+    'ESPERA_MAXIMA': 0.05,
+    # Balde de tokens por cliente: reposição (tokens por segundo) e capacidade (rajada)
+    'TAXA_POR_CLIENTE': 0.5,
+    'RAJADA_POR_CLIENTE': 5,
+    # Quantidade máxima de clientes mantidos em memória (os menos recentes são descartados)
+    'MAX_CLIENTES': 10000,
+    # Retry-After sugerido quando o limite global está saturado
+    'RETRY_AFTER_SATURADO': 1,
+}
+
+
+class Rejeitada(Exception):
+    def __init__(self, status_code, retry_after, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class BaldeTokens:
+    __slots__ = ('tokens', 'atualizado_em')
+
+    def __init__(self, capacidade, agora):
+        self.tokens = float(capacidade)
+        self.atualizado_em = agora
+
+
+class ControladorAdmissao:
+    """
+    Controle de admissão para endpoints de escrita, local a cada processo.
+
+    Combina um limite global de escritas simultâneas (recusa rápida com 503) com um
+    balde de tokens por cliente (recusa com 429), ambos com o cabeçalho Retry-After.
+    """
+
+    def __init__(self, **configuracao):
+        self.configuracao = {**CONFIGURACAO_PADRAO, **configuracao}
+        self.vagas = threading.BoundedSemaphore(self.configuracao['MAX_ESCRITAS_SIMULTANEAS'])
+        self.baldes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def consumir_token(self, cliente):
+        taxa = self.configuracao['TAXA_POR_CLIENTE']
+        capacidade = self.configuracao['RAJADA_POR_CLIENTE']
+        agora = time.monotonic()
+
+        with self.lock:
+            balde = self.baldes.get(cliente)
+            if balde is None:
+                balde = BaldeTokens(capacidade, agora)
+                self.baldes[cliente] = balde
+                if len(self.baldes) > self.configuracao['MAX_CLIENTES']:
+                    self.baldes.popitem(last=False)
+            else:
+                self.baldes.move_to_end(cliente)
+                balde.tokens = min(capacidade, balde.tokens + (agora - balde.atualizado_em) * taxa)
+                balde.atualizado_em = agora
+
+            if balde.tokens < 1:
+                retry_after = math.ceil((1 - balde.tokens) / taxa) if taxa > 0 else 60
+                raise Rejeitada(429, retry_after, "Muitas requisições. Tente novamente em instantes.")
+            balde.tokens -= 1
+
+    def devolver_token(self, cliente):
+        with self.lock:
+            balde = self.baldes.get(cliente)
+            if balde is not None:
+                balde.tokens = min(self.configuracao['RAJADA_POR_CLIENTE'], balde.tokens + 1)
+
+    def entrar(self, cliente):
+        self.consumir_token(cliente)
+        if not self.vagas.acquire(timeout=self.configuracao['ESPERA_MAXIMA']):
+            # A requisição não foi processada: o 503 não conta contra o limite do cliente,
+            # senão quem tenta de novo depois da saturação leva 429
+            self.devolver_token(cliente)
+            raise Rejeitada(
+                503,
+                self.configuracao['RETRY_AFTER_SATURADO'],
+                "Servidor ocupado processando outras respostas. Tente novamente em instantes.",
+            )
+
+    def sair(self):
+        self.vagas.release()
+
+    @contextmanager
+    def admitir(self, cliente):
+        self.entrar(cliente)
+        try:
+            yield
+        finally:
+            self.sair()
+
+
+_controlador = None
+_controlador_lock = threading.Lock()
+
+
+def obter_controlador():
+    global _controlador
+    if _controlador is None:
+        with _controlador_lock:
+            if _controlador is None:
+                _controlador = ControladorAdmissao(**getattr(settings, 'ADMISSAO', {}))
+    return _controlador
+
+
+def identificar_cliente(request):
+    """Usuário autenticado quando houver; caso contrário, o IP de origem."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def limitar_escritas(view_func):
+    """
+    Decorator para views Django (funções ou métodos de ViewSet do DRF).
+    Apenas métodos que alteram dados passam pelo controle de admissão.
+    """
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if hasattr(arg, 'META'))
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return view_func(*args, **kwargs)
+        try:
+            with obter_controlador().admitir(identificar_cliente(request)):
+                return view_func(*args, **kwargs)
+        except Rejeitada as e:
+            response = JsonResponse({"detail": e.detail}, status=e.status_code)
+            response['Retry-After'] = str(e.retry_after)
+            return response
+    return wrapper
@@ -1,6 +1,46 @@
 from rest_framework import serializers
-from enquete.models import Area, Tecnologia, Enquete, Pergunta, Opcao, Aluno, Resposta, MultiplaEscolhaResposta
+from enquete.models import Area, Tecnologia, Enquete, Pergunta, Opcao, Aluno, Resposta, MultiplaEscolhaResposta, Submissao
 from django.contrib.auth.models import User
+from enquete import autoria
+
+class CamposDinamicosMixin:
+    """
+    Representação esparsa controlada por ?fields= e ?expand= (ver CamposDinamicosViewMixin).
+
+    Sem esses parâmetros a saída é a completa de sempre. Com eles, só os campos pedidos em
+    `fields` são devolvidos e as relações em `relacoes_expansiveis` só aparecem aninhadas
+    quando estão em `expand` (ou em `fields`); caso contrário viram o id (ForeignKey) ou são
+    omitidas. Expansões aninhadas usam ponto: ?expand=perguntas,perguntas.opcoes
+    """
+    # nome do campo aninhado -> campo usado quando não expandido (None = omitir)
+    relacoes_expansiveis = {}
+
+    def __init__(self, *args, esparso=None, **kwargs):
+        # esparso = (campos, expandir): conjuntos de nomes; campos vazio = todos os campos simples
+        self.esparso = esparso
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.esparso is None:
+            return fields
+        campos, expandir = self.esparso
+        for nome in list(fields):
+            if campos and nome not in campos:
+                del fields[nome]
+                continue
+            if nome not in self.relacoes_expansiveis:
+                continue
+            if nome in expandir or nome in campos:
+                aninhado = getattr(fields[nome], 'child', fields[nome])
+                if isinstance(aninhado, CamposDinamicosMixin):
+                    prefixo = f'{nome}.'
+                    aninhado.esparso = (set(), {caminho[len(prefixo):] for caminho in expandir if caminho.startswith(prefixo)})
+            elif self.relacoes_expansiveis[nome] is None:
+                del fields[nome]
+            else:
+                fields[nome] = self.relacoes_expansiveis[nome]()
+        return fields
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,41 +52,98 @@ class AlunoSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Aluno
-        fields = ['id', 'user', 'nome', 'data_nascimento', 'cpf', 'telefone']
+        fields = ['id', 'user', 'nome', 'email', 'nivel', 'data_inscricao', 'tecnologias_interesse']
 
-class AreaSerializer(serializers.ModelSerializer):
+class AreaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Area
         fields = ['id', 'nome', 'descricao', 'slug', 'total_enquetes', 'enquetes_ativas']
 
-class TecnologiaSerializer(serializers.ModelSerializer):
+class TecnologiaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Tecnologia
         fields = ['id', 'nome', 'descricao', 'total_perguntas']
 
-class OpcaoSerializer(serializers.ModelSerializer):
+class OpcaoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Opcao
         fields = ['id', 'texto', 'ativa', 'ordem', 'peso', 'pergunta']
         read_only_fields = ['pergunta'] 
 
-class PerguntaSerializer(serializers.ModelSerializer):
+class PerguntaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     opcoes = OpcaoSerializer(many=True, read_only=True, source='opcao_set') 
 
+    relacoes_expansiveis = {'opcoes': None}
+
     class Meta:
         model = Pergunta
         fields = ['id', 'texto', 'tipo', 'ativa', 'tecnologia', 'enquete', 'opcoes', 'total_opcoes', 'opcoes_ativas']
         read_only_fields = ['enquete'] 
 
-class EnqueteSerializer(serializers.ModelSerializer):
+class EnqueteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     perguntas = PerguntaSerializer(many=True, read_only=True, source='perguntas.all') 
     area = AreaSerializer(read_only=True)
     tecnologias = TecnologiaSerializer(many=True, read_only=True)
 
+    relacoes_expansiveis = {
+        'perguntas': None,
+        'tecnologias': None,
+        # Sem expansão a área vira o id, lido da própria linha da enquete (sem JOIN)
+        'area': lambda: serializers.IntegerField(source='area_id', read_only=True),
+    }
+
     class Meta:
         model = Enquete
         fields = ['id', 'titulo', 'descricao', 'ativa', 'data_criacao', 'data_expiracao', 'area', 'tecnologias', 'total_perguntas', 'perguntas_ativas', 'perguntas']
 
+class OpcaoAutoriaSerializer(serializers.Serializer):
+    texto = serializers.CharField(max_length=255)
+    ativa = serializers.BooleanField(default=True)
+    ordem = serializers.IntegerField(required=False)  # padrão: posição na lista
+    peso = serializers.IntegerField(default=1)
+
+class PerguntaAutoriaSerializer(serializers.Serializer):
+    texto = serializers.CharField()
+    tipo = serializers.ChoiceField(choices=Pergunta.TIPO_CHOICES)
+    ativa = serializers.BooleanField(default=True)
+    tecnologia = serializers.IntegerField(required=False, allow_null=True)
+    opcoes = OpcaoAutoriaSerializer(many=True, allow_empty=False, max_length=autoria.LIMITE_OPCOES)
+
+class PerguntasEmLoteSerializer(serializers.Serializer):
+    """
+    Lote de perguntas com opções, validado todo em memória (ver enquete/autoria.py). As
+    tecnologias referenciadas são conferidas em uma única consulta, em vez de uma por
+    pergunta como faria um PrimaryKeyRelatedField.
+    """
+    perguntas = PerguntaAutoriaSerializer(many=True, allow_empty=False, max_length=autoria.LIMITE_PERGUNTAS)
+
+    def tecnologias_referenciadas(self, dados):
+        return {pergunta['tecnologia'] for pergunta in dados['perguntas'] if pergunta.get('tecnologia') is not None}
+
+    def validate(self, dados):
+        ids = self.tecnologias_referenciadas(dados)
+        inexistentes = ids - set(Tecnologia.objects.filter(id__in=ids).values_list('id', flat=True))
+        if inexistentes:
+            raise serializers.ValidationError({'tecnologias': f"Tecnologias inexistentes: {sorted(inexistentes)}."})
+        return dados
+
+class EnqueteAutoriaSerializer(PerguntasEmLoteSerializer):
+    """Enquete completa: dados da enquete, perguntas e opções em um só corpo."""
+    titulo = serializers.CharField(max_length=200)
+    descricao = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    ativa = serializers.BooleanField(default=True)
+    data_expiracao = serializers.DateTimeField(required=False, allow_null=True)
+    area = serializers.IntegerField()
+    tecnologias = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def tecnologias_referenciadas(self, dados):
+        return super().tecnologias_referenciadas(dados) | set(dados.get('tecnologias', []))
+
+    def validate_area(self, valor):
+        if not Area.objects.filter(id=valor).exists():
+            raise serializers.ValidationError("Área inexistente.")
+        return valor
+
 class RespostaSerializer(serializers.ModelSerializer):
     aluno = AlunoSerializer(read_only=True)
     pergunta = PerguntaSerializer(read_only=True)
@@ -65,4 +162,27 @@ class MultiplaEscolhaRespostaSerializer(serializers.ModelSerializer):
     class Meta:
         model = MultiplaEscolhaResposta
         fields = ['id', 'aluno', 'pergunta', 'opcoes', 'data_resposta']
-        read_only_fields = ['pergunta', 'opcoes', 'aluno'] 
\ No newline at end of file
+        read_only_fields = ['pergunta', 'opcoes', 'aluno'] 
+
+class SubmissaoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Submissao
+        fields = ['id', 'aluno', 'enquete', 'origem', 'pontos', 'criada_em', 'atualizada_em']
+        read_only_fields = fields
+
+class SubmissaoDetalheSerializer(SubmissaoSerializer):
+    """Submissão com as respostas agrupadas por pergunta; recebe `respostas` no contexto."""
+    respostas = serializers.SerializerMethodField()
+
+    class Meta(SubmissaoSerializer.Meta):
+        fields = SubmissaoSerializer.Meta.fields + ['respostas']
+
+    def get_respostas(self, obj):
+        return [
+            {
+                'pergunta_id': pergunta.id,
+                'pergunta': pergunta.texto,
+                'opcoes': [{'id': opcao.id, 'texto': opcao.texto} for opcao in opcoes],
+            }
+            for pergunta, opcoes in self.context.get('respostas', [])
+        ]
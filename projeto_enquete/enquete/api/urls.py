@@ -13,6 +13,7 @@ router.register(r'opcoes', views.OpcaoViewSet)
 router.register(r'alunos', views.AlunoViewSet)
 router.register(r'respostas-unica-escolha', views.RespostaViewSet)
 router.register(r'respostas-multipla-escolha', views.MultiplaEscolhaRespostaViewSet)
+router.register(r'submissoes', views.SubmissaoViewSet)
 router.register(r'users', views.UserViewSet)
 
 
@@ -1,16 +1,104 @@
-from rest_framework import viewsets, status
+from rest_framework import serializers, viewsets, status
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, AllowAny
-from enquete.models import Area, Tecnologia, Enquete, Pergunta, Opcao, Aluno, Resposta, MultiplaEscolhaResposta, User
+from enquete.models import Area, Tecnologia, Enquete, Pergunta, Opcao, Aluno, Resposta, MultiplaEscolhaResposta, Submissao, Pontuacao, User
 from .serializers import (
     AreaSerializer, TecnologiaSerializer, EnqueteSerializer, PerguntaSerializer,
     OpcaoSerializer, AlunoSerializer, RespostaSerializer, MultiplaEscolhaRespostaSerializer,
-    UserSerializer
+    UserSerializer, SubmissaoSerializer, SubmissaoDetalheSerializer, CamposDinamicosMixin,
+    EnqueteAutoriaSerializer, PerguntasEmLoteSerializer
 )
 from django.db import IntegrityError
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from enquete import autoria, busca, historico, idempotencia, pontuacao, recomendacoes, serializacao, series
+from enquete.admissao import limitar_escritas
+from enquete.respostas import carregar_submissao, gravar_respostas
+
+class CamposDinamicosViewMixin:
+    """
+    Lê ?fields= e ?expand= e repassa ao serializer (CamposDinamicosMixin). As relações só
+    são carregadas (select_related/prefetch_related) quando vão ser serializadas: sem
+    expansão, uma listagem custa uma única consulta.
+    """
+    # caminho de expansão -> (método do queryset, lookup)
+    relacoes_consulta = {}
+
+    def parametros_esparsos(self):
+        if not hasattr(self, '_esparso'):
+            params = self.request.query_params
+            self._esparso = serializacao.ler_esparso(params.get('fields'), params.get('expand'))
+        return self._esparso
+
+    def _carregar_relacao(self, caminho):
+        esparso = self.parametros_esparsos()
+        if esparso is None:
+            return True
+        campos, expandir = esparso
+        raiz = caminho.split('.')[0]
+        if campos and raiz not in campos:
+            return False
+        return caminho in expandir or (caminho == raiz and raiz in campos)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve', 'batch'):
+            for caminho, (metodo, lookup) in self.relacoes_consulta.items():
+                if self._carregar_relacao(caminho):
+                    queryset = getattr(queryset, metodo)(lookup)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        esparso = self.parametros_esparsos()
+        if esparso is not None and issubclass(self.get_serializer_class(), CamposDinamicosMixin):
+            kwargs.setdefault('esparso', esparso)
+        return super().get_serializer(*args, **kwargs)
+
+class RankingViewMixin:
+    """
+    GET <objeto>/ranking/: alunos pela pontuação no escopo (ver pontuacao.py), paginados
+    por cursor: ?cursor=<proximo_cursor>&limite=<1..200>. Traz nome e pontos dos alunos,
+    então exige autenticação, como a lista de alunos.
+    """
+    escopo_ranking = None
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def ranking(self, request, pk=None):
+        objeto = self.get_object()
+        try:
+            pagina = pontuacao.pagina_ranking(
+                self.escopo_ranking, objeto.pk,
+                request.query_params.get('cursor'), historico.limitar(request.query_params.get('limite')),
+            )
+        except historico.CursorInvalido as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        proximo_cursor = pagina.pop('proximo_cursor')
+        pagina['next'] = (
+            replace_query_param(request.build_absolute_uri(), 'cursor', proximo_cursor) if proximo_cursor else None
+        )
+        return Response(pagina)
+
+class SerieRespostasViewMixin:
+    """
+    GET <objeto>/respostas-por-periodo/: respostas e respondentes por período (ver series.py).
+    ?granularidade=hora|dia|semana (padrão: dia)&inicio=AAAA-MM-DD&fim=AAAA-MM-DD.
+    """
+    # Filtro de RespostasPorHora pelo objeto da URL
+    campo_serie = None
+
+    @action(detail=True, methods=['get'], url_path='respostas-por-periodo')
+    def respostas_por_periodo(self, request, pk=None):
+        objeto = self.get_object()
+        granularidade = request.query_params.get('granularidade', series.GRANULARIDADE_PADRAO)
+        try:
+            inicio, fim = series.ler_periodo(request.query_params.get('inicio'), request.query_params.get('fim'))
+            pontos = series.serie({self.campo_serie: objeto.pk}, granularidade, inicio, fim)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'granularidade': granularidade, 'results': pontos})
 
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
@@ -27,6 +115,46 @@ class AlunoViewSet(viewsets.ModelViewSet):
             return Aluno.objects.all()
         return Aluno.objects.filter(user=self.request.user) # Usuário só vê o próprio perfil de aluno
 
+    def get_object(self):
+        # /alunos/me/... resolve para o perfil de aluno do usuário logado
+        if self.kwargs.get('pk') == 'me':
+            aluno = Aluno.objects.filter(user=self.request.user).first()
+            if aluno is None:
+                raise NotFound("Usuário sem perfil de aluno.")
+            return aluno
+        return super().get_object()
+
+    @action(detail=True, methods=['get'])
+    def historico(self, request, pk=None):
+        """
+        Histórico plano das respostas do aluno, da mais recente para a mais antiga.
+        Paginação por cursor: ?cursor=<proximo_cursor>&limite=<1..200>. Enquetes, perguntas
+        e opções aparecem uma vez por página, indexadas por id. Respostas de enquetes
+        arquivadas entram na ordem, com "arquivada": true e "id": null.
+        """
+        aluno = self.get_object()
+        try:
+            pagina = historico.pagina_historico(
+                aluno.id, request.query_params.get('cursor'), historico.limitar(request.query_params.get('limite'))
+            )
+        except historico.CursorInvalido as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        proximo_cursor = pagina.pop('proximo_cursor')
+        pagina['next'] = (
+            replace_query_param(request.build_absolute_uri(), 'cursor', proximo_cursor) if proximo_cursor else None
+        )
+        return Response(pagina)
+
+    @action(detail=True, methods=['get'])
+    def recomendacoes(self, request, pk=None):
+        """
+        Enquetes ativas ainda não respondidas, ordenadas por quantas tecnologias de interesse
+        do aluno cobrem (ver recomendacoes.py). ?limite=<1..20>.
+        """
+        aluno = self.get_object()
+        limite = min(historico.limitar(request.query_params.get('limite')), recomendacoes.LIMITE_RECOMENDACOES)
+        return Response({'results': recomendacoes.enquetes_recomendadas(aluno, limite)})
+
     def perform_create(self, serializer):
         # Garante que um aluno seja criado para o usuário logado
         if self.request.user.is_authenticated and not hasattr(self.request.user, 'aluno'):
@@ -34,81 +162,167 @@ class AlunoViewSet(viewsets.ModelViewSet):
         else:
             raise serializers.ValidationError("Este usuário já possui um perfil de aluno ou não está autenticado.")
 
-class AreaViewSet(viewsets.ModelViewSet):
+class AreaViewSet(CamposDinamicosViewMixin, RankingViewMixin, SerieRespostasViewMixin, viewsets.ModelViewSet):
     queryset = Area.objects.all()
     serializer_class = AreaSerializer
     permission_classes = [IsAuthenticatedOrReadOnly] # Permite leitura para não autenticados, escrita para autenticados
+    escopo_ranking = Pontuacao.ESCOPO_AREA
+    campo_serie = 'enquete__area_id'
 
-class TecnologiaViewSet(viewsets.ModelViewSet):
+class TecnologiaViewSet(CamposDinamicosViewMixin, RankingViewMixin, viewsets.ModelViewSet):
     queryset = Tecnologia.objects.all()
     serializer_class = TecnologiaSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    escopo_ranking = Pontuacao.ESCOPO_TECNOLOGIA
 
-class EnqueteViewSet(viewsets.ModelViewSet):
+class EnqueteViewSet(CamposDinamicosViewMixin, RankingViewMixin, SerieRespostasViewMixin, viewsets.ModelViewSet):
     queryset = Enquete.objects.all()
     serializer_class = EnqueteSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    escopo_ranking = Pontuacao.ESCOPO_ENQUETE
+    campo_serie = 'enquete_id'
+    relacoes_consulta = {
+        'area': ('select_related', 'area'),
+        'tecnologias': ('prefetch_related', 'tecnologias'),
+        'perguntas': ('prefetch_related', 'perguntas'),
+        'perguntas.opcoes': ('prefetch_related', 'perguntas__opcao_set'),
+    }
+
+    # Busca textual ranqueada: ?search=termo (título, descrição e texto das perguntas)
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        search = self.request.query_params.get('search')
+        if search and self.action == 'list':
+            queryset = busca.filtrar_enquetes(queryset, search)
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        ?ids=1,2,3: várias enquetes com um único conjunto de consultas (aceita ?fields=/?expand=).
+        Retorna {'resultados': {id: enquete ou null}, 'nao_encontradas': [ids]}.
+        """
+        try:
+            ids = serializacao.ler_ids(request.query_params.get('ids'))
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        enquetes = list(self.get_queryset().filter(id__in=ids))
+        dados = self.get_serializer(enquetes, many=True).data
+        return Response(serializacao.por_id(ids, {enquete.pk: item for enquete, item in zip(enquetes, dados)}))
+
+    @action(detail=False, methods=['post'])
+    @limitar_escritas
+    def completa(self, request):
+        """Cria a enquete com todas as perguntas e opções em uma transação; devolve os ids criados."""
+        serializer = EnqueteAutoriaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(autoria.criar_enquete(serializer.validated_data), status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='perguntas-em-lote')
+    @limitar_escritas
+    def perguntas_em_lote(self, request, pk=None):
+        """Acrescenta um lote de perguntas (com opções) à enquete; devolve os ids criados."""
+        enquete = get_object_or_404(Enquete, pk=pk)
+        serializer = PerguntasEmLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        criadas = autoria.adicionar_perguntas(enquete, serializer.validated_data['perguntas'])
+        return Response({'id': enquete.pk, 'perguntas': criadas}, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'], permission_classes=[AllowAny])
+    @limitar_escritas
     def responder(self, request, pk=None):
         enquete = self.get_object()
-        perguntas = enquete.perguntas.filter(ativa=True).order_by('id')
-        
         aluno = None
         if request.user.is_authenticated:
             try:
                 aluno = request.user.aluno
             except Aluno.DoesNotExist:
                 aluno = Aluno.objects.create(user=request.user, nome=request.user.username)
-        
+
         respostas_data = request.data.get('respostas', [])
-        
-        if not respostas_data:
-            return Response({"detail": "Nenhuma resposta fornecida."}, status=status.HTTP_400_BAD_REQUEST)
-
-        with transaction.atomic():
-            for resposta_item in respostas_data:
-                pergunta_id = resposta_item.get('pergunta_id')
-                opcoes_selecionadas_ids = resposta_item.get('opcoes_ids') # Pode ser int para UE ou list de int para ME
-
-                if not pergunta_id or not opcoes_selecionadas_ids:
-                    return Response({"detail": "Dados de resposta incompletos para uma pergunta."}, status=status.HTTP_400_BAD_REQUEST)
-
-                pergunta = get_object_or_404(Pergunta, id=pergunta_id, enquete=enquete)
-
-                if pergunta.tipo == Pergunta.UNICA_ESCOLHA:
-                    if not isinstance(opcoes_selecionadas_ids, int):
-                        return Response({"detail": f"Resposta inválida para pergunta de única escolha ({pergunta.id}): opções_ids deve ser um inteiro."}, status=status.HTTP_400_BAD_REQUEST)
-                    
-                    opcao = get_object_or_404(Opcao, id=opcoes_selecionadas_ids, pergunta=pergunta)
-                    Resposta.objects.create(
-                        aluno=aluno,
-                        pergunta=pergunta,
-                        opcao=opcao
-                    )
-                elif pergunta.tipo == Pergunta.MULTIPLA_ESCOLHA:
-                    if not isinstance(opcoes_selecionadas_ids, list):
-                        return Response({"detail": f"Resposta inválida para pergunta de múltipla escolha ({pergunta.id}): opções_ids deve ser uma lista de inteiros."}, status=status.HTTP_400_BAD_REQUEST)
-                    
-                    opcoes = Opcao.objects.filter(id__in=opcoes_selecionadas_ids, pergunta=pergunta)
-                    if len(opcoes) != len(opcoes_selecionadas_ids):
-                        return Response({"detail": f"Uma ou mais opções selecionadas para a pergunta {pergunta.id} são inválidas."}, status=status.HTTP_400_BAD_REQUEST)
-                    
-                    multipla_resposta = MultiplaEscolhaResposta.objects.create(
-                        aluno=aluno,
-                        pergunta=pergunta
-                    )
-                    multipla_resposta.opcoes.set(opcoes)
-                else:
-                    return Response({"detail": f"Tipo de pergunta desconhecido ou inativo: {pergunta.texto}"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        return Response({"detail": "Respostas salvas com sucesso!"}, status=status.HTTP_201_CREATED)
-
-
-class PerguntaViewSet(viewsets.ModelViewSet):
+
+        chave = request.headers.get(idempotencia.HEADER)
+        if not chave:
+            with transaction.atomic():
+                status_code, corpo = processar_respostas(enquete, aluno, respostas_data)
+            return Response(corpo, status=status_code)
+
+        try:
+            idempotencia.validar_chave(chave)
+            escopo = f"drf:responder:{enquete.pk}:{aluno.pk if aluno else 'anonimo'}"
+            status_code, corpo, reexecutado = idempotencia.executar(
+                escopo, chave, respostas_data,
+                lambda: processar_respostas(enquete, aluno, respostas_data),
+            )
+        except idempotencia.ChaveInvalida as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except idempotencia.ConflitoIdempotencia as e:
+            return Response({"detail": str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        response = Response(corpo, status=status_code)
+        if reexecutado:
+            response[idempotencia.HEADER_REEXECUCAO] = 'true'
+        return response
+
+
+def processar_respostas(enquete, aluno, respostas_data):
+    """
+    Valida todas as respostas antes de gravar qualquer uma delas.
+    Retorna (status_code, corpo). Deve ser chamada dentro de transaction.atomic().
+    """
+    # Conferido só em novas execuções: uma nova tentativa com a mesma Idempotency-Key
+    # recebe o resultado original mesmo depois de a enquete encerrar
+    if not enquete.aceita_respostas:
+        return status.HTTP_403_FORBIDDEN, {"detail": "Enquete encerrada: não aceita mais respostas."}
+    if not respostas_data:
+        return status.HTTP_400_BAD_REQUEST, {"detail": "Nenhuma resposta fornecida."}
+
+    respostas_validadas = []
+    for resposta_item in respostas_data:
+        pergunta_id = resposta_item.get('pergunta_id')
+        opcoes_selecionadas_ids = resposta_item.get('opcoes_ids') # Pode ser int para UE ou list de int para ME
+
+        if not pergunta_id or not opcoes_selecionadas_ids:
+            return status.HTTP_400_BAD_REQUEST, {"detail": "Dados de resposta incompletos para uma pergunta."}
+
+        try:
+            pergunta = Pergunta.objects.get(id=pergunta_id, enquete=enquete)
+        except (Pergunta.DoesNotExist, ValueError, TypeError):
+            return status.HTTP_404_NOT_FOUND, {"detail": f"Pergunta {pergunta_id} não encontrada para esta enquete."}
+
+        if pergunta.tipo == Pergunta.UNICA_ESCOLHA:
+            if not isinstance(opcoes_selecionadas_ids, int):
+                return status.HTTP_400_BAD_REQUEST, {"detail": f"Resposta inválida para pergunta de única escolha ({pergunta.id}): opções_ids deve ser um inteiro."}
+
+            try:
+                opcao = Opcao.objects.get(id=opcoes_selecionadas_ids, pergunta=pergunta)
+            except Opcao.DoesNotExist:
+                return status.HTTP_404_NOT_FOUND, {"detail": f"Opção {opcoes_selecionadas_ids} não encontrada para a pergunta {pergunta.id}."}
+            respostas_validadas.append((pergunta, [opcao]))
+        elif pergunta.tipo == Pergunta.MULTIPLA_ESCOLHA:
+            if not isinstance(opcoes_selecionadas_ids, list):
+                return status.HTTP_400_BAD_REQUEST, {"detail": f"Resposta inválida para pergunta de múltipla escolha ({pergunta.id}): opções_ids deve ser uma lista de inteiros."}
+
+            opcoes = Opcao.objects.filter(id__in=opcoes_selecionadas_ids, pergunta=pergunta)
+            if len(opcoes) != len(opcoes_selecionadas_ids):
+                return status.HTTP_400_BAD_REQUEST, {"detail": f"Uma ou mais opções selecionadas para a pergunta {pergunta.id} são inválidas."}
+            respostas_validadas.append((pergunta, list(opcoes)))
+        else:
+            return status.HTTP_400_BAD_REQUEST, {"detail": f"Tipo de pergunta desconhecido ou inativo: {pergunta.texto}"}
+
+    # Só grava depois que todas as respostas foram validadas
+    submissao = gravar_respostas(aluno, enquete, respostas_validadas, Submissao.ORIGEM_API)
+
+    return status.HTTP_201_CREATED, {"detail": "Respostas salvas com sucesso!", "submissao_id": submissao.id}
+
+
+class PerguntaViewSet(CamposDinamicosViewMixin, viewsets.ModelViewSet):
     queryset = Pergunta.objects.all()
     serializer_class = PerguntaSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    relacoes_consulta = {
+        'opcoes': ('prefetch_related', 'opcao_set'),
+    }
 
     # Opcional: Filtrar perguntas por enquete (se a URL for aninhada)
     def get_queryset(self):
@@ -116,6 +330,9 @@ class PerguntaViewSet(viewsets.ModelViewSet):
         enquete_id = self.kwargs.get('enquete_id')
         if enquete_id:
             queryset = queryset.filter(enquete_id=enquete_id)
+        search = self.request.query_params.get('search')
+        if search and self.action == 'list':
+            queryset = busca.filtrar_perguntas(queryset, search)
         return queryset
 
     # Opcional: Para criar uma pergunta dentro de uma enquete específica
@@ -127,7 +344,7 @@ class PerguntaViewSet(viewsets.ModelViewSet):
         else:
             serializer.save()
 
-class OpcaoViewSet(viewsets.ModelViewSet):
+class OpcaoViewSet(CamposDinamicosViewMixin, viewsets.ModelViewSet):
     queryset = Opcao.objects.all()
     serializer_class = OpcaoSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -153,9 +370,15 @@ class RespostaViewSet(viewsets.ReadOnlyModelViewSet): # ReadOnly para respostas
     permission_classes = [IsAuthenticated] # Apenas usuários autenticados podem ver as respostas
 
     def get_queryset(self):
+        # Respostas de múltipla escolha continuam expostas agrupadas em /respostas-multipla-escolha/
+        queryset = (
+            Resposta.objects.filter(pergunta__tipo=Pergunta.UNICA_ESCOLHA)
+            .select_related('aluno__user', 'pergunta', 'opcao')
+            .prefetch_related('pergunta__opcao_set')
+        )
         if self.request.user.is_superuser:
-            return Resposta.objects.all()
-        return Resposta.objects.filter(aluno__user=self.request.user)
+            return queryset
+        return queryset.filter(aluno__user=self.request.user)
 
 class MultiplaEscolhaRespostaViewSet(viewsets.ReadOnlyModelViewSet): # ReadOnly para respostas
     queryset = MultiplaEscolhaResposta.objects.all()
@@ -165,4 +388,26 @@ class MultiplaEscolhaRespostaViewSet(viewsets.ReadOnlyModelViewSet): # ReadOnly
     def get_queryset(self):
         if self.request.user.is_superuser:
             return MultiplaEscolhaResposta.objects.all()
-        return MultiplaEscolhaResposta.objects.filter(aluno__user=self.request.user)
\ No newline at end of file
+        return MultiplaEscolhaResposta.objects.filter(aluno__user=self.request.user)
+
+class SubmissaoViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Submissao.objects.all()
+    serializer_class = SubmissaoSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Submissao.objects.all()
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(aluno__user=self.request.user)
+        enquete_id = self.request.query_params.get('enquete')
+        if enquete_id:
+            queryset = queryset.filter(enquete_id=enquete_id)
+        return queryset
+
+    def retrieve(self, request, pk=None):
+        # A submissão e todas as suas respostas vêm de uma única consulta
+        submissao, respostas = carregar_submissao(self.get_queryset(), pk)
+        if submissao is None:
+            submissao = self.get_object()
+        serializer = SubmissaoDetalheSerializer(submissao, context={'request': request, 'respostas': respostas})
+        return Response(serializer.data)
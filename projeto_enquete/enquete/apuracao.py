@@ -0,0 +1,42 @@
+from collections import Counter
+
+from django.db.models import Count
+
+from .arquivamento import contar_votos_arquivados
+from .models import Aluno, Resposta, Submissao
+
+
+def contar_votos(enquete_id):
+    """
+    Total de escolhas por opção na enquete (única e múltipla escolha): {opcao_id: total}.
+    Inclui as respostas já movidas para o arquivo colunar (ver arquivamento.py).
+    """
+    votos = Counter(dict(
+        Resposta.objects.filter(pergunta__enquete_id=enquete_id)
+        .order_by()
+        .values('opcao')
+        .annotate(total=Count('id'))
+        .values_list('opcao', 'total')
+    ))
+    votos.update(contar_votos_arquivados(enquete_id))
+    return votos
+
+
+def total_respondentes(enquete_id):
+    """Quantidade de envios (identificados ou anônimos), contada pelo índice de Submissao."""
+    return Submissao.objects.filter(enquete_id=enquete_id).count()
+
+
+def alunos_participantes(enquete_id):
+    """Queryset dos alunos identificados que responderam a enquete (uma submissão por aluno)."""
+    return Aluno.objects.filter(submissoes__enquete_id=enquete_id)
+
+
+def participacao_por_nivel(enquete_id):
+    return dict(
+        alunos_participantes(enquete_id)
+        .order_by()
+        .values('nivel')
+        .annotate(total=Count('id'))
+        .values_list('nivel', 'total')
+    )
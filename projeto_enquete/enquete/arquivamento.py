@@ -0,0 +1,315 @@
+"""
+Arquivamento das respostas de enquetes encerradas em arquivos colunares compactados.
+
+Cada enquete arquivada tem um arquivo com as colunas de Resposta gravadas separadamente:
+
+    b'ENQRESP1' | tamanho do cabeçalho (uint32) | cabeçalho JSON | blocos das colunas
+
+Cada bloco é um array de inteiros de 64 bits comprimido com zlib; colunas ordenadas
+(submissao_id, data_resposta) são gravadas como diferenças entre linhas consecutivas, o
+que comprime muito melhor. A leitura usa mmap e descomprime só as colunas pedidas: a
+apuração, por exemplo, lê apenas opcao_id.
+
+As linhas ficam ordenadas por (submissao_id, pergunta_id, opcao_id), então as respostas
+de uma submissão são encontradas por busca binária.
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from itertools import accumulate
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ArquivoRespostas, Resposta, Submissao
+
+MAGICO = b'ENQRESP1'
+COLUNAS = ('submissao_id', 'aluno_id', 'pergunta_id', 'opcao_id', 'data_resposta')
+COLUNAS_DELTA = ('submissao_id', 'data_resposta')
+NIVEL_COMPRESSAO = 6
+TAMANHO_LOTE = 1000
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def diretorio():
+    return Path(getattr(settings, 'ARQUIVO_RESPOSTAS_DIR', Path(settings.BASE_DIR) / 'arquivo_respostas'))
+
+
+def _para_micros(data):
+    delta = data - _EPOCA
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _de_micros(micros):
+    return datetime.fromtimestamp(micros // 1000000, tz=dt_timezone.utc).replace(microsecond=micros % 1000000)
+
+
+def escrever(caminho, enquete_id, colunas):
+    """Grava o arquivo de forma atômica (arquivo temporário + os.replace). `colunas`: {nome: [int]}."""
+    blocos = []
+    descricao = []
+    deslocamento = 0
+    for nome in COLUNAS:
+        valores = array('q', colunas[nome])
+        delta = nome in COLUNAS_DELTA
+        if delta and valores:
+            valores = array('q', [valores[0]] + [atual - anterior for anterior, atual in zip(valores, valores[1:])])
+        bloco = zlib.compress(valores.tobytes(), NIVEL_COMPRESSAO)
+        descricao.append({'nome': nome, 'offset': deslocamento, 'tamanho': len(bloco), 'delta': delta})
+        deslocamento += len(bloco)
+        blocos.append(bloco)
+
+    cabecalho = json.dumps({
+        'enquete_id': enquete_id,
+        'linhas': len(colunas[COLUNAS[0]]),
+        'colunas': descricao,
+    }).encode()
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_suffix('.tmp')
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(MAGICO)
+        arquivo.write(struct.pack('<I', len(cabecalho)))
+        arquivo.write(cabecalho)
+        for bloco in blocos:
+            arquivo.write(bloco)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+    return caminho.stat().st_size
+
+
+class LeitorArquivo:
+    """Leitura de um arquivo de respostas via mmap; use como context manager."""
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+        self._arquivo = None
+        self._mapa = None
+        self._colunas = {}
+
+    def __enter__(self):
+        self._arquivo = open(self.caminho, 'rb')
+        self._mapa = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mapa[:len(MAGICO)] != MAGICO:
+            self.__exit__(None, None, None)
+            raise ValueError(f"{self.caminho} não é um arquivo de respostas.")
+        (tamanho,) = struct.unpack_from('<I', self._mapa, len(MAGICO))
+        inicio = len(MAGICO) + 4
+        self.cabecalho = json.loads(self._mapa[inicio:inicio + tamanho])
+        self._inicio_dados = inicio + tamanho
+        self.linhas = self.cabecalho['linhas']
+        return self
+
+    def __exit__(self, *exc):
+        if self._mapa is not None:
+            self._mapa.close()
+        if self._arquivo is not None:
+            self._arquivo.close()
+        self._mapa = self._arquivo = None
+
+    def coluna(self, nome):
+        if nome not in self._colunas:
+            info = next(coluna for coluna in self.cabecalho['colunas'] if coluna['nome'] == nome)
+            inicio = self._inicio_dados + info['offset']
+            valores = array('q')
+            valores.frombytes(zlib.decompress(self._mapa[inicio:inicio + info['tamanho']]))
+            if info['delta']:
+                valores = array('q', accumulate(valores))
+            self._colunas[nome] = valores
+        return self._colunas[nome]
+
+    def todas(self):
+        """Todas as linhas como tuplas na ordem de COLUNAS."""
+        return list(zip(*(self.coluna(nome) for nome in COLUNAS)))
+
+    def posicoes_da_submissao(self, submissao_id):
+        """Posições das linhas de uma submissão, por busca binária."""
+        submissoes = self.coluna('submissao_id')
+        return range(bisect_left(submissoes, submissao_id), bisect_right(submissoes, submissao_id))
+
+    def linhas_da_submissao(self, submissao_id):
+        """Tuplas (pergunta_id, opcao_id, data_resposta) de uma submissão, por busca binária."""
+        posicoes = self.posicoes_da_submissao(submissao_id)
+        if not posicoes:
+            return []
+        perguntas, opcoes, datas = self.coluna('pergunta_id'), self.coluna('opcao_id'), self.coluna('data_resposta')
+        return [(perguntas[i], opcoes[i], _de_micros(datas[i])) for i in posicoes]
+
+
+def caminho_arquivo(nome):
+    return diretorio() / nome
+
+
+def respondidas_de_novo(enquete_id):
+    """
+    Pares (submissao_id, pergunta_id) com respostas nas tabelas de uma enquete arquivada e
+    reaberta: as linhas arquivadas desses pares foram substituídas e não valem mais.
+    """
+    return set(
+        Resposta.objects.filter(pergunta__enquete_id=enquete_id)
+        .order_by()
+        .values_list('submissao_id', 'pergunta_id')
+        .distinct()
+    )
+
+
+def contar_votos_arquivados(enquete_id):
+    """
+    {opcao_id: total} das respostas arquivadas da enquete que ainda valem (Counter vazio se
+    não houver arquivo). Perguntas respondidas de novo depois de reabrir a enquete ficam de fora.
+    """
+    nome = ArquivoRespostas.objects.filter(enquete_id=enquete_id).values_list('arquivo', flat=True).first()
+    if not nome:
+        return Counter()
+    substituidas = respondidas_de_novo(enquete_id)
+    with LeitorArquivo(caminho_arquivo(nome)) as leitor:
+        if not substituidas:
+            return Counter(leitor.coluna('opcao_id'))
+        return Counter(
+            opcao_id
+            for submissao_id, pergunta_id, opcao_id in zip(
+                leitor.coluna('submissao_id'), leitor.coluna('pergunta_id'), leitor.coluna('opcao_id')
+            )
+            if (submissao_id, pergunta_id) not in substituidas
+        )
+
+
+def respostas_arquivadas_da_submissao(arquivo, submissao_id):
+    """Tuplas (pergunta_id, opcao_id, data_resposta) de uma submissão no ArquivoRespostas dado."""
+    with LeitorArquivo(caminho_arquivo(arquivo.arquivo)) as leitor:
+        return leitor.linhas_da_submissao(submissao_id)
+
+
+def respostas_arquivadas_do_aluno(aluno_id, antes=None, desde=None, quantidade=None):
+    """
+    Tuplas (chave, submissao_id, pergunta_id, opcao_id, data_resposta) das respostas
+    arquivadas do aluno, da mais recente para a mais antiga. A chave é negativa e única
+    (arquivo e posição da linha), para ordenar junto com os ids de Resposta. Perguntas
+    respondidas de novo depois do arquivamento valem pela versão das tabelas e ficam de fora.
+
+    Para uma página do histórico: `antes` é o cursor (data_resposta, id), só linhas
+    anteriores a ele; linhas mais antigas que `desde` não interessam; `quantidade` limita
+    o total. Arquivos fora desse intervalo (primeira_resposta/ultima_resposta) não são
+    abertos, e a leitura, do arquivo mais recente para o mais antigo, para quando os
+    próximos já não têm como entrar entre as `quantidade` linhas.
+    """
+    submissoes = Submissao.objects.filter(aluno_id=aluno_id, enquete__arquivo_respostas__isnull=False)
+    # Arquivos gravados antes das colunas de intervalo ficam com elas nulas: sempre lidos
+    if antes is not None:
+        submissoes = submissoes.filter(
+            Q(enquete__arquivo_respostas__primeira_resposta__isnull=True)
+            | Q(enquete__arquivo_respostas__primeira_resposta__lte=antes[0])
+        )
+    if desde is not None:
+        submissoes = submissoes.filter(
+            Q(enquete__arquivo_respostas__ultima_resposta__isnull=True)
+            | Q(enquete__arquivo_respostas__ultima_resposta__gte=desde)
+        )
+    por_arquivo = {}
+    for submissao_id, arquivo_id, nome, ultima in submissoes.order_by(
+        F('enquete__arquivo_respostas__ultima_resposta').desc(nulls_first=True)
+    ).values_list(
+        'id', 'enquete__arquivo_respostas__id', 'enquete__arquivo_respostas__arquivo',
+        'enquete__arquivo_respostas__ultima_resposta',
+    ):
+        por_arquivo.setdefault((arquivo_id, nome, ultima), []).append(submissao_id)
+    if not por_arquivo:
+        return []
+    respondidas = set(
+        Resposta.objects.filter(submissao_id__in=[s for ids in por_arquivo.values() for s in ids])
+        .values_list('submissao_id', 'pergunta_id')
+    )
+
+    def ordem(linha):
+        return (linha[4], linha[0])
+
+    linhas = []
+    for (arquivo_id, nome, ultima), submissao_ids in por_arquivo.items():
+        if quantidade is not None and len(linhas) >= quantidade and ultima is not None and ultima < linhas[-1][4]:
+            break
+        with LeitorArquivo(caminho_arquivo(nome)) as leitor:
+            posicoes = [i for submissao_id in submissao_ids for i in leitor.posicoes_da_submissao(submissao_id)]
+            if not posicoes:
+                continue
+            submissoes_arquivo = leitor.coluna('submissao_id')
+            perguntas, opcoes, datas = leitor.coluna('pergunta_id'), leitor.coluna('opcao_id'), leitor.coluna('data_resposta')
+            for i in posicoes:
+                linha = (-((arquivo_id << 32) + i + 1), submissoes_arquivo[i], perguntas[i], opcoes[i], _de_micros(datas[i]))
+                if (linha[1], linha[2]) in respondidas:
+                    continue
+                if (antes is not None and ordem(linha) >= antes) or (desde is not None and linha[4] < desde):
+                    continue
+                linhas.append(linha)
+        linhas.sort(key=ordem, reverse=True)
+        if quantidade is not None:
+            del linhas[quantidade:]
+    return linhas
+
+
+def arquivar_enquete(enquete_id):
+    """
+    Move as respostas da enquete para o arquivo colunar e as apaga das tabelas.
+    Respostas já arquivadas antes são mescladas; se a enquete foi reaberta e o aluno
+    respondeu de novo, as respostas novas substituem as arquivadas da mesma pergunta.
+    Retorna o ArquivoRespostas, ou None se não havia nada a arquivar.
+    """
+    vivas = list(
+        Resposta.objects.filter(pergunta__enquete_id=enquete_id)
+        .order_by()
+        .values_list('id', *COLUNAS)
+    )
+    if not vivas:
+        return None
+
+    anterior = ArquivoRespostas.objects.filter(enquete_id=enquete_id).first()
+    por_chave = {}
+    if anterior is not None:
+        with LeitorArquivo(caminho_arquivo(anterior.arquivo)) as leitor:
+            for linha in leitor.todas():
+                por_chave.setdefault((linha[0], linha[2]), []).append(linha)
+    novas = {}
+    for _, submissao_id, aluno_id, pergunta_id, opcao_id, data in vivas:
+        novas.setdefault((submissao_id, pergunta_id), []).append(
+            (submissao_id, aluno_id or 0, pergunta_id, opcao_id, _para_micros(data))
+        )
+    por_chave.update(novas)
+    linhas = sorted(linha for grupo in por_chave.values() for linha in grupo)
+
+    # Cada versão tem um nome novo: até o commit abaixo, o arquivo registrado continua valendo
+    nome = f"enquete_{enquete_id}_{timezone.now():%Y%m%d%H%M%S%f}.col"
+    caminho = caminho_arquivo(nome)
+    tamanho = escrever(
+        caminho, enquete_id,
+        {coluna: [linha[posicao] for linha in linhas] for posicao, coluna in enumerate(COLUNAS)},
+    )
+
+    ids = [linha[0] for linha in vivas]
+    try:
+        with transaction.atomic():
+            for inicio in range(0, len(ids), TAMANHO_LOTE):
+                Resposta.objects.filter(id__in=ids[inicio:inicio + TAMANHO_LOTE]).delete()
+            arquivo, _ = ArquivoRespostas.objects.update_or_create(
+                enquete_id=enquete_id,
+                defaults={
+                    'arquivo': nome, 'linhas': len(linhas), 'tamanho_bytes': tamanho,
+                    'primeira_resposta': _de_micros(min(linha[4] for linha in linhas)),
+                    'ultima_resposta': _de_micros(max(linha[4] for linha in linhas)),
+                },
+            )
+    except Exception:
+        caminho.unlink(missing_ok=True)
+        raise
+    if anterior is not None:
+        caminho_arquivo(anterior.arquivo).unlink(missing_ok=True)
+    return arquivo
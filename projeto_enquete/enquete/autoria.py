@@ -0,0 +1,91 @@
+"""
+Criação de uma enquete inteira (ou de um lote de perguntas) em uma única requisição.
+
+Os dados chegam já validados (EnqueteAutoriaSerializer / PerguntasEmLoteSerializer) e são
+gravados em uma transação com um bulk_create por tabela, em vez de um POST e uma
+transação por enquete, pergunta e opção.
+
+bulk_create não dispara sinais, então o que os sinais fariam é feito aqui: os contadores
+das perguntas e da enquete nova são preenchidos antes da inserção, os dos pais já
+existentes são somados com contadores.registrar_criacao_em_lote, e as perguntas entram no
+índice de busca com busca.indexar_perguntas.
+"""
+from django.db import transaction
+
+from . import busca, contadores
+from .outbox import invalidar_enquetes
+from .models import Enquete, Opcao, Pergunta
+
+LIMITE_PERGUNTAS = 200
+LIMITE_OPCOES = 50
+
+
+def _montar(enquete, perguntas_dados):
+    """Perguntas e opções em memória, com os contadores já calculados."""
+    perguntas, opcoes_por_pergunta = [], []
+    for dados in perguntas_dados:
+        opcoes = [
+            Opcao(
+                texto=opcao['texto'],
+                ativa=opcao['ativa'],
+                ordem=opcao.get('ordem', posicao),
+                peso=opcao['peso'],
+            )
+            for posicao, opcao in enumerate(dados['opcoes'])
+        ]
+        perguntas.append(Pergunta(
+            enquete=enquete,
+            texto=dados['texto'],
+            tipo=dados['tipo'],
+            ativa=dados['ativa'],
+            tecnologia_id=dados.get('tecnologia'),
+            num_opcoes=len(opcoes),
+            num_opcoes_ativas=sum(opcao.ativa for opcao in opcoes),
+        ))
+        opcoes_por_pergunta.append(opcoes)
+    return perguntas, opcoes_por_pergunta
+
+
+def _gravar_perguntas(perguntas, opcoes_por_pergunta):
+    Pergunta.objects.bulk_create(perguntas)
+    for pergunta, opcoes in zip(perguntas, opcoes_por_pergunta):
+        for opcao in opcoes:
+            opcao.pergunta = pergunta
+    Opcao.objects.bulk_create([opcao for opcoes in opcoes_por_pergunta for opcao in opcoes])
+    busca.indexar_perguntas(perguntas)
+    return [
+        {'id': pergunta.id, 'opcoes': [opcao.id for opcao in opcoes]}
+        for pergunta, opcoes in zip(perguntas, opcoes_por_pergunta)
+    ]
+
+
+def criar_enquete(dados):
+    """Cria a enquete com perguntas e opções. Retorna {'id', 'perguntas': [{'id', 'opcoes': [ids]}]}."""
+    enquete = Enquete(
+        titulo=dados['titulo'],
+        descricao=dados.get('descricao'),
+        ativa=dados['ativa'],
+        data_expiracao=dados.get('data_expiracao'),
+        area_id=dados['area'],
+    )
+    perguntas, opcoes_por_pergunta = _montar(enquete, dados['perguntas'])
+    enquete.num_perguntas = len(perguntas)
+    enquete.num_perguntas_ativas = sum(pergunta.ativa for pergunta in perguntas)
+
+    with transaction.atomic():
+        # save() comum: os sinais atualizam os contadores da área e indexam a enquete
+        enquete.save()
+        if dados.get('tecnologias'):
+            enquete.tecnologias.set(dados['tecnologias'])
+        criadas = _gravar_perguntas(perguntas, opcoes_por_pergunta)
+    return {'id': enquete.id, 'perguntas': criadas}
+
+
+def adicionar_perguntas(enquete, perguntas_dados):
+    """Acrescenta perguntas (com opções) a uma enquete existente. Retorna [{'id', 'opcoes': [ids]}]."""
+    perguntas, opcoes_por_pergunta = _montar(enquete, perguntas_dados)
+    with transaction.atomic():
+        criadas = _gravar_perguntas(perguntas, opcoes_por_pergunta)
+        contadores.registrar_criacao_em_lote(perguntas)
+        invalidar_enquetes([enquete.pk])
+    return criadas
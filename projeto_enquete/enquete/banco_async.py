@@ -0,0 +1,184 @@
+"""
+Execução do ORM a partir de código assíncrono (FastAPI) com um pool de threads limitado.
+
+O sync_to_async do asgiref roda tudo em uma única thread e nunca chama
+close_old_connections(). Aqui o trabalho com o banco vai para um ThreadPoolExecutor
+dedicado: cada thread mantém a sua conexão, então MAX_CONEXOES limita as conexões que o
+processo abre. Antes e depois de cada chamada, close_old_connections() descarta conexões
+vencidas (CONN_MAX_AGE) ou com erro; com CONN_HEALTH_CHECKS a conexão reaproveitada é
+testada antes do uso.
+
+Quando o banco não dá vazão, as chamadas esperam na fila até ESPERA_MAXIMA segundos e a
+fila tem no máximo FILA_MAXIMA chamadas; além disso a requisição é recusada com 503
+(Rejeitada, como no controle de admissão) em vez de acumular trabalho que o cliente já
+abandonou. Chamadas canceladas ainda na fila (cliente desconectado) liberam a vaga sem
+executar. O tempo de espera na fila é registrado em metricas().
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .admissao import Rejeitada
+
+# Valores padrão; podem ser sobrescritos pela configuração BANCO_ASYNC em settings.py
+CONFIGURACAO_PADRAO = {
+    # Threads (e portanto conexões) usadas para o ORM neste processo
+    'MAX_CONEXOES': 8,
+    # Chamadas aguardando uma thread livre além das que estão executando
+    'FILA_MAXIMA': 64,
+    # Tempo máximo (em segundos) de espera na fila; depois disso a chamada nem é executada
+    'ESPERA_MAXIMA': 2.0,
+    'RETRY_AFTER_SATURADO': 1,
+}
+
+# Limites (em ms) do histograma de tempo de espera na fila
+FAIXAS_ESPERA_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+
+class ExecutorBanco:
+    def __init__(self, **configuracao):
+        self.configuracao = {**CONFIGURACAO_PADRAO, **configuracao}
+        self.executor = ThreadPoolExecutor(self.configuracao['MAX_CONEXOES'], thread_name_prefix='orm')
+        self.lock = threading.Lock()
+        self.pendentes = 0
+        self.executando = 0
+        self.executadas = 0
+        self.recusadas = 0
+        self.expiradas = 0
+        self.canceladas = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.histograma = [0] * (len(FAIXAS_ESPERA_MS) + 1)
+
+    def _registrar_espera(self, espera):
+        ms = espera * 1000
+        faixa = next((i for i, limite in enumerate(FAIXAS_ESPERA_MS) if ms <= limite), len(FAIXAS_ESPERA_MS))
+        self.histograma[faixa] += 1
+        self.espera_total += espera
+        self.espera_maxima = max(self.espera_maxima, espera)
+
+    def _rodar(self, submetida, funcao, args, kwargs):
+        espera = time.monotonic() - submetida
+        with self.lock:
+            self._registrar_espera(espera)
+            if espera > self.configuracao['ESPERA_MAXIMA']:
+                self.pendentes -= 1
+                self.expiradas += 1
+                raise self._saturado()
+            self.executando += 1
+        close_old_connections()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            close_old_connections()
+            with self.lock:
+                self.executando -= 1
+                self.pendentes -= 1
+                self.executadas += 1
+
+    def _saturado(self):
+        return Rejeitada(
+            503,
+            self.configuracao['RETRY_AFTER_SATURADO'],
+            "Banco de dados ocupado. Tente novamente em instantes.",
+        )
+
+    async def executar(self, funcao, *args, **kwargs):
+        """Equivalente a `await sync_to_async(funcao)(*args, **kwargs)`, no pool limitado."""
+        limite = self.configuracao['MAX_CONEXOES'] + self.configuracao['FILA_MAXIMA']
+        with self.lock:
+            if self.pendentes >= limite:
+                self.recusadas += 1
+                raise self._saturado()
+            self.pendentes += 1
+        try:
+            futuro = self.executor.submit(self._rodar, time.monotonic(), funcao, args, kwargs)
+        except RuntimeError:
+            # Executor já encerrado (fim do lifespan)
+            with self.lock:
+                self.pendentes -= 1
+            raise self._saturado()
+        futuro.add_done_callback(self._liberar_cancelada)
+        return await asyncio.wrap_future(futuro)
+
+    def _liberar_cancelada(self, futuro):
+        # Cliente desconectou com a chamada ainda na fila: o wrap_future cancela o futuro e
+        # _rodar nunca executa, então a vaga é devolvida aqui
+        if futuro.cancelled():
+            with self.lock:
+                self.pendentes -= 1
+                self.canceladas += 1
+
+    def _em_cada_thread(self, funcao):
+        """Executa `funcao` uma vez em cada thread do pool (bloqueante; chame fora do event loop)."""
+        barreira = threading.Barrier(self.configuracao['MAX_CONEXOES'])
+
+        def tarefa():
+            funcao()
+            # Segura a thread até todas estarem ocupadas: cada tarefa cai em uma thread diferente
+            barreira.wait(timeout=10)
+
+        for futuro in [self.executor.submit(tarefa) for _ in range(barreira.parties)]:
+            futuro.result()
+
+    def aquecer_conexoes(self):
+        def abrir():
+            for conexao in connections.all():
+                conexao.ensure_connection()
+        self._em_cada_thread(abrir)
+
+    def encerrar(self):
+        def fechar():
+            for conexao in connections.all():
+                conexao.close()
+        self._em_cada_thread(fechar)
+        self.executor.shutdown(wait=True)
+
+    def metricas(self):
+        with self.lock:
+            medidas = self.executadas + self.expiradas
+            return {
+                'max_conexoes': self.configuracao['MAX_CONEXOES'],
+                'executando': self.executando,
+                'na_fila': self.pendentes - self.executando,
+                'executadas': self.executadas,
+                'recusadas': self.recusadas,
+                'expiradas_na_fila': self.expiradas,
+                'canceladas_na_fila': self.canceladas,
+                'espera_media_ms': round(self.espera_total / medidas * 1000, 2) if medidas else 0.0,
+                'espera_maxima_ms': round(self.espera_maxima * 1000, 2),
+                'espera_histograma_ms': {
+                    (f'<={limite}' if limite is not None else f'>{FAIXAS_ESPERA_MS[-1]}'): total
+                    for limite, total in zip(FAIXAS_ESPERA_MS + (None,), self.histograma)
+                },
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def obter_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ExecutorBanco(**getattr(settings, 'BANCO_ASYNC', {}))
+    return _executor
+
+
+def encerrar_executor():
+    """Fecha as conexões das threads do pool e o encerra (fim do lifespan)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.encerrar()
+
+
+async def executar(funcao, *args, **kwargs):
+    return await obter_executor().executar(funcao, *args, **kwargs)
@@ -0,0 +1,156 @@
+"""
+Índice de busca textual (SQLite FTS5) sobre enquetes e perguntas.
+
+Cada enquete e cada pergunta ocupam uma linha da tabela virtual `enquete_busca`.
+O rowid é derivado do id do objeto (2 * id para enquetes, 2 * id + 1 para perguntas),
+o que permite atualizar ou remover uma linha sem consultar o índice antes.
+O tokenizador remove acentos, então "programacao" encontra "Programação".
+
+Em bancos sem FTS5 as funções caem para buscas com icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Min, Q
+from django.db.models.expressions import RawSQL
+
+TABELA = 'enquete_busca'
+TIPO_ENQUETE = 'enquete'
+TIPO_PERGUNTA = 'pergunta'
+
+SQL_CRIAR_TABELA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA} USING fts5(
+    tipo UNINDEXED,
+    enquete_id UNINDEXED,
+    titulo,
+    conteudo,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+# Pesos do bm25 por coluna: o título da enquete vale mais que descrição/texto da pergunta.
+# Vai como função da coluna `rank`, que, ao contrário de bm25(), pode entrar no MIN().
+_RANK = "bm25(0.0, 0.0, 10.0, 1.0)"
+
+_disponivel = None
+
+
+def disponivel():
+    global _disponivel
+    if connection.vendor != 'sqlite':
+        return False
+    if not _disponivel:
+        # Só guarda o resultado positivo: a tabela pode ser criada depois (migrate)
+        _disponivel = TABELA in connection.introspection.table_names()
+    return _disponivel
+
+
+def _rowid(tipo, objeto_id):
+    return objeto_id * 2 + (1 if tipo == TIPO_PERGUNTA else 0)
+
+
+def montar_consulta(termo):
+    """Converte o texto digitado em uma consulta FTS5 segura: todos os termos, por prefixo."""
+    palavras = re.findall(r'\w+', termo or '')
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def indexar_enquete(enquete):
+    if not disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {TABELA} (rowid, tipo, enquete_id, titulo, conteudo) VALUES (%s, %s, %s, %s, %s)",
+            [_rowid(TIPO_ENQUETE, enquete.pk), TIPO_ENQUETE, enquete.pk, enquete.titulo, enquete.descricao or ''],
+        )
+
+
+def indexar_pergunta(pergunta):
+    if not disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {TABELA} (rowid, tipo, enquete_id, titulo, conteudo) VALUES (%s, %s, %s, '', %s)",
+            [_rowid(TIPO_PERGUNTA, pergunta.pk), TIPO_PERGUNTA, pergunta.enquete_id, pergunta.texto],
+        )
+
+
+def indexar_perguntas(perguntas):
+    """Indexa várias perguntas de uma vez (criações em lote, que não disparam sinais)."""
+    if not disponivel() or not perguntas:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {TABELA} (rowid, tipo, enquete_id, titulo, conteudo) VALUES (%s, %s, %s, '', %s)",
+            [[_rowid(TIPO_PERGUNTA, pergunta.pk), TIPO_PERGUNTA, pergunta.enquete_id, pergunta.texto] for pergunta in perguntas],
+        )
+
+
+def remover(tipo, objeto_id):
+    if not disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA} WHERE rowid = %s", [_rowid(tipo, objeto_id)])
+
+
+def reconstruir():
+    """Recria todo o índice com dois INSERT ... SELECT. Retorna o total de linhas indexadas."""
+    if connection.vendor != 'sqlite':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_CRIAR_TABELA)
+        cursor.execute(f"DELETE FROM {TABELA}")
+        cursor.execute(
+            f"INSERT INTO {TABELA} (rowid, tipo, enquete_id, titulo, conteudo) "
+            f"SELECT id * 2, %s, id, titulo, COALESCE(descricao, '') FROM enquete_enquete",
+            [TIPO_ENQUETE],
+        )
+        cursor.execute(
+            f"INSERT INTO {TABELA} (rowid, tipo, enquete_id, titulo, conteudo) "
+            f"SELECT id * 2 + 1, %s, enquete_id, '', texto FROM enquete_pergunta",
+            [TIPO_PERGUNTA],
+        )
+        cursor.execute(f"SELECT COUNT(*) FROM {TABELA}")
+        return cursor.fetchone()[0]
+
+
+def _juntar_indice(queryset, consulta, condicao, parametros=()):
+    """
+    Junta o índice ao queryset na própria consulta (condicao liga as linhas do índice à
+    tabela do modelo). Filtros, contagem e paginação do queryset valem sobre todos os
+    resultados da busca, e a relevância fica disponível na coluna `rank` do FTS5.
+    """
+    tabela = queryset.model._meta.db_table
+    return queryset.extra(
+        tables=[TABELA],
+        where=[f"{TABELA} MATCH %s", f"{TABELA}.rank MATCH %s", condicao.format(tabela=tabela)],
+        params=[consulta, _RANK, *parametros],
+    )
+
+
+def filtrar_enquetes(queryset, termo):
+    """
+    Aplica a busca textual a um queryset de Enquete (título, descrição ou texto de alguma
+    pergunta), ordenando pela linha mais relevante de cada enquete.
+    """
+    if not disponivel():
+        return queryset.filter(
+            Q(titulo__icontains=termo) | Q(descricao__icontains=termo) | Q(perguntas__texto__icontains=termo)
+        ).distinct()
+    consulta = montar_consulta(termo)
+    if not consulta:
+        return queryset.none()
+    queryset = _juntar_indice(queryset, consulta, f'"{{tabela}}"."id" = {TABELA}.enquete_id')
+    return queryset.annotate(relevancia=Min(RawSQL(f"{TABELA}.rank", []))).order_by('relevancia', 'pk')
+
+
+def filtrar_perguntas(queryset, termo):
+    if not disponivel():
+        return queryset.filter(texto__icontains=termo)
+    consulta = montar_consulta(termo)
+    if not consulta:
+        return queryset.none()
+    queryset = _juntar_indice(
+        queryset, consulta, f'"{{tabela}}"."id" = {TABELA}.rowid / 2 AND {TABELA}.tipo = %s', [TIPO_PERGUNTA],
+    )
+    return queryset.annotate(relevancia=RawSQL(f"{TABELA}.rank", [])).order_by('relevancia', 'pk')
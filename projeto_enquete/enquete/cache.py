@@ -0,0 +1,33 @@
+from django.core.cache import cache
+
+# Tempo padrão (em segundos) das entradas do cache de leitura de enquetes
+TIMEOUT_ENQUETE = 60 * 10
+
+
+def chave_enquete(enquete_id):
+    """Árvore serializada da enquete (perguntas e opções) usada pelas APIs de leitura."""
+    return f"enquete:{enquete_id}"
+
+
+def chave_apuracao(enquete_id):
+    """Snapshot da apuração (contagem de respostas por opção) da enquete."""
+    return f"enquete:{enquete_id}:apuracao"
+
+
+def chave_indice_recomendacoes():
+    """Índice invertido tecnologia -> enquetes ativas usado pelas recomendações."""
+    return "recomendacoes:indice"
+
+
+def chave_recomendacoes(aluno_id):
+    """Enquetes recomendadas ao aluno, válidas para uma versão do índice."""
+    return f"recomendacoes:aluno:{aluno_id}"
+
+
+def invalidar_enquetes(enquete_ids):
+    chaves = []
+    for enquete_id in enquete_ids:
+        chaves.append(chave_enquete(enquete_id))
+        chaves.append(chave_apuracao(enquete_id))
+    if chaves:
+        cache.delete_many(chaves)
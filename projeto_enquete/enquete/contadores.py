@@ -0,0 +1,149 @@
+from django.apps import apps as django_apps
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# (modelo filho, FK para o pai, modelo pai, contador total, contador de ativos)
+RELACOES = (
+    ('Enquete', 'area', 'Area', 'num_enquetes', 'num_enquetes_ativas'),
+    ('Pergunta', 'enquete', 'Enquete', 'num_perguntas', 'num_perguntas_ativas'),
+    ('Opcao', 'pergunta', 'Pergunta', 'num_opcoes', 'num_opcoes_ativas'),
+)
+
+
+class ContadoresMixin:
+    """
+    Os contadores são mantidos com UPDATE ... SET campo = campo + n. Um save() comum
+    gravaria de volta o valor (possivelmente desatualizado) carregado em memória,
+    então eles ficam de fora dos saves de objetos já existentes.
+    """
+    CAMPOS_CONTADORES = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_CONTADORES
+            ]
+        super().save(*args, **kwargs)
+
+
+def _relacao(instance):
+    nome = type(instance)._meta.object_name
+    for relacao in RELACOES:
+        if relacao[0] == nome:
+            return relacao
+    return None
+
+
+def _estado_no_banco(instance, fk):
+    return (
+        type(instance)._base_manager.filter(pk=instance.pk)
+        .values_list(f'{fk}_id', 'ativa')
+        .first()
+    )
+
+
+def guardar_estado(instance):
+    """post_init: lembra o pai e o status ativo para comparar no próximo save()."""
+    _, fk, *_ = _relacao(instance)
+    campos = instance.__dict__
+    if f'{fk}_id' in campos and 'ativa' in campos:
+        instance._estado_contador = (campos[f'{fk}_id'], campos['ativa'])
+    else:
+        # Campos adiados (.only()/.defer()): o estado é lido do banco se houver save()
+        instance._estado_contador = None
+
+
+def _aplicar(instance, anterior, atual):
+    _, _, nome_pai, campo_total, campo_ativos = _relacao(instance)
+    deltas = {}
+    for estado, sinal in ((anterior, -1), (atual, 1)):
+        if estado is None or estado[0] is None:
+            continue
+        pai_id, ativa = estado
+        total, ativos = deltas.get(pai_id, (0, 0))
+        deltas[pai_id] = (total + sinal, ativos + (sinal if ativa else 0))
+
+    _somar(nome_pai, campo_total, campo_ativos, deltas)
+
+
+def _somar(nome_pai, campo_total, campo_ativos, deltas):
+    """Um UPDATE ... SET campo = campo + n por pai: {pai_id: (delta_total, delta_ativos)}."""
+    Pai = django_apps.get_model('enquete', nome_pai)
+    for pai_id, (total, ativos) in deltas.items():
+        mudancas = {}
+        if total:
+            mudancas[campo_total] = F(campo_total) + total
+        if ativos:
+            mudancas[campo_ativos] = F(campo_ativos) + ativos
+        if mudancas:
+            Pai._base_manager.filter(pk=pai_id).update(**mudancas)
+
+
+def registrar_save(instance, created):
+    _, fk, *_ = _relacao(instance)
+    if created:
+        anterior = None
+    else:
+        anterior = getattr(instance, '_estado_contador', None)
+        if anterior is None:
+            anterior = _estado_no_banco(instance, fk)
+    atual = (getattr(instance, f'{fk}_id'), instance.ativa)
+    if anterior != atual:
+        _aplicar(instance, anterior, atual)
+    instance._estado_contador = atual
+
+
+def registrar_delete(instance):
+    _, fk, *_ = _relacao(instance)
+    anterior = getattr(instance, '_estado_contador', None)
+    if anterior is None:
+        anterior = (getattr(instance, f'{fk}_id'), instance.ativa)
+    _aplicar(instance, anterior, None)
+
+
+def registrar_criacao_em_lote(objetos):
+    """bulk_create não dispara sinais: soma os objetos criados aos contadores dos pais."""
+    if not objetos:
+        return
+    _, fk, nome_pai, campo_total, campo_ativos = _relacao(objetos[0])
+    deltas = {}
+    for objeto in objetos:
+        pai_id = getattr(objeto, f'{fk}_id')
+        total, ativos = deltas.get(pai_id, (0, 0))
+        deltas[pai_id] = (total + 1, ativos + (1 if objeto.ativa else 0))
+    _somar(nome_pai, campo_total, campo_ativos, deltas)
+
+
+def ajustar_ativos(nome_pai, campo_ativos, deltas):
+    """Para atualizações em lote (queryset.update), que não disparam sinais: {pai_id: delta}."""
+    Pai = django_apps.get_model('enquete', nome_pai)
+    for pai_id, delta in deltas.items():
+        if pai_id is not None and delta:
+            Pai._base_manager.filter(pk=pai_id).update(**{campo_ativos: F(campo_ativos) + delta})
+
+
+def recontar(apps=django_apps):
+    """
+    Recalcula todos os contadores a partir das tabelas filhas, um UPDATE por contador.
+    Recebe `apps` para poder ser usada também em migrações.
+    """
+    atualizados = {}
+    for nome_filho, fk, nome_pai, campo_total, campo_ativos in RELACOES:
+        Filho = apps.get_model('enquete', nome_filho)
+        Pai = apps.get_model('enquete', nome_pai)
+
+        def contagem(**filtros):
+            subconsulta = (
+                Filho._base_manager.filter(**{fk: OuterRef('pk')}, **filtros)
+                .order_by()
+                .values(fk)
+                .annotate(total=Count('pk'))
+                .values('total')
+            )
+            return Coalesce(Subquery(subconsulta), 0)
+
+        atualizados[nome_pai] = Pai._base_manager.update(
+            **{campo_total: contagem(), campo_ativos: contagem(ativa=True)}
+        )
+    return atualizados
@@ -0,0 +1,150 @@
+"""
+Arquivos estáticos com nome versionado, pré-comprimidos e servidos com cache longo.
+
+EstaticosOtimizados (STORAGES['staticfiles']) é o ManifestStaticFilesStorage do Django:
+o collectstatic grava cada arquivo com o hash do conteúdo no nome e o manifesto
+staticfiles.json, pelo qual o {% static %} dos templates resolve os nomes. Depois do
+hash, cada arquivo de texto ganha as variantes .gz e .br (esta se o pacote brotli estiver
+instalado) e as imagens PNG/JPEG são reduzidas a ESTATICOS_LARGURA_MAXIMA e recomprimidas
+(se o Pillow estiver instalado).
+
+A view `servir` entrega STATIC_ROOT escolhendo a variante comprimida pelo
+Accept-Encoding; arquivos com hash no nome vão com Cache-Control immutable de um ano,
+já que qualquer mudança de conteúdo gera outro nome.
+
+Build: python manage.py preparar_estaticos
+"""
+import gzip
+import mimetypes
+import posixpath
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+EXTENSOES_TEXTO = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico')
+EXTENSOES_IMAGEM = ('.png', '.jpg', '.jpeg')
+# Abaixo disso o cabeçalho da compressão não compensa
+TAMANHO_MINIMO_COMPRESSAO = 256
+# Variante comprimida só é gravada se ficar menor que esta fração do original
+GANHO_MINIMO = 0.95
+
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+CACHE_SEM_HASH = 'public, max-age=0, must-revalidate'
+
+# Variantes por codificação, na ordem de preferência
+VARIANTES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def comprimir(caminho):
+    """Grava caminho.gz (e caminho.br); retorna {extensão: tamanho} das variantes gravadas."""
+    dados = Path(caminho).read_bytes()
+    if len(dados) < TAMANHO_MINIMO_COMPRESSAO:
+        return {}
+    variantes = {'.gz': gzip.compress(dados, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes['.br'] = brotli.compress(dados, quality=11)
+    gravadas = {}
+    for extensao, comprimido in variantes.items():
+        destino = Path(f'{caminho}{extensao}')
+        if len(comprimido) < len(dados) * GANHO_MINIMO:
+            destino.write_bytes(comprimido)
+            gravadas[extensao] = len(comprimido)
+        else:
+            destino.unlink(missing_ok=True)
+    return gravadas
+
+
+def otimizar_imagem(caminho, largura_maxima):
+    """Reduz a imagem à largura máxima e recomprime; só regrava se ficar menor. Retorna o novo tamanho."""
+    caminho = Path(caminho)
+    original = caminho.stat().st_size
+    if Image is None:
+        return original
+    with Image.open(caminho) as imagem:
+        formato = imagem.format
+        if imagem.width > largura_maxima:
+            imagem.thumbnail((largura_maxima, imagem.height * largura_maxima // imagem.width))
+        buffer = BytesIO()
+        if formato == 'JPEG':
+            imagem.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+        else:
+            imagem.save(buffer, formato, optimize=True)
+    if buffer.tell() >= original:
+        return original
+    caminho.write_bytes(buffer.getvalue())
+    return buffer.tell()
+
+
+class EstaticosOtimizados(ManifestStaticFilesStorage):
+    # Sem entrada no manifesto (collectstatic ainda não rodou) o nome original é usado
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        largura = getattr(settings, 'ESTATICOS_LARGURA_MAXIMA', 1920)
+        for nome in sorted(set(self.hashed_files.values())):
+            extensao = posixpath.splitext(nome)[1].lower()
+            if extensao in EXTENSOES_IMAGEM:
+                otimizar_imagem(self.path(nome), largura)
+            elif extensao in EXTENSOES_TEXTO:
+                comprimir(self.path(nome))
+
+    def nomes_com_hash(self):
+        if not hasattr(self, '_nomes_com_hash'):
+            self._nomes_com_hash = frozenset(self.hashed_files.values())
+        return self._nomes_com_hash
+
+
+def _codificacao(request, caminho):
+    aceitas = {
+        parte.split(';')[0].strip().lower()
+        for parte in request.headers.get('Accept-Encoding', '').split(',')
+    }
+    for codificacao, extensao in VARIANTES:
+        if codificacao in aceitas:
+            variante = Path(f'{caminho}{extensao}')
+            if variante.is_file():
+                return codificacao, variante
+    return None, Path(caminho)
+
+
+def servir(request, caminho):
+    """Entrega um arquivo de STATIC_ROOT (ver docstring do módulo)."""
+    nome = posixpath.normpath(caminho).lstrip('/')
+    # Caminhos fora de STATIC_ROOT levantam SuspiciousFileOperation (400), como em django.views.static
+    completo = safe_join(staticfiles_storage.location, nome)
+    if not Path(completo).is_file():
+        raise Http404
+
+    imutavel = isinstance(staticfiles_storage, EstaticosOtimizados) and nome in staticfiles_storage.nomes_com_hash()
+    codificacao, arquivo = _codificacao(request, completo)
+    estado = arquivo.stat()
+    if not imutavel and not was_modified_since(request.headers.get('If-Modified-Since'), estado.st_mtime):
+        return HttpResponseNotModified()
+
+    tipo, _ = mimetypes.guess_type(nome)
+    response = FileResponse(arquivo.open('rb'), content_type=tipo or 'application/octet-stream')
+    response['Cache-Control'] = CACHE_IMUTAVEL if imutavel else CACHE_SEM_HASH
+    response['Last-Modified'] = http_date(estado.st_mtime)
+    response['Vary'] = 'Accept-Encoding'
+    if codificacao:
+        response['Content-Encoding'] = codificacao
+    return response
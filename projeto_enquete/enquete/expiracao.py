@@ -0,0 +1,83 @@
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import contadores, recomendacoes
+from .outbox import invalidar_enquetes
+from .models import Enquete
+
+logger = logging.getLogger(__name__)
+
+
+def desativar_expiradas(agora=None):
+    """
+    Desativa em lote as enquetes ativas cuja data_expiracao já passou.
+    Usa o índice (ativa, data_expiracao) e um único UPDATE. Retorna os ids desativados.
+    """
+    agora = agora or timezone.now()
+    expiradas = list(
+        Enquete.objects.filter(ativa=True, data_expiracao__lte=agora)
+        .order_by()
+        .values_list('id', 'area_id')
+    )
+    ids = [enquete_id for enquete_id, _ in expiradas]
+    if ids:
+        with transaction.atomic():
+            Enquete.objects.filter(id__in=ids, ativa=True).update(ativa=False)
+            # update() não dispara sinais: ajusta o contador de enquetes ativas das áreas
+            por_area = Counter(area_id for _, area_id in expiradas)
+            contadores.ajustar_ativos('Area', 'num_enquetes_ativas', {area_id: -total for area_id, total in por_area.items()})
+            invalidar_enquetes(ids)
+        recomendacoes.atualizar_enquetes(ids)
+        logger.info("%d enquetes expiradas desativadas: %s", len(ids), ids)
+    return ids
+
+
+class AgendadorExpiracao(threading.Thread):
+    """Thread em segundo plano que chama desativar_expiradas() periodicamente."""
+
+    def __init__(self, intervalo):
+        super().__init__(name='agendador-expiracao', daemon=True)
+        self.intervalo = intervalo
+        self.parar = threading.Event()
+
+    def run(self):
+        while not self.parar.wait(self.intervalo):
+            try:
+                desativar_expiradas()
+            except Exception:
+                logger.exception("Falha ao desativar enquetes expiradas")
+            finally:
+                close_old_connections()
+
+
+_agendador = None
+_agendador_lock = threading.Lock()
+
+
+def iniciar_agendador():
+    """
+    Inicia o agendador uma única vez por processo. Chamado por tarefas.py (primeira
+    requisição WSGI/ASGI) e pelo lifespan da FastAPI; EXPIRACAO_INTERVALO_SEGUNDOS = 0 desativa.
+    """
+    global _agendador
+    intervalo = getattr(settings, 'EXPIRACAO_INTERVALO_SEGUNDOS', 60)
+    if not intervalo:
+        return None
+    with _agendador_lock:
+        if _agendador is None:
+            _agendador = AgendadorExpiracao(intervalo)
+            _agendador.start()
+    return _agendador
+
+
+def parar_agendador():
+    global _agendador
+    with _agendador_lock:
+        if _agendador is not None:
+            _agendador.parar.set()
+            _agendador = None
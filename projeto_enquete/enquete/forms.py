@@ -16,9 +16,10 @@ class AreaForm(EstiloFormMixin, forms.ModelForm):
 class EnqueteForm(EstiloFormMixin, forms.ModelForm):
     class Meta:
         model = Enquete
-        fields = ['titulo', 'descricao', 'ativa', 'area', 'tecnologias']
+        fields = ['titulo', 'descricao', 'ativa', 'data_expiracao', 'area', 'tecnologias']
         widgets = {
             'tecnologias': forms.CheckboxSelectMultiple(),
+            'data_expiracao': forms.DateTimeInput(attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
         }
 
 class PerguntaForm(EstiloFormMixin, forms.ModelForm):
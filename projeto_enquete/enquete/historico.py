@@ -0,0 +1,140 @@
+"""
+Histórico de respostas de um aluno em formato plano, paginado por cursor (keyset).
+
+Cada página é uma única consulta em Resposta, que usa o índice (aluno, data_resposta, id):
+as linhas trazem só ids, e os textos de enquetes, perguntas e opções vêm uma vez por
+página em dicionários separados, em vez de repetidos em cada linha.
+
+Respostas de enquetes arquivadas (arquivamento.py) são lidas dos arquivos colunares das
+submissões do aluno e intercaladas na mesma ordem (data_resposta, id): elas vêm com
+`arquivada` verdadeiro e sem id, e usam no cursor uma chave negativa.
+"""
+import base64
+import binascii
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+from .arquivamento import respostas_arquivadas_do_aluno
+from .models import Opcao, Pergunta, Resposta
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(data, resposta_id):
+    # Microssegundos inteiros: um float perderia precisão e repetiria/pularia linhas
+    micros = (data - _EPOCA) // timedelta(microseconds=1)
+    valor = f"{micros}:{resposta_id}"
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        micros, resposta_id = base64.urlsafe_b64decode(cursor + preenchimento).decode().split(':')
+        return _EPOCA + timedelta(microseconds=int(micros)), int(resposta_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError):
+        raise CursorInvalido("Cursor de paginação inválido.")
+
+
+def limitar(limite):
+    try:
+        limite = int(limite)
+    except (TypeError, ValueError):
+        return LIMITE_PADRAO
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def _intercalar_arquivadas(linhas, arquivadas, limite):
+    """
+    Junta às linhas de Resposta as arquivadas (já limitadas a limite + 1), com os textos de
+    perguntas e opções (duas consultas por id), e devolve até limite + 1 linhas na ordem da página.
+    """
+    perguntas = Pergunta.objects.select_related('enquete').in_bulk({linha[2] for linha in arquivadas})
+    opcoes = Opcao.objects.in_bulk({linha[3] for linha in arquivadas})
+    for chave, submissao_id, pergunta_id, opcao_id, data in arquivadas:
+        # Pergunta ou opção apagada depois do arquivamento: a linha fica, sem os textos
+        pergunta, opcao = perguntas.get(pergunta_id), opcoes.get(opcao_id)
+        linhas.append({
+            'id': chave, 'submissao_id': submissao_id, 'pergunta_id': pergunta_id, 'opcao_id': opcao_id,
+            'data_resposta': data,
+            'pergunta__texto': pergunta and pergunta.texto,
+            'pergunta__tipo': pergunta and pergunta.tipo,
+            'pergunta__enquete_id': pergunta and pergunta.enquete_id,
+            'pergunta__enquete__titulo': pergunta and pergunta.enquete.titulo,
+            'opcao__texto': opcao and opcao.texto,
+        })
+    linhas.sort(key=lambda linha: (linha['data_resposta'], linha['id']), reverse=True)
+    return linhas[:limite + 1]
+
+
+def pagina_historico(aluno_id, cursor=None, limite=LIMITE_PADRAO):
+    """
+    Respostas do aluno da mais recente para a mais antiga. Retorna um dicionário com
+    `results` (linhas planas), `enquetes`, `perguntas`, `opcoes` (referências da página,
+    por id) e `proximo_cursor` (None na última página).
+    """
+    respostas = Resposta.objects.filter(aluno_id=aluno_id)
+    antes = None
+    if cursor:
+        antes = decodificar_cursor(cursor)
+        data, resposta_id = antes
+        respostas = respostas.filter(Q(data_resposta__lt=data) | Q(data_resposta=data, id__lt=resposta_id))
+    linhas = list(
+        respostas.order_by('-data_resposta', '-id').values(
+            'id', 'submissao_id', 'pergunta_id', 'opcao_id', 'data_resposta',
+            'pergunta__texto', 'pergunta__tipo', 'pergunta__enquete_id', 'pergunta__enquete__titulo',
+            'opcao__texto',
+        )[:limite + 1]
+    )
+    # Com a página cheia de Resposta, arquivadas mais antigas que a última linha não entram
+    desde = linhas[-1]['data_resposta'] if len(linhas) > limite else None
+    arquivadas = respostas_arquivadas_do_aluno(aluno_id, antes=antes, desde=desde, quantidade=limite + 1)
+    if arquivadas:
+        linhas = _intercalar_arquivadas(linhas, arquivadas, limite)
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo_cursor = codificar_cursor(linhas[-1]['data_resposta'], linhas[-1]['id'])
+
+    resultados, enquetes, perguntas, opcoes = [], {}, {}, {}
+    for linha in linhas:
+        enquete_id = linha['pergunta__enquete_id']
+        arquivada = linha['id'] < 0
+        resultados.append({
+            'id': None if arquivada else linha['id'],
+            'arquivada': arquivada,
+            'submissao': linha['submissao_id'],
+            'enquete': enquete_id,
+            'pergunta': linha['pergunta_id'],
+            'opcao': linha['opcao_id'],
+            'data_resposta': linha['data_resposta'],
+        })
+        if enquete_id is not None:
+            enquetes.setdefault(enquete_id, {'id': enquete_id, 'titulo': linha['pergunta__enquete__titulo']})
+        perguntas.setdefault(linha['pergunta_id'], {
+            'id': linha['pergunta_id'],
+            'texto': linha['pergunta__texto'],
+            'tipo': linha['pergunta__tipo'],
+            'enquete': enquete_id,
+        })
+        opcoes.setdefault(linha['opcao_id'], {
+            'id': linha['opcao_id'],
+            'texto': linha['opcao__texto'],
+            'pergunta': linha['pergunta_id'],
+        })
+
+    return {
+        'results': resultados,
+        'enquetes': enquetes,
+        'perguntas': perguntas,
+        'opcoes': opcoes,
+        'proximo_cursor': proximo_cursor,
+    }
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import ChaveIdempotencia
+
+# Nome do cabeçalho HTTP enviado pelos clientes (DRF e FastAPI)
+HEADER = 'Idempotency-Key'
+HEADER_REEXECUCAO = 'Idempotent-Replayed'
+
+TAMANHO_MAXIMO_CHAVE = 255
+
+# Intervalo mínimo (em segundos) entre duas limpezas de chaves expiradas no mesmo processo
+INTERVALO_LIMPEZA = 300
+_ultima_limpeza = 0.0
+
+
+class ChaveInvalida(Exception):
+    pass
+
+
+class ConflitoIdempotencia(Exception):
+    """A chave já foi usada com um corpo de requisição diferente."""
+    pass
+
+
+def ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCIA_TTL_SEGUNDOS', 60 * 60 * 24))
+
+
+def calcular_hash(dados):
+    serializado = json.dumps(dados, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+def validar_chave(chave):
+    if not chave or len(chave) > TAMANHO_MAXIMO_CHAVE:
+        raise ChaveInvalida(f"O cabeçalho {HEADER} deve ter entre 1 e {TAMANHO_MAXIMO_CHAVE} caracteres.")
+    return chave
+
+
+def buscar_resultado(escopo, chave, hash_requisicao):
+    """
+    Retorna (status_code, corpo) já registrado para a chave ou None.
+    Chaves expiradas são tratadas como inexistentes.
+    """
+    registro = (
+        ChaveIdempotencia.objects
+        .filter(escopo=escopo, chave=chave, expira_em__gt=timezone.now())
+        .only('hash_requisicao', 'status_code', 'corpo')
+        .first()
+    )
+    if registro is None:
+        return None
+    if registro.hash_requisicao != hash_requisicao:
+        raise ConflitoIdempotencia(f"A chave '{chave}' já foi utilizada com outro conteúdo de requisição.")
+    return registro.status_code, registro.corpo
+
+
+def limpar_expiradas(forcar=False):
+    global _ultima_limpeza
+    agora = time.monotonic()
+    if not forcar and agora - _ultima_limpeza < INTERVALO_LIMPEZA:
+        return 0
+    _ultima_limpeza = agora
+    removidas, _ = ChaveIdempotencia.objects.filter(expira_em__lte=timezone.now()).delete()
+    return removidas
+
+
+def executar(escopo, chave, dados, processar):
+    """
+    Executa `processar()` no máximo uma vez por (escopo, chave).
+
+    `processar` deve validar e gravar as respostas, devolvendo (status_code, corpo).
+    O resultado é gravado na mesma transação das escritas, então uma nova tentativa
+    com a mesma chave recebe o resultado original sem revalidar nem gravar nada.
+
+    Retorna (status_code, corpo, reexecutado).
+    """
+    hash_requisicao = calcular_hash(dados)
+    resultado = buscar_resultado(escopo, chave, hash_requisicao)
+    if resultado is not None:
+        return resultado[0], resultado[1], True
+
+    limpar_expiradas()
+    # Remove um registro expirado com a mesma chave, que bloquearia a restrição de unicidade
+    ChaveIdempotencia.objects.filter(escopo=escopo, chave=chave, expira_em__lte=timezone.now()).delete()
+
+    try:
+        with transaction.atomic():
+            status_code, corpo = processar()
+            if status_code < 500:
+                ChaveIdempotencia.objects.create(
+                    escopo=escopo,
+                    chave=chave,
+                    hash_requisicao=hash_requisicao,
+                    status_code=status_code,
+                    corpo=corpo,
+                    expira_em=timezone.now() + ttl(),
+                )
+    except IntegrityError:
+        # Outra requisição com a mesma chave terminou primeiro: as escritas desta foram desfeitas
+        resultado = buscar_resultado(escopo, chave, hash_requisicao)
+        if resultado is None:
+            raise
+        return resultado[0], resultado[1], True
+
+    return status_code, corpo, False
@@ -1,24 +1,27 @@
-from django.core.management.base import BaseCommand
+from django.db.models import Case, Value, When
+from enquete import outbox
+from enquete.management.lotes import ComandoEmLotes
 from enquete.models import Pergunta
 
-class Command(BaseCommand):
+class Command(ComandoEmLotes):
     help = 'Atualiza valores de tipo de pergunta para os nomes constantes no código'
+    modelo = Pergunta
 
-    def handle(self, *args, **kwargs):
-        mapa_tipos = {
-            'unica': 'UNICA_ESCOLHA',
-            'multipla': 'MULTIPLA_ESCOLHA'
-        }
+    mapa_tipos = {
+        'unica': Pergunta.UNICA_ESCOLHA,
+        'multipla': Pergunta.MULTIPLA_ESCOLHA,
+    }
 
-        atualizadas = 0
-        for pergunta in Pergunta.objects.all():
-            if pergunta.tipo in mapa_tipos:
-                pergunta.tipo = mapa_tipos[pergunta.tipo]
-                pergunta.save()
-                atualizadas += 1
-                self.stdout.write(f'✅ Pergunta atualizada: {pergunta.texto[:50]}')
+    def filtrar(self, queryset):
+        return queryset.filter(tipo__in=self.mapa_tipos)
 
-        if atualizadas == 0:
-            self.stdout.write('⚠ Nenhuma pergunta precisava de ajuste.')
-        else:
-            self.stdout.write(f'\n🎉 {atualizadas} perguntas atualizadas com sucesso.')
+    def atualizar_lote(self, queryset):
+        # update() não dispara os sinais: as árvores em cache (com o tipo) das enquetes do
+        # lote são invalidadas aqui, na transação do lote, neste e nos demais processos
+        enquete_ids = set(queryset.values_list('enquete_id', flat=True))
+        # Um único UPDATE por lote, sem carregar as perguntas em memória
+        atualizados = queryset.update(tipo=Case(
+            *[When(tipo=antigo, then=Value(novo)) for antigo, novo in self.mapa_tipos.items()]
+        ))
+        outbox.invalidar_enquetes(enquete_ids)
+        return atualizados
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from enquete.arquivamento import arquivar_enquete
+from enquete.models import Enquete, Resposta
+
+class Command(BaseCommand):
+    help = 'Move as respostas de enquetes encerradas para arquivos colunares compactados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enquete', type=int, action='append', default=[],
+                            help='Id da enquete (pode ser repetido). Padrão: todas as encerradas')
+        parser.add_argument('--dias', type=int, default=0,
+                            help='Só arquiva enquetes expiradas há pelo menos N dias')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Apenas lista as enquetes e a quantidade de respostas que seriam arquivadas')
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+        encerradas = Enquete.objects.filter(
+            Q(ativa=False, data_expiracao__isnull=True) | Q(data_expiracao__lte=limite)
+        )
+        if options['enquete']:
+            encerradas = encerradas.filter(id__in=options['enquete'])
+        # Só as que ainda têm respostas nas tabelas
+        ids = list(
+            encerradas.filter(id__in=Resposta.objects.values('pergunta__enquete_id'))
+            .order_by('id').values_list('id', flat=True)
+        )
+        if not ids:
+            self.stdout.write('⚠ Nenhuma enquete encerrada com respostas para arquivar.')
+            return
+
+        if options['dry_run']:
+            for enquete_id in ids:
+                total = Resposta.objects.filter(pergunta__enquete_id=enquete_id).count()
+                self.stdout.write(f'🔎 [dry-run] enquete {enquete_id}: {total} respostas seriam arquivadas.')
+            return
+
+        total_linhas = 0
+        for enquete_id in ids:
+            arquivo = arquivar_enquete(enquete_id)
+            if arquivo is None:
+                continue
+            total_linhas += arquivo.linhas
+            self.stdout.write(
+                f'✅ enquete {enquete_id}: {arquivo.linhas} respostas em {arquivo.arquivo} '
+                f'({arquivo.tamanho_bytes / 1024:.1f} KiB)'
+            )
+        self.stdout.write(f'\n🎉 {len(ids)} enquetes arquivadas ({total_linhas} respostas no total).')
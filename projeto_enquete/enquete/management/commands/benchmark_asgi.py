@@ -0,0 +1,146 @@
+import importlib.util
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Rotas leves dos dois lados: uma listagem da API DRF e uma da FastAPI
+ROTA_DJANGO = '/api/enquetes/?fields=id,titulo'
+ROTA_FASTAPI = '/enquetes/?fields=id,titulo'
+
+
+def _rss_kib(pid):
+    """Memória residente (KiB) do processo e de todos os seus descendentes, via /proc (Linux)."""
+    total, pendentes = 0, [pid]
+    while pendentes:
+        atual = pendentes.pop()
+        try:
+            with open(f'/proc/{atual}/status') as status:
+                for linha in status:
+                    if linha.startswith('VmRSS:'):
+                        total += int(linha.split()[1])
+            for tarefa in Path(f'/proc/{atual}/task').iterdir():
+                pendentes.extend(int(filho) for filho in (tarefa / 'children').read_text().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+
+def _aguardar(url, timeout=60):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as resposta:
+                if resposta.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+        time.sleep(0.2)
+    raise CommandError(f'Servidor não respondeu em {timeout}s: {url}')
+
+
+def _carga(urls, duracao, concorrencia):
+    """Cada thread alterna entre as urls por `duracao` segundos. Retorna (requisições ok, erros, latências)."""
+    latencias, erros = [], [0]
+    trava = threading.Lock()
+    fim = time.monotonic() + duracao
+
+    def trabalhar(deslocamento):
+        locais, falhas, indice = [], 0, deslocamento
+        while time.monotonic() < fim:
+            inicio = time.perf_counter()
+            try:
+                with urllib.request.urlopen(urls[indice % len(urls)], timeout=10) as resposta:
+                    resposta.read()
+                locais.append(time.perf_counter() - inicio)
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                falhas += 1
+            indice += 1
+        with trava:
+            latencias.extend(locais)
+            erros[0] += falhas
+
+    threads = [threading.Thread(target=trabalhar, args=(i,)) for i in range(concorrencia)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencias), erros[0], sorted(latencias)
+
+
+class Command(BaseCommand):
+    help = 'Compara memória por worker e vazão do ASGI unificado com Django e FastAPI em servidores separados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Workers uvicorn por servidor')
+        parser.add_argument('--duracao', type=float, default=10, help='Segundos de carga por cenário')
+        parser.add_argument('--concorrencia', type=int, default=8, help='Requisições simultâneas')
+        parser.add_argument('--porta', type=int, default=8700, help='Primeira porta usada pelos servidores')
+
+    def _subir(self, alvo, porta, workers, *extras):
+        comando = [
+            sys.executable, '-m', 'uvicorn', alvo, '--port', str(porta),
+            '--workers', str(workers), '--log-level', 'warning', *extras,
+        ]
+        return subprocess.Popen(comando, cwd=settings.BASE_DIR)
+
+    def _cenario(self, nome, servidores, urls, options):
+        try:
+            for url in urls:
+                _aguardar(url)
+            # Aquecimento antes de medir a memória (imports e caches preguiçosos já carregados)
+            _carga(urls, 1, options['concorrencia'])
+            memoria = sum(_rss_kib(servidor.pid) for servidor in servidores)
+            ok, erros, latencias = _carga(urls, options['duracao'], options['concorrencia'])
+        finally:
+            for servidor in servidores:
+                servidor.terminate()
+            for servidor in servidores:
+                servidor.wait(timeout=30)
+
+        workers = options['workers'] * len(servidores)
+        p50 = latencias[len(latencias) // 2] * 1000 if latencias else 0
+        p95 = latencias[int(len(latencias) * 0.95)] * 1000 if latencias else 0
+        self.stdout.write(
+            f'📊 {nome}: {len(servidores)} servidor(es), {workers} workers | '
+            f'{memoria / 1024:.0f} MiB no total, {memoria / 1024 / workers:.0f} MiB por worker | '
+            f'{ok / options["duracao"]:.0f} req/s (p50 {p50:.1f} ms, p95 {p95:.1f} ms, {erros} erros)'
+        )
+        return memoria, ok
+
+    def handle(self, *args, **options):
+        if importlib.util.find_spec('uvicorn') is None:
+            raise CommandError('O benchmark precisa do uvicorn: pip install uvicorn')
+        porta, workers = options['porta'], options['workers']
+        prefixo = getattr(settings, 'FASTAPI_PREFIXO', '/fastapi')
+
+        self.stdout.write(f'⏱ {options["duracao"]:.0f}s de carga por cenário, {options["concorrencia"]} requisições simultâneas.\n')
+        memoria_separados, ok_separados = self._cenario(
+            'separados',
+            [
+                self._subir('projeto_enquete.asgi:application', porta, workers),
+                self._subir('main:app', porta + 1, workers, '--app-dir', 'fastapi_app'),
+            ],
+            [f'http://127.0.0.1:{porta}{ROTA_DJANGO}', f'http://127.0.0.1:{porta + 1}{ROTA_FASTAPI}'],
+            options,
+        )
+        # O unificado atende as duas aplicações com metade dos workers no total. Só o cache
+        # local é compartilhado: o Django usa a thread do sync_to_async e a FastAPI o pool de
+        # banco_async.ExecutorBanco, então cada worker abre até MAX_CONEXOES + 1 conexões
+        memoria_unificado, ok_unificado = self._cenario(
+            'unificado',
+            [self._subir('projeto_enquete.asgi_unificado:application', porta + 2, workers)],
+            [f'http://127.0.0.1:{porta + 2}{ROTA_DJANGO}', f'http://127.0.0.1:{porta + 2}{prefixo}{ROTA_FASTAPI}'],
+            options,
+        )
+
+        self.stdout.write(
+            f'\n🎉 Unificado: {memoria_unificado / memoria_separados:.0%} da memória e '
+            f'{ok_unificado / max(ok_separados, 1):.0%} da vazão dos servidores separados.'
+        )
@@ -0,0 +1,130 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.template import engines
+from django.test.utils import CaptureQueriesContext
+
+from enquete import autoria, questionario
+from enquete.cache import invalidar_enquetes
+from enquete.forms import RespostaForm
+from enquete.models import Area, Enquete, Pergunta
+
+# Marcação anterior de responder_enquete.html: um form.as_p por pergunta
+TEMPLATE_AS_P = """
+{% for item in perguntas_forms %}
+<div class="mb-4 p-3 border rounded shadow-sm">
+    <h5>{{ item.pergunta.texto }}</h5>
+    <div class="form-group">
+        {{ item.form.as_p }}
+        {% if item.form.errors %}
+        <div class="alert alert-danger mt-2" role="alert">
+            {% for field in item.form %}{% if field.errors %}<strong>{{ field.label }}:</strong>
+            {% for error in field.errors %}<p class="mb-0">{{ error }}</p>{% endfor %}{% endif %}{% endfor %}
+        </div>
+        {% endif %}
+    </div>
+</div>
+{% endfor %}
+"""
+
+
+class Rollback(Exception):
+    """Desfaz a enquete sintética criada para a medição."""
+
+
+def _enquete_sintetica(quantidade_perguntas, quantidade_opcoes):
+    area, _ = Area.objects.get_or_create(nome='Benchmark do questionário')
+    criada = autoria.criar_enquete({
+        'titulo': 'Benchmark do questionário',
+        'ativa': True,
+        'area': area.id,
+        'perguntas': [
+            {
+                'texto': f'Pergunta {numero} <com marcação> & acentuação?',
+                'tipo': Pergunta.MULTIPLA_ESCOLHA if numero % 3 == 0 else Pergunta.UNICA_ESCOLHA,
+                'ativa': True,
+                'opcoes': [
+                    {'texto': f'Opção {letra}', 'ativa': True, 'peso': 1}
+                    for letra in range(quantidade_opcoes)
+                ],
+            }
+            for numero in range(quantidade_perguntas)
+        ],
+    })
+    return Enquete.objects.get(pk=criada['id'])
+
+
+def _medir(funcao, repeticoes):
+    """(ms por renderização, consultas por renderização, tamanho do HTML)."""
+    html = funcao()
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        decorrido = time.perf_counter() - inicio
+    return decorrido / repeticoes * 1000, len(consultas) / repeticoes, len(html)
+
+
+class Command(BaseCommand):
+    help = 'Compara a renderização do questionário (responder_enquete) com form.as_p e com o renderizador leve'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enquete', type=int, help='Mede uma enquete existente em vez da sintética')
+        parser.add_argument('--perguntas', type=int, default=50, help='Perguntas da enquete sintética')
+        parser.add_argument('--opcoes', type=int, default=5, help='Opções por pergunta da enquete sintética')
+        parser.add_argument('--repeticoes', type=int, default=20, help='Renderizações medidas por cenário')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['enquete']:
+                    try:
+                        enquete = Enquete.objects.get(pk=options['enquete'])
+                    except Enquete.DoesNotExist:
+                        raise CommandError(f'Enquete {options["enquete"]} não encontrada.')
+                else:
+                    enquete = _enquete_sintetica(options['perguntas'], options['opcoes'])
+                self._comparar(enquete, options['repeticoes'])
+                raise Rollback
+        except Rollback:
+            pass
+        if not options['enquete']:
+            # A árvore da enquete desfeita não pode ficar no cache para um id que será reaproveitado
+            invalidar_enquetes([enquete.id])
+            self.stdout.write('🧹 Enquete sintética desfeita.')
+
+    def _comparar(self, enquete, repeticoes):
+        template_as_p = engines['django'].from_string(TEMPLATE_AS_P)
+        perguntas = list(enquete.perguntas.filter(ativa=True).order_by('id'))
+
+        def com_as_p():
+            forms = [
+                {'pergunta': pergunta, 'form': RespostaForm(pergunta=pergunta, prefix=f'pergunta_{pergunta.id}')}
+                for pergunta in perguntas
+            ]
+            return template_as_p.render({'perguntas_forms': forms})
+
+        def com_renderizador():
+            return questionario.renderizar(questionario.montar(enquete))
+
+        arvore = questionario.montar(enquete)
+
+        self.stdout.write(
+            f'⏱ "{enquete.titulo}": {len(perguntas)} perguntas, '
+            f'{sum(len(pergunta["opcoes"]) for pergunta in arvore)} opções, {repeticoes} renderizações por cenário.\n'
+        )
+        cenarios = [
+            ('form.as_p', com_as_p),
+            ('renderizador (árvore do cache)', com_renderizador),
+            ('renderizador (só o template)', lambda: questionario.renderizar(arvore)),
+        ]
+        referencia = None
+        for nome, funcao in cenarios:
+            ms, consultas, tamanho = _medir(funcao, repeticoes)
+            referencia = referencia or ms
+            self.stdout.write(
+                f'📊 {nome}: {ms:.2f} ms por página, {consultas:.0f} consultas, '
+                f'{tamanho / 1024:.1f} KiB de HTML ({referencia / ms:.1f}x)'
+            )
+        self.stdout.write('\n🎉 Medição concluída.')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from enquete.series import consolidar
+
+class Command(BaseCommand):
+    help = 'Reconstrói as respostas por hora (séries de respostas por período) a partir das respostas gravadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enquete', type=int, action='append', default=[],
+                            help='Id da enquete (pode ser repetido). Padrão: todas')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = consolidar(options['enquete'] or None)
+        alvo = f"{len(options['enquete'])} enquete(s)" if options['enquete'] else 'todas as enquetes'
+        self.stdout.write(f'✅ {total} horas consolidadas ({alvo}).')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from enquete.expiracao import desativar_expiradas
+
+class Command(BaseCommand):
+    help = 'Desativa as enquetes cuja data de expiração já passou (para uso em cron)'
+
+    def handle(self, *args, **kwargs):
+        ids = desativar_expiradas()
+        if not ids:
+            self.stdout.write('⚠ Nenhuma enquete expirada para desativar.')
+        else:
+            self.stdout.write(f'🎉 {len(ids)} enquetes expiradas desativadas.')
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from enquete.models import Area, Enquete
+from enquete.relatorios import gerar_relatorio_enquete, iniciar_worker
+
+class Command(BaseCommand):
+    help = 'Gera os relatórios por área (JSON e HTML) processando as enquetes em paralelo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--area', action='append', default=[],
+                            help='Slug da área (pode ser repetido). Padrão: todas as áreas')
+        parser.add_argument('--saida', default=str(Path(settings.BASE_DIR) / 'relatorios'),
+                            help='Diretório onde os relatórios serão gravados')
+        parser.add_argument('--processos', type=int, default=os.cpu_count() or 1,
+                            help='Número de processos; 1 executa tudo no processo atual')
+        parser.add_argument('--formato', choices=['json', 'html', 'ambos'], default='ambos')
+
+    def handle(self, *args, **options):
+        enquetes = Enquete.objects.order_by('area_id', 'id')
+        if options['area']:
+            areas = Area.objects.filter(slug__in=options['area'])
+            if areas.count() != len(set(options['area'])):
+                raise CommandError('Uma ou mais áreas informadas não existem.')
+            enquetes = enquetes.filter(area__in=areas)
+        ids = list(enquetes.values_list('id', flat=True))
+        if not ids:
+            self.stdout.write('⚠ Nenhuma enquete encontrada para gerar relatórios.')
+            return
+
+        inicio = time.monotonic()
+        processos = max(1, options['processos'])
+        por_area = defaultdict(list)
+        if processos == 1:
+            resultados = map(gerar_relatorio_enquete, ids)
+            for relatorio in resultados:
+                por_area[relatorio['area']['slug']].append(relatorio)
+        else:
+            # Conexões abertas não podem ser herdadas pelos processos filhos
+            connections.close_all()
+            chunksize = max(1, len(ids) // (processos * 4))
+            with ProcessPoolExecutor(max_workers=processos, initializer=iniciar_worker) as executor:
+                for relatorio in executor.map(gerar_relatorio_enquete, ids, chunksize=chunksize):
+                    por_area[relatorio['area']['slug']].append(relatorio)
+
+        saida = Path(options['saida'])
+        saida.mkdir(parents=True, exist_ok=True)
+        gerado_em = timezone.now()
+        for slug, relatorios in por_area.items():
+            conteudo = {
+                'area': relatorios[0]['area'],
+                'gerado_em': gerado_em.isoformat(),
+                'total_enquetes': len(relatorios),
+                'enquetes': relatorios,
+            }
+            if options['formato'] in ('json', 'ambos'):
+                with open(saida / f'{slug}.json', 'w', encoding='utf-8') as arquivo:
+                    json.dump(conteudo, arquivo, ensure_ascii=False, indent=2)
+            if options['formato'] in ('html', 'ambos'):
+                html = render_to_string('enquete/relatorio_area.html', conteudo)
+                with open(saida / f'{slug}.html', 'w', encoding='utf-8') as arquivo:
+                    arquivo.write(html)
+            self.stdout.write(f'✅ {slug}: {len(relatorios)} enquetes')
+
+        decorrido = time.monotonic() - inicio
+        self.stdout.write(
+            f'\n🎉 {len(ids)} enquetes em {len(por_area)} áreas processadas em {decorrido:.1f}s '
+            f'({len(ids) / decorrido:.1f} enquetes/s, {processos} processos). Arquivos em {saida}.'
+        )
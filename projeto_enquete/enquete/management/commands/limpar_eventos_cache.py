@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from enquete import outbox
+
+class Command(BaseCommand):
+    help = 'Remove do outbox de invalidação os eventos mais antigos que a retenção configurada'
+
+    def handle(self, *args, **kwargs):
+        removidos = outbox.limpar_antigos(forcar=True)
+        self.stdout.write(f'🧹 {removidos} eventos de invalidação antigos removidos.')
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from enquete import idempotencia
+
+class Command(BaseCommand):
+    help = 'Remove as chaves de idempotência expiradas'
+
+    def handle(self, *args, **kwargs):
+        removidas = idempotencia.limpar_expiradas(forcar=True)
+        self.stdout.write(f'🧹 {removidas} chaves de idempotência expiradas removidas.')
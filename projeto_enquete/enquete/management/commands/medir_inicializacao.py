@@ -0,0 +1,80 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Executado em um processo novo a cada repetição: importa a aplicação FastAPI a frio,
+# roda o lifespan (conexões + cache) e devolve os tempos em JSON na saída padrão
+SCRIPT = """
+import asyncio, json, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, {diretorio!r})
+import main
+
+async def iniciar():
+    async with main.app.router.lifespan_context(main.app):
+        return dict(main.app.state.inicializacao)
+
+tempos = asyncio.run(iniciar())
+tempos['total_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+print(json.dumps(tempos))
+"""
+
+
+def _modulos_mais_lentos(saida_importtime, quantidade):
+    """(tempo acumulado em ms, módulo) dos imports de primeiro nível mais caros em -X importtime."""
+    modulos = []
+    for linha in saida_importtime.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, acumulado, nome = linha.split('|')
+        # Filhos diretos de `main`: o nome vem recuado por 3 espaços
+        if nome.startswith('   ') and not nome.startswith('     '):
+            modulos.append((int(acumulado) / 1000, nome.strip()))
+    return sorted(modulos, reverse=True)[:quantidade]
+
+
+class Command(BaseCommand):
+    help = 'Mede a inicialização a frio de um worker FastAPI (importação, conexões e cache)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=3,
+                            help='Quantidade de inicializações medidas (cada uma em um processo novo)')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Quantidade de módulos mais lentos listados no perfil de importação')
+        parser.add_argument('--limite-ms', type=float, default=0,
+                            help='Falha se a média do tempo total passar deste valor (0 = sem limite)')
+
+    def handle(self, *args, **options):
+        diretorio = str(Path(settings.BASE_DIR) / 'fastapi_app')
+        script = SCRIPT.format(diretorio=diretorio)
+
+        medicoes, perfil = [], ''
+        for repeticao in range(options['repeticoes']):
+            # A primeira repetição também coleta o perfil de importação
+            comando = [sys.executable] + (['-X', 'importtime'] if repeticao == 0 else []) + ['-c', script]
+            processo = subprocess.run(comando, capture_output=True, text=True)
+            if processo.returncode != 0:
+                raise CommandError(f'Falha ao iniciar a aplicação FastAPI:\n{processo.stderr[-2000:]}')
+            if repeticao == 0:
+                perfil = processo.stderr
+            medicoes.append(json.loads(processo.stdout.strip().splitlines()[-1]))
+            tempos = medicoes[-1]
+            self.stdout.write(
+                f'⏱ inicialização {repeticao + 1}: {tempos["total_ms"]:.0f} ms no total | '
+                f'importação {tempos["importacao_ms"]:.0f} ms | lifespan {tempos["lifespan_ms"]:.0f} ms '
+                f'(conexões {tempos.get("conexoes_ms", 0):.0f} ms, cache {tempos.get("cache_ms", 0):.0f} ms, '
+                f'{tempos.get("enquetes_em_cache", 0)} enquetes)'
+            )
+
+        self.stdout.write('\n📦 Imports mais lentos (primeiro nível, tempo acumulado):')
+        for tempo, modulo in _modulos_mais_lentos(perfil, options['top']):
+            self.stdout.write(f'  {tempo:8.1f} ms  {modulo}')
+
+        media = sum(tempos['total_ms'] for tempos in medicoes) / len(medicoes)
+        self.stdout.write(f'\n🎉 Média de {media:.0f} ms em {len(medicoes)} inicializações.')
+        if options['limite_ms'] and media > options['limite_ms']:
+            raise CommandError(f'Inicialização média de {media:.0f} ms acima do limite de {options["limite_ms"]:.0f} ms.')
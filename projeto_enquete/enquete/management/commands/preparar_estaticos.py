@@ -0,0 +1,59 @@
+import posixpath
+from pathlib import Path
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from enquete import estaticos
+
+
+def _tamanho(caminho):
+    return caminho.stat().st_size if caminho.is_file() else 0
+
+
+class Command(BaseCommand):
+    help = 'Gera os estáticos versionados (hash no nome), pré-comprimidos e com imagens otimizadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limpar', action='store_true',
+                            help='Apaga STATIC_ROOT antes de coletar (remove versões antigas)')
+
+    def handle(self, *args, **options):
+        if not isinstance(staticfiles_storage, estaticos.EstaticosOtimizados):
+            raise CommandError("Configure STORAGES['staticfiles'] com enquete.estaticos.EstaticosOtimizados.")
+
+        call_command('collectstatic', interactive=False, clear=options['limpar'], verbosity=0)
+        # O storage carregou o manifesto antigo ao iniciar; relê o recém-gravado
+        staticfiles_storage.hashed_files, staticfiles_storage.manifest_hash = staticfiles_storage.load_manifest()
+
+        raiz = Path(staticfiles_storage.location)
+        texto = {'original': 0, '.gz': 0, '.br': 0}
+        imagens = {'original': 0, 'otimizado': 0}
+        for original, versionado in staticfiles_storage.hashed_files.items():
+            extensao = posixpath.splitext(versionado)[1].lower()
+            if extensao in estaticos.EXTENSOES_TEXTO:
+                tamanho = _tamanho(raiz / versionado)
+                texto['original'] += tamanho
+                for variante in ('.gz', '.br'):
+                    # Sem variante (arquivo pequeno ou compressão sem ganho) conta o original
+                    texto[variante] += _tamanho(raiz / f'{versionado}{variante}') or tamanho
+            elif extensao in estaticos.EXTENSOES_IMAGEM:
+                imagens['original'] += _tamanho(raiz / original)
+                imagens['otimizado'] += _tamanho(raiz / versionado)
+
+        self.stdout.write(
+            f'✅ {len(staticfiles_storage.hashed_files)} arquivos versionados em {raiz} '
+            f'(manifesto: {staticfiles_storage.manifest_name})'
+        )
+        self.stdout.write(
+            f'🗜 Texto: {texto["original"] / 1024:.1f} KiB → gzip {texto[".gz"] / 1024:.1f} KiB'
+            + (f', brotli {texto[".br"] / 1024:.1f} KiB' if estaticos.brotli is not None else ' (brotli não instalado)')
+        )
+        if estaticos.Image is None:
+            self.stdout.write('⚠ Pillow não instalado: imagens copiadas sem otimização.')
+        else:
+            self.stdout.write(
+                f'🖼 Imagens: {imagens["original"] / 1024:.1f} KiB → {imagens["otimizado"] / 1024:.1f} KiB'
+            )
+        self.stdout.write('\n🎉 Estáticos prontos; arquivos com hash são servidos com cache imutável de um ano.')
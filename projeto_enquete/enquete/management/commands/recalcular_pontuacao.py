@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from enquete.pontuacao import recalcular
+
+class Command(BaseCommand):
+    help = 'Recalcula a pontuação das submissões e os rankings com os pesos atuais das opções'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            atualizados = recalcular()
+        for modelo, total in atualizados.items():
+            self.stdout.write(f'✅ {modelo}: {total} registros recalculados.')
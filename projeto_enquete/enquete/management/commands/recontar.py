@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from enquete.contadores import recontar
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores de enquetes, perguntas e opções (corrige divergências)'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            atualizados = recontar()
+        for modelo, total in atualizados.items():
+            self.stdout.write(f'✅ {modelo}: {total} registros recontados.')
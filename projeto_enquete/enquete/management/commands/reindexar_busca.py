@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from enquete import busca
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca textual de enquetes e perguntas'
+
+    def handle(self, *args, **kwargs):
+        if connection.vendor != 'sqlite':
+            self.stdout.write('⚠ O índice FTS5 só é usado com SQLite; nada a fazer.')
+            return
+        with transaction.atomic():
+            total = busca.reconstruir()
+        self.stdout.write(f'🎉 Índice de busca reconstruído com {total} registros.')
@@ -0,0 +1,105 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from enquete.models import CheckpointLote
+
+
+class ComandoEmLotes(BaseCommand):
+    """
+    Base para comandos de correção de dados em tabelas grandes.
+
+    A tabela é percorrida em lotes por faixa de chave primária. Cada lote é corrigido
+    com um UPDATE ... WHERE (atualizar_lote) e o checkpoint é gravado na mesma transação,
+    então um comando interrompido continua de onde parou na próxima execução.
+
+    Subclasses definem `modelo`, `filtrar()` (linhas que precisam de ajuste) e
+    `atualizar_lote()` (retorna a quantidade de linhas alteradas).
+    """
+    modelo = None
+    tamanho_lote_padrao = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanho-lote', type=int, default=self.tamanho_lote_padrao,
+                            help='Quantidade de linhas (por chave primária) em cada lote')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Apenas conta as linhas que seriam alteradas')
+        parser.add_argument('--recomecar', action='store_true',
+                            help='Ignora o checkpoint salvo e começa do início da tabela')
+        parser.add_argument('--pausa', type=float, default=0,
+                            help='Segundos de espera entre lotes, para aliviar o banco')
+
+    def filtrar(self, queryset):
+        return queryset
+
+    def atualizar_lote(self, queryset):
+        raise NotImplementedError
+
+    def nome_checkpoint(self):
+        return self.__module__.rsplit('.', 1)[-1]
+
+    def limite_do_lote(self, inicio, tamanho):
+        """Maior pk do próximo lote: a tamanho-ésima linha depois de `inicio` (busca pelo índice)."""
+        pks = self.modelo._base_manager.filter(pk__gt=inicio).order_by('pk').values_list('pk', flat=True)
+        limite = pks[tamanho - 1:tamanho].first()
+        if limite is None:
+            limite = pks.order_by('-pk').first()
+        return limite
+
+    def handle(self, *args, **options):
+        tamanho = options['tamanho_lote']
+        nome = self.nome_checkpoint()
+
+        checkpoint, _ = CheckpointLote.objects.get_or_create(nome=nome)
+        if options['recomecar'] or checkpoint.concluido:
+            checkpoint.ultimo_pk = 0
+            checkpoint.processados = 0
+            checkpoint.atualizados = 0
+            checkpoint.concluido = False
+        elif checkpoint.ultimo_pk:
+            self.stdout.write(f'↪ Retomando {nome} a partir da chave {checkpoint.ultimo_pk}.')
+
+        pendentes = self.filtrar(self.modelo._base_manager.filter(pk__gt=checkpoint.ultimo_pk))
+        if options['dry_run']:
+            total = pendentes.count()
+            self.stdout.write(f'🔎 [dry-run] {total} registros seriam atualizados em lotes de {tamanho}.')
+            return
+
+        inicio_execucao = time.monotonic()
+        processados_execucao = 0
+        lote = 0
+        while True:
+            limite = self.limite_do_lote(checkpoint.ultimo_pk, tamanho)
+            if limite is None:
+                break
+
+            lote += 1
+            faixa = self.modelo._base_manager.filter(pk__gt=checkpoint.ultimo_pk, pk__lte=limite)
+            with transaction.atomic():
+                atualizados = self.atualizar_lote(self.filtrar(faixa))
+                processados = faixa.count()
+                checkpoint.processados += processados
+                checkpoint.atualizados += atualizados
+                checkpoint.ultimo_pk = limite
+                checkpoint.save()
+
+            processados_execucao += processados
+            decorrido = time.monotonic() - inicio_execucao
+            taxa = processados_execucao / decorrido if decorrido else 0
+            self.stdout.write(
+                f'  lote {lote}: chaves até {limite} | {atualizados} atualizados '
+                f'| {checkpoint.atualizados} no total | {taxa:.0f} linhas/s'
+            )
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        checkpoint.concluido = True
+        checkpoint.save()
+        self.finalizar(checkpoint)
+
+    def finalizar(self, checkpoint):
+        if checkpoint.atualizados == 0:
+            self.stdout.write('⚠ Nenhum registro precisava de ajuste.')
+        else:
+            self.stdout.write(f'\n🎉 {checkpoint.atualizados} registros atualizados com sucesso.')
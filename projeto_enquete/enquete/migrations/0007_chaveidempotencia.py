@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0006_alter_pergunta_enquete_alter_pergunta_tipo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('escopo', models.CharField(max_length=100)),
+                ('chave', models.CharField(max_length=255)),
+                ('hash_requisicao', models.CharField(max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('corpo', models.JSONField()),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('expira_em', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Chave de Idempotência',
+                'verbose_name_plural': 'Chaves de Idempotência',
+                'unique_together': {('escopo', 'chave')},
+            },
+        ),
+    ]
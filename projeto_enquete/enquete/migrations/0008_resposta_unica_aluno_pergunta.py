@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:36
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remover_respostas_duplicadas(apps, schema_editor):
+    """Mantém apenas a resposta mais recente (por data_resposta) de cada aluno por pergunta."""
+    for nome_modelo in ('Resposta', 'MultiplaEscolhaResposta'):
+        Modelo = apps.get_model('enquete', nome_modelo)
+        duplicadas = (
+            Modelo.objects.filter(aluno__isnull=False)
+            .values('aluno', 'pergunta')
+            .annotate(total=Count('id'))
+            .filter(total__gt=1)
+            .order_by()
+        )
+        for grupo in duplicadas:
+            respostas = Modelo.objects.filter(aluno=grupo['aluno'], pergunta=grupo['pergunta'])
+            mais_recente = respostas.order_by('-data_resposta', '-id').values_list('id', flat=True).first()
+            respostas.exclude(id=mais_recente).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0007_chaveidempotencia'),
+    ]
+
+    operations = [
+        migrations.RunPython(remover_respostas_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='multiplaescolharesposta',
+            constraint=models.UniqueConstraint(fields=('aluno', 'pergunta'), name='multipla_resposta_unica_aluno_pergunta'),
+        ),
+        migrations.AddConstraint(
+            model_name='resposta',
+            constraint=models.UniqueConstraint(fields=('aluno', 'pergunta'), name='resposta_unica_aluno_pergunta'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0008_resposta_unica_aluno_pergunta'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enquete',
+            index=models.Index(fields=['ativa', 'data_expiracao'], name='enquete_ativa_expiracao_idx'),
+        ),
+    ]
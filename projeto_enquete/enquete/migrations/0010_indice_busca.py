@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+def criar_indice_busca(apps, schema_editor):
+    # FTS5 só existe no SQLite; nos demais bancos a busca usa icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS enquete_busca USING fts5(
+            tipo UNINDEXED,
+            enquete_id UNINDEXED,
+            titulo,
+            conteudo,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    schema_editor.execute(
+        "INSERT INTO enquete_busca (rowid, tipo, enquete_id, titulo, conteudo) "
+        "SELECT id * 2, 'enquete', id, titulo, COALESCE(descricao, '') FROM enquete_enquete"
+    )
+    schema_editor.execute(
+        "INSERT INTO enquete_busca (rowid, tipo, enquete_id, titulo, conteudo) "
+        "SELECT id * 2 + 1, 'pergunta', enquete_id, '', texto FROM enquete_pergunta"
+    )
+
+
+def remover_indice_busca(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS enquete_busca")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0009_enquete_ativa_expiracao_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice_busca, remover_indice_busca),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:41
+
+from django.db import migrations, models
+
+
+def preencher_contadores(apps, schema_editor):
+    from enquete.contadores import recontar
+    recontar(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0010_indice_busca'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='area',
+            name='num_enquetes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='area',
+            name='num_enquetes_ativas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enquete',
+            name='num_perguntas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enquete',
+            name='num_perguntas_ativas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='pergunta',
+            name='num_opcoes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='pergunta',
+            name='num_opcoes_ativas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0011_contadores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckpointLote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True)),
+                ('ultimo_pk', models.BigIntegerField(default=0)),
+                ('processados', models.BigIntegerField(default=0)),
+                ('atualizados', models.BigIntegerField(default=0)),
+                ('concluido', models.BooleanField(default=False)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de Lote',
+                'verbose_name_plural': 'Checkpoints de Lotes',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0012_checkpointlote'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='multiplaescolharesposta',
+            name='data_resposta',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='resposta',
+            name='data_resposta',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
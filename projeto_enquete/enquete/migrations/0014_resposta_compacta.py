@@ -0,0 +1,82 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:48
+
+from django.db import migrations, models
+
+MULTIPLA_ESCOLHA = 'MULTIPLA_ESCOLHA'
+
+
+def copiar_multiplas_para_resposta(apps, schema_editor):
+    """Cada opção marcada de uma MultiplaEscolhaResposta vira uma linha de Resposta."""
+    Resposta = apps.get_model('enquete', 'Resposta')
+    MultiplaEscolhaResposta = apps.get_model('enquete', 'MultiplaEscolhaResposta')
+    OpcaoEscolhida = MultiplaEscolhaResposta.opcoes.through
+    resposta = Resposta._meta.db_table
+    multipla = MultiplaEscolhaResposta._meta.db_table
+    escolhida = OpcaoEscolhida._meta.db_table
+    # INSERT ... SELECT: copia tudo no banco, preservando data_resposta (bulk_create
+    # sobrescreveria o auto_now_add)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {resposta} (aluno_id, pergunta_id, opcao_id, data_resposta) "
+            f"SELECT m.aluno_id, m.pergunta_id, e.opcao_id, m.data_resposta "
+            f"FROM {multipla} m INNER JOIN {escolhida} e ON e.multiplaescolharesposta_id = m.id "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {resposta} r WHERE r.aluno_id = m.aluno_id "
+            f"AND r.pergunta_id = m.pergunta_id AND r.opcao_id = e.opcao_id)"
+        )
+
+
+def restaurar_multiplas(apps, schema_editor):
+    """Volta as linhas de perguntas de múltipla escolha para o modelo antigo, agrupadas por aluno."""
+    Resposta = apps.get_model('enquete', 'Resposta')
+    MultiplaEscolhaResposta = apps.get_model('enquete', 'MultiplaEscolhaResposta')
+    OpcaoEscolhida = MultiplaEscolhaResposta.opcoes.through
+
+    linhas = Resposta.objects.filter(pergunta__tipo=MULTIPLA_ESCOLHA).order_by('aluno_id', 'pergunta_id', 'id')
+    grupos = {}
+    for linha in linhas.iterator():
+        chave = (linha.aluno_id, linha.pergunta_id) if linha.aluno_id is not None else ('anonima', linha.pk)
+        if chave not in grupos:
+            grupos[chave] = MultiplaEscolhaResposta.objects.create(aluno_id=linha.aluno_id, pergunta_id=linha.pergunta_id)
+            MultiplaEscolhaResposta.objects.filter(pk=grupos[chave].pk).update(data_resposta=linha.data_resposta)
+        OpcaoEscolhida.objects.create(multiplaescolharesposta_id=grupos[chave].pk, opcao_id=linha.opcao_id)
+    linhas.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0013_data_resposta_index'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='resposta',
+            name='resposta_unica_aluno_pergunta',
+        ),
+        migrations.AddIndex(
+            model_name='resposta',
+            index=models.Index(fields=['pergunta', 'opcao'], name='resposta_pergunta_opcao_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resposta',
+            constraint=models.UniqueConstraint(fields=('aluno', 'pergunta', 'opcao'), name='resposta_unica_aluno_pergunta_opcao'),
+        ),
+        migrations.RunPython(copiar_multiplas_para_resposta, restaurar_multiplas),
+        migrations.DeleteModel(
+            name='MultiplaEscolhaResposta',
+        ),
+        migrations.CreateModel(
+            name='MultiplaEscolhaResposta',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Resposta Múltipla Escolha',
+                'verbose_name_plural': 'Respostas Múltiplas Escolhas',
+                'ordering': ['-data_resposta'],
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('enquete.resposta',),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+UNICA_ESCOLHA = 'UNICA_ESCOLHA'
+ORIGEM_LEGADO = 'legado'
+# Respostas anônimas antigas gravadas com até este intervalo entre si são tratadas como um envio
+INTERVALO_ENVIO_SEGUNDOS = 2
+TAMANHO_LOTE = 1000
+
+
+def criar_submissoes(apps, schema_editor):
+    """
+    Agrupa as respostas existentes em submissões. Para alunos identificados há uma por
+    (aluno, enquete), criada direto no banco com INSERT ... SELECT. Respostas anônimas não
+    têm como ser agrupadas com certeza: linhas consecutivas da mesma enquete, sem pergunta
+    repetida e gravadas em poucos segundos, viram um mesmo envio.
+    """
+    Submissao = apps.get_model('enquete', 'Submissao')
+    Resposta = apps.get_model('enquete', 'Resposta')
+    Pergunta = apps.get_model('enquete', 'Pergunta')
+    submissao = Submissao._meta.db_table
+    resposta = Resposta._meta.db_table
+    pergunta = Pergunta._meta.db_table
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {submissao} (aluno_id, enquete_id, origem, criada_em, atualizada_em) "
+            f"SELECT r.aluno_id, p.enquete_id, %s, MIN(r.data_resposta), MAX(r.data_resposta) "
+            f"FROM {resposta} r INNER JOIN {pergunta} p ON p.id = r.pergunta_id "
+            f"WHERE r.aluno_id IS NOT NULL GROUP BY r.aluno_id, p.enquete_id",
+            [ORIGEM_LEGADO],
+        )
+        cursor.execute(
+            f"UPDATE {resposta} SET submissao_id = ("
+            f"SELECT s.id FROM {submissao} s INNER JOIN {pergunta} p ON p.enquete_id = s.enquete_id "
+            f"WHERE s.aluno_id = {resposta}.aluno_id AND p.id = {resposta}.pergunta_id"
+            f") WHERE aluno_id IS NOT NULL"
+        )
+
+    anonimas = (
+        Resposta.objects.filter(aluno__isnull=True)
+        .order_by('pergunta__enquete_id', 'data_resposta', 'id')
+        .values_list('id', 'pergunta_id', 'opcao_id', 'pergunta__enquete_id', 'pergunta__tipo', 'data_resposta')
+    )
+    grupos = []
+    atual = None
+    for resposta_id, pergunta_id, opcao_id, enquete_id, tipo, data in anonimas.iterator(chunk_size=TAMANHO_LOTE):
+        repetida = atual is not None and (
+            (pergunta_id, opcao_id) in atual['escolhas']
+            or (tipo == UNICA_ESCOLHA and pergunta_id in atual['perguntas'])
+        )
+        if (
+            atual is None
+            or repetida
+            or enquete_id != atual['enquete_id']
+            or (data - atual['fim']).total_seconds() > INTERVALO_ENVIO_SEGUNDOS
+        ):
+            atual = {'enquete_id': enquete_id, 'inicio': data, 'fim': data, 'ids': [], 'perguntas': set(), 'escolhas': set()}
+            grupos.append(atual)
+        atual['fim'] = data
+        atual['ids'].append(resposta_id)
+        atual['perguntas'].add(pergunta_id)
+        atual['escolhas'].add((pergunta_id, opcao_id))
+
+    for inicio in range(0, len(grupos), TAMANHO_LOTE):
+        lote = grupos[inicio:inicio + TAMANHO_LOTE]
+        submissoes = Submissao.objects.bulk_create(
+            [Submissao(enquete_id=grupo['enquete_id'], origem=ORIGEM_LEGADO) for grupo in lote]
+        )
+        # bulk_create preenche os campos auto_now; as datas reais vêm das respostas
+        for submissao, grupo in zip(submissoes, lote):
+            submissao.criada_em = grupo['inicio']
+            submissao.atualizada_em = grupo['fim']
+        Submissao.objects.bulk_update(submissoes, ['criada_em', 'atualizada_em'])
+        for submissao, grupo in zip(submissoes, lote):
+            Resposta.objects.filter(id__in=grupo['ids']).update(submissao=submissao)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0014_resposta_compacta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Submissao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origem', models.CharField(choices=[('web', 'Site'), ('api', 'API REST'), ('fastapi', 'FastAPI'), ('legado', 'Anterior às submissões')], max_length=20)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizada_em', models.DateTimeField(auto_now=True)),
+                ('aluno', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='submissoes', to='enquete.aluno')),
+                ('enquete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissoes', to='enquete.enquete')),
+            ],
+            options={
+                'verbose_name': 'Submissão',
+                'verbose_name_plural': 'Submissões',
+                'ordering': ['-criada_em'],
+                'indexes': [models.Index(fields=['enquete', 'criada_em'], name='submissao_enquete_criada_idx')],
+                'constraints': [models.UniqueConstraint(fields=('aluno', 'enquete'), name='submissao_unica_aluno_enquete')],
+            },
+        ),
+        migrations.AddField(
+            model_name='resposta',
+            name='submissao',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='respostas', to='enquete.submissao'),
+        ),
+        migrations.RunPython(criar_submissoes, migrations.RunPython.noop),
+    ]
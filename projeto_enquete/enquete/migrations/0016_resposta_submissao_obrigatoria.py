@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0015_submissao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resposta',
+            name='submissao',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='respostas', to='enquete.submissao'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='resposta',
+            name='resposta_unica_aluno_pergunta_opcao',
+        ),
+        migrations.AddConstraint(
+            model_name='resposta',
+            constraint=models.UniqueConstraint(fields=('submissao', 'pergunta', 'opcao'), name='resposta_unica_submissao_pergunta_opcao'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0016_resposta_submissao_obrigatoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoRespostas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arquivo', models.CharField(max_length=255)),
+                ('linhas', models.PositiveIntegerField(default=0)),
+                ('tamanho_bytes', models.PositiveBigIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('enquete', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='arquivo_respostas', to='enquete.enquete')),
+            ],
+            options={
+                'verbose_name': 'Arquivo de Respostas',
+                'verbose_name_plural': 'Arquivos de Respostas',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0017_arquivorespostas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='resposta',
+            index=models.Index(fields=['aluno', '-data_resposta', '-id'], name='resposta_aluno_historico_idx'),
+        ),
+    ]
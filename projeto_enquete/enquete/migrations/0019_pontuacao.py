@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0018_resposta_aluno_historico_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submissao',
+            name='pontos',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='submissao',
+            name='pontos_tecnologias',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.CreateModel(
+            name='Pontuacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('escopo', models.CharField(choices=[('enquete', 'Enquete'), ('area', 'Área'), ('tecnologia', 'Tecnologia')], max_length=20)),
+                ('referencia_id', models.PositiveIntegerField()),
+                ('pontos', models.IntegerField(default=0)),
+                ('atualizada_em', models.DateTimeField(auto_now=True)),
+                ('aluno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pontuacoes', to='enquete.aluno')),
+            ],
+            options={
+                'verbose_name': 'Pontuação',
+                'verbose_name_plural': 'Pontuações',
+                'indexes': [models.Index(fields=['escopo', 'referencia_id', '-pontos', 'aluno'], name='pontuacao_ranking_idx')],
+                'constraints': [models.UniqueConstraint(fields=('escopo', 'referencia_id', 'aluno'), name='pontuacao_unica_escopo_aluno')],
+            },
+        ),
+    ]
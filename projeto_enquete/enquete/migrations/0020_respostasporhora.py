@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0019_pontuacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespostasPorHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField()),
+                ('respostas', models.PositiveIntegerField(default=0)),
+                ('respondentes', models.PositiveIntegerField(default=0)),
+                ('enquete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='respostas_por_hora', to='enquete.enquete')),
+            ],
+            options={
+                'verbose_name': 'Respostas por Hora',
+                'verbose_name_plural': 'Respostas por Hora',
+                'ordering': ['hora'],
+                'constraints': [models.UniqueConstraint(fields=('enquete', 'hora'), name='respostas_por_hora_unica')],
+            },
+        ),
+    ]
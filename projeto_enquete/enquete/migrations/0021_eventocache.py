@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0020_respostasporhora'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enquetes', models.JSONField(default=list)),
+                ('processo', models.CharField(max_length=100)),
+                ('criado_em', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de Cache',
+                'verbose_name_plural': 'Eventos de Cache',
+            },
+        ),
+    ]
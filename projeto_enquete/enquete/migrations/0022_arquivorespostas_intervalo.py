@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enquete', '0021_eventocache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arquivorespostas',
+            name='primeira_resposta',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='arquivorespostas',
+            name='ultima_resposta',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,11 +1,30 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
 from django.utils.text import slugify
 from django.contrib.auth.models import User
+from .contadores import ContadoresMixin
 
-class Area(models.Model):
+class SalvarEmTransacaoMixin:
+    """
+    save() dentro de uma transação, para o que os sinais post_save gravam (contadores e o
+    outbox de invalidação, EventoCache) ser confirmado junto com a alteração. O delete()
+    do Django já envia post_delete dentro da própria transação.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+class Area(SalvarEmTransacaoMixin, ContadoresMixin, models.Model):
     nome = models.CharField(max_length=100, unique=True)
     descricao = models.TextField(blank=True, null=True)
     slug = models.SlugField(unique=True, blank=True, null=True)
+    # Contadores mantidos pelos sinais em signals.py (ver contadores.py)
+    num_enquetes = models.PositiveIntegerField(default=0, editable=False)
+    num_enquetes_ativas = models.PositiveIntegerField(default=0, editable=False)
+
+    CAMPOS_CONTADORES = ('num_enquetes', 'num_enquetes_ativas')
 
     class Meta:
         verbose_name = "Área de Programação"
@@ -22,11 +41,11 @@ class Area(models.Model):
 
     @property
     def total_enquetes(self):
-        return self.enquete_set.count()
+        return self.num_enquetes
 
     @property
     def enquetes_ativas(self):
-        return self.enquete_set.filter(ativa=True).count()
+        return self.num_enquetes_ativas
 
 class Tecnologia(models.Model):
     nome = models.CharField(max_length=100, unique=True)
@@ -42,16 +61,14 @@ class Tecnologia(models.Model):
 
     @property
     def total_perguntas(self):
-        total = 0
-        for enquete in self.enquete_set.all():
-            total += enquete.perguntas.all.filter(tecnologia=self).count()
-        return total
+        # Perguntas desta tecnologia nas enquetes associadas a ela, em uma única consulta
+        return Pergunta.objects.filter(tecnologia=self, enquete__tecnologias=self).count()
 
     @property
     def enquetes_relacionadas(self):
         return [enquete.titulo for enquete in self.enquete_set.all()]
 
-class Enquete(models.Model):
+class Enquete(SalvarEmTransacaoMixin, ContadoresMixin, models.Model):
     titulo = models.CharField(max_length=200)
     descricao = models.TextField(blank=True, null=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
@@ -59,24 +76,42 @@ class Enquete(models.Model):
     ativa = models.BooleanField(default=True)
     area = models.ForeignKey(Area, on_delete=models.CASCADE)
     tecnologias = models.ManyToManyField(Tecnologia, blank=True)
+    num_perguntas = models.PositiveIntegerField(default=0, editable=False)
+    num_perguntas_ativas = models.PositiveIntegerField(default=0, editable=False)
+
+    CAMPOS_CONTADORES = ('num_perguntas', 'num_perguntas_ativas')
 
     class Meta:
         verbose_name = "Enquete"
         verbose_name_plural = "Enquetes"
         ordering = ['-data_criacao']
+        indexes = [
+            # Usado pelo agendador de expiração: ativa=True AND data_expiracao <= agora
+            models.Index(fields=['ativa', 'data_expiracao'], name='enquete_ativa_expiracao_idx'),
+        ]
 
     def __str__(self):
         return self.titulo
 
+    @property
+    def expirada(self):
+        return self.data_expiracao is not None and self.data_expiracao <= timezone.now()
+
+    @property
+    def aceita_respostas(self):
+        # Não faz consultas: o agendador desativa as expiradas, mas entre duas execuções
+        # a data é conferida diretamente no objeto já carregado.
+        return self.ativa and not self.expirada
+
     @property
     def total_perguntas(self):
-        return self.perguntas.count()
+        return self.num_perguntas
 
     @property
     def perguntas_ativas(self):
-        return self.perguntas.filter(ativa=True).count()
+        return self.num_perguntas_ativas
 
-class Pergunta(models.Model):
+class Pergunta(SalvarEmTransacaoMixin, ContadoresMixin, models.Model):
     UNICA_ESCOLHA = 'UNICA_ESCOLHA'
     MULTIPLA_ESCOLHA = 'MULTIPLA_ESCOLHA'
     
@@ -90,6 +125,10 @@ class Pergunta(models.Model):
     enquete = models.ForeignKey(Enquete, on_delete=models.CASCADE, related_name='perguntas')
     tecnologia = models.ForeignKey(Tecnologia, on_delete=models.SET_NULL, null=True, blank=True)
     ativa = models.BooleanField(default=True)
+    num_opcoes = models.PositiveIntegerField(default=0, editable=False)
+    num_opcoes_ativas = models.PositiveIntegerField(default=0, editable=False)
+
+    CAMPOS_CONTADORES = ('num_opcoes', 'num_opcoes_ativas')
 
     class Meta:
         verbose_name = "Pergunta"
@@ -101,13 +140,13 @@ class Pergunta(models.Model):
 
     @property
     def total_opcoes(self):
-        return self.opcao_set.count()
+        return self.num_opcoes
 
     @property
     def opcoes_ativas(self):
-        return self.opcao_set.filter(ativa=True).count()
+        return self.num_opcoes_ativas
 
-class Opcao(models.Model):
+class Opcao(SalvarEmTransacaoMixin, models.Model):
     texto = models.CharField(max_length=255)
     pergunta = models.ForeignKey(Pergunta, on_delete=models.CASCADE)
     ativa = models.BooleanField(default=True)
@@ -155,18 +194,77 @@ class Aluno(models.Model):
 
     @property
     def enquetes_participadas(self):
-        return len(set(resposta.pergunta.enquete for resposta in self.resposta_set.all()))
+        return self.submissoes.count()
+
+class Submissao(models.Model):
+    """
+    Envelope de uma resposta à enquete: todas as linhas de Resposta gravadas por um envio
+    apontam para ela. Um aluno identificado tem uma única submissão por enquete (reenviar
+    substitui as respostas); cada envio anônimo gera uma nova.
+    """
+    ORIGEM_WEB = 'web'
+    ORIGEM_API = 'api'
+    ORIGEM_FASTAPI = 'fastapi'
+    ORIGEM_LEGADO = 'legado'
+
+    ORIGEM_CHOICES = [
+        (ORIGEM_WEB, 'Site'),
+        (ORIGEM_API, 'API REST'),
+        (ORIGEM_FASTAPI, 'FastAPI'),
+        (ORIGEM_LEGADO, 'Anterior às submissões'),
+    ]
+
+    aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE, null=True, blank=True, related_name='submissoes')
+    enquete = models.ForeignKey(Enquete, on_delete=models.CASCADE, related_name='submissoes')
+    origem = models.CharField(max_length=20, choices=ORIGEM_CHOICES)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    atualizada_em = models.DateTimeField(auto_now=True)
+    # Soma dos pesos das opções escolhidas, no total e por tecnologia ({tecnologia_id: pontos});
+    # guardada para o placar (Pontuacao) ser atualizado pela diferença a cada reenvio
+    pontos = models.IntegerField(default=0, editable=False)
+    pontos_tecnologias = models.JSONField(default=dict, editable=False)
+
+    class Meta:
+        verbose_name = "Submissão"
+        verbose_name_plural = "Submissões"
+        constraints = [
+            models.UniqueConstraint(fields=['aluno', 'enquete'], name='submissao_unica_aluno_enquete'),
+        ]
+        indexes = [
+            # Contagem de respondentes por enquete (e por período) lida só do índice
+            models.Index(fields=['enquete', 'criada_em'], name='submissao_enquete_criada_idx'),
+        ]
+        ordering = ['-criada_em']
+
+    def __str__(self):
+        aluno_nome = self.aluno.nome if self.aluno else "Anônimo"
+        return f"Submissão de {aluno_nome} em {self.enquete}"
 
 class Resposta(models.Model):
+    """
+    Uma linha por opção escolhida: (submissao, pergunta, opcao). Perguntas de única escolha
+    têm uma linha por submissão; as de múltipla escolha, uma linha por opção marcada. Assim
+    as duas ficam na mesma tabela e a apuração é um único GROUP BY opcao.
+    """
+    submissao = models.ForeignKey(Submissao, on_delete=models.CASCADE, related_name='respostas')
+    # Repetido da submissão para os filtros por aluno (API, admin) não precisarem de JOIN
     aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE, null=True, blank=True)
     pergunta = models.ForeignKey(Pergunta, on_delete=models.CASCADE)
     opcao = models.ForeignKey(Opcao, on_delete=models.CASCADE)
-    data_resposta = models.DateTimeField(auto_now_add=True)
+    data_resposta = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         verbose_name = "Resposta"
         verbose_name_plural = "Respostas"
-        # unique_together = ('aluno', 'pergunta')
+        constraints = [
+            models.UniqueConstraint(fields=['submissao', 'pergunta', 'opcao'], name='resposta_unica_submissao_pergunta_opcao'),
+        ]
+        indexes = [
+            # Apuração por pergunta: GROUP BY opcao lido só do índice
+            models.Index(fields=['pergunta', 'opcao'], name='resposta_pergunta_opcao_idx'),
+            # Histórico do aluno paginado por (data_resposta, id): ver historico.py
+            models.Index(fields=['aluno', '-data_resposta', '-id'], name='resposta_aluno_historico_idx'),
+        ]
         ordering = ['-data_resposta']
 
     def __str__(self):
@@ -181,18 +279,201 @@ class Resposta(models.Model):
     def texto_pergunta(self):
         return self.pergunta.texto
 
-class MultiplaEscolhaResposta(models.Model):
-    aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE, null=True, blank=True)
-    pergunta = models.ForeignKey(Pergunta, on_delete=models.CASCADE)
-    opcoes = models.ManyToManyField(Opcao)
-    data_resposta = models.DateTimeField(auto_now_add=True)
+class MultiplaEscolhaRespostaQuerySet(models.QuerySet):
+    def delete(self):
+        # Apagar uma resposta agrupada apaga todas as opções marcadas nela
+        grupos = Q()
+        for submissao_id, pergunta_id in self.values_list('submissao_id', 'pergunta_id'):
+            grupos |= Q(submissao_id=submissao_id, pergunta_id=pergunta_id)
+        if not grupos:
+            return 0, {}
+        return Resposta.objects.filter(grupos).delete()
+
+class MultiplaEscolhaRespostaManager(models.Manager.from_queryset(MultiplaEscolhaRespostaQuerySet)):
+    """
+    Camada de compatibilidade com o antigo modelo de múltipla escolha (uma linha com M2M de
+    opções): cada objeto é a primeira linha de Resposta de um (submissao, pergunta) e
+    `opcoes` traz todas as opções marcadas.
+    """
+
+    def get_queryset(self):
+        primeiras = (
+            Resposta.objects.filter(pergunta__tipo=Pergunta.MULTIPLA_ESCOLHA)
+            .order_by()
+            .values('submissao', 'pergunta')
+            .annotate(primeira=models.Min('id'))
+            .values('primeira')
+        )
+        return super().get_queryset().filter(id__in=primeiras)
+
+class MultiplaEscolhaResposta(Resposta):
+    objects = MultiplaEscolhaRespostaManager()
 
     class Meta:
+        proxy = True
         verbose_name = "Resposta Múltipla Escolha"
         verbose_name_plural = "Respostas Múltiplas Escolhas"
-        # unique_together = ('aluno', 'pergunta')
         ordering = ['-data_resposta']
 
     def __str__(self):
         aluno_nome = self.aluno.nome if self.aluno else "Anônimo"
-        return f"Respostas de {aluno_nome} para {self.pergunta.texto[:30]}"
\ No newline at end of file
+        return f"Respostas de {aluno_nome} para {self.pergunta.texto[:30]}"
+
+    def linhas(self):
+        return Resposta.objects.filter(submissao_id=self.submissao_id, pergunta_id=self.pergunta_id)
+
+    @property
+    def opcoes(self):
+        if hasattr(self, '_opcoes'):
+            return self._opcoes
+        return Opcao.objects.filter(resposta__in=self.linhas())
+
+    @staticmethod
+    def carregar_opcoes(respostas):
+        """Preenche `opcoes` de várias respostas agrupadas (uma página) com uma única consulta."""
+        respostas = list(respostas)
+        if not respostas:
+            return
+        por_grupo = {(resposta.submissao_id, resposta.pergunta_id): [] for resposta in respostas}
+        linhas = Resposta.objects.filter(
+            submissao_id__in={submissao_id for submissao_id, _ in por_grupo},
+            pergunta_id__in={pergunta_id for _, pergunta_id in por_grupo},
+        ).select_related('opcao').order_by('opcao__ordem', 'opcao_id')
+        for linha in linhas:
+            grupo = por_grupo.get((linha.submissao_id, linha.pergunta_id))
+            if grupo is not None:
+                grupo.append(linha.opcao)
+        for resposta in respostas:
+            resposta._opcoes = por_grupo[(resposta.submissao_id, resposta.pergunta_id)]
+
+    def delete(self, *args, **kwargs):
+        return self.linhas().delete()
+
+class ArquivoRespostas(models.Model):
+    """Arquivo colunar com as respostas arquivadas de uma enquete encerrada (ver arquivamento.py)."""
+    enquete = models.OneToOneField(Enquete, on_delete=models.CASCADE, related_name='arquivo_respostas')
+    arquivo = models.CharField(max_length=255)
+    linhas = models.PositiveIntegerField(default=0)
+    tamanho_bytes = models.PositiveBigIntegerField(default=0)
+    # Datas da resposta mais antiga e da mais recente do arquivo: quem lê só um intervalo
+    # (histórico paginado) sabe sem abrir o arquivo se ele tem algo ali
+    primeira_resposta = models.DateTimeField(null=True, blank=True)
+    ultima_resposta = models.DateTimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Arquivo de Respostas"
+        verbose_name_plural = "Arquivos de Respostas"
+
+    def __str__(self):
+        return self.arquivo
+
+class Pontuacao(models.Model):
+    """
+    Placar da autoavaliação: soma dos pesos (Opcao.peso) das opções escolhidas pelo aluno
+    em uma enquete, em uma área (todas as enquetes dela) ou em uma tecnologia (perguntas
+    dela em qualquer enquete). Atualizado a cada submissão; ver pontuacao.py.
+    """
+    ESCOPO_ENQUETE = 'enquete'
+    ESCOPO_AREA = 'area'
+    ESCOPO_TECNOLOGIA = 'tecnologia'
+
+    ESCOPO_CHOICES = [
+        (ESCOPO_ENQUETE, 'Enquete'),
+        (ESCOPO_AREA, 'Área'),
+        (ESCOPO_TECNOLOGIA, 'Tecnologia'),
+    ]
+
+    escopo = models.CharField(max_length=20, choices=ESCOPO_CHOICES)
+    # Id da enquete, área ou tecnologia, conforme o escopo
+    referencia_id = models.PositiveIntegerField()
+    aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE, related_name='pontuacoes')
+    pontos = models.IntegerField(default=0)
+    atualizada_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Pontuação"
+        verbose_name_plural = "Pontuações"
+        constraints = [
+            models.UniqueConstraint(fields=['escopo', 'referencia_id', 'aluno'], name='pontuacao_unica_escopo_aluno'),
+        ]
+        indexes = [
+            # Ranking paginado por cursor (pontos, aluno) lido só do índice
+            models.Index(fields=['escopo', 'referencia_id', '-pontos', 'aluno'], name='pontuacao_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.aluno_id} em {self.escopo} {self.referencia_id}: {self.pontos}"
+
+class RespostasPorHora(models.Model):
+    """
+    Respostas (linhas de Resposta) e respondentes (envios) recebidos por uma enquete em
+    uma hora (UTC). Base das séries de respostas por período; ver series.py.
+    """
+    enquete = models.ForeignKey(Enquete, on_delete=models.CASCADE, related_name='respostas_por_hora')
+    hora = models.DateTimeField()
+    respostas = models.PositiveIntegerField(default=0)
+    respondentes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Respostas por Hora"
+        verbose_name_plural = "Respostas por Hora"
+        constraints = [
+            # Também é o índice das séries: (enquete, intervalo de horas)
+            models.UniqueConstraint(fields=['enquete', 'hora'], name='respostas_por_hora_unica'),
+        ]
+        ordering = ['hora']
+
+    def __str__(self):
+        return f"{self.enquete_id} em {self.hora:%Y-%m-%d %H}h: {self.respostas}"
+
+class EventoCache(models.Model):
+    """
+    Outbox de invalidação de cache: cada alteração em Area, Enquete, Pergunta ou Opcao
+    grava aqui, na mesma transação, as enquetes afetadas. O consumidor de cada processo
+    lê os eventos por id crescente e apaga as entradas do próprio cache (ver outbox.py).
+    """
+    enquetes = models.JSONField(default=list)
+    # Processo que fez a alteração (e limpa o próprio cache no commit)
+    processo = models.CharField(max_length=100)
+    criado_em = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Evento de Cache"
+        verbose_name_plural = "Eventos de Cache"
+
+    def __str__(self):
+        return f"#{self.id}: enquetes {self.enquetes}"
+
+class ChaveIdempotencia(models.Model):
+    escopo = models.CharField(max_length=100)
+    chave = models.CharField(max_length=255)
+    hash_requisicao = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    corpo = models.JSONField()
+    criada_em = models.DateTimeField(auto_now_add=True)
+    expira_em = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Chave de Idempotência"
+        verbose_name_plural = "Chaves de Idempotência"
+        unique_together = ('escopo', 'chave')
+
+    def __str__(self):
+        return f"{self.escopo}:{self.chave}"
+
+class CheckpointLote(models.Model):
+    """Progresso dos comandos de correção de dados em lotes (enquete/management/lotes.py)."""
+    nome = models.CharField(max_length=100, unique=True)
+    ultimo_pk = models.BigIntegerField(default=0)
+    processados = models.BigIntegerField(default=0)
+    atualizados = models.BigIntegerField(default=0)
+    concluido = models.BooleanField(default=False)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Checkpoint de Lote"
+        verbose_name_plural = "Checkpoints de Lotes"
+
+    def __str__(self):
+        return f"{self.nome} (pk > {self.ultimo_pk})"
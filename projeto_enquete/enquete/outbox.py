@@ -0,0 +1,254 @@
+"""
+Invalidação do cache entre processos por um outbox transacional (EventoCache).
+
+Os sinais só rodam no processo que fez a alteração, e o cache padrão (LocMemCache) é de
+cada processo: uma edição feita pelo site ou pela API DRF não limparia o cache dos workers
+FastAPI. Por isso invalidar_enquetes() grava um EventoCache com as enquetes afetadas na
+mesma transação da alteração (rollback desfaz os dois) e limpa o cache local no commit.
+Antes dele outra thread do processo ainda lê as linhas antigas e poderia guardá-las de
+novo no cache (como em recomendacoes.py).
+
+Cada processo roda um ConsumidorInvalidacao: uma thread que lê os eventos novos por id
+crescente a cada INTERVALO segundos e apaga as entradas das enquetes do próprio cache
+(árvores, apuração e índice de recomendações). Os eventos do próprio processo são
+pulados: ele já limpou o cache no commit.
+
+Ids são atribuídos na inserção, mas as transações podem ser confirmadas fora de ordem: um
+id menor que o último lido pode aparecer depois. Os ids pulados ficam sendo consultados
+como lacunas por até ESPERA_LACUNA segundos (depois disso a transação certamente foi
+desfeita). Atraso e fila pendente ficam em metricas().
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from . import cache, recomendacoes
+from .models import EventoCache
+
+logger = logging.getLogger(__name__)
+
+# Valores padrão; podem ser sobrescritos pela configuração OUTBOX_INVALIDACAO em settings.py
+CONFIGURACAO_PADRAO = {
+    # Segundos entre duas leituras do outbox (0 desativa o consumidor)
+    'INTERVALO': 1.0,
+    # Eventos lidos por consulta
+    'LOTE': 500,
+    # Segundos que um id pulado continua sendo procurado
+    'ESPERA_LACUNA': 30,
+    # Eventos mais antigos que isso são apagados
+    'RETENCAO_HORAS': 24,
+}
+
+INTERVALO_LIMPEZA = 600
+
+_processo = (None, None)
+_ultima_limpeza = 0.0
+
+
+def configuracao():
+    return {**CONFIGURACAO_PADRAO, **getattr(settings, 'OUTBOX_INVALIDACAO', {})}
+
+
+def processo_atual():
+    """Identifica o processo; recalculado após um fork (workers com --preload)."""
+    global _processo
+    if _processo[0] != os.getpid():
+        _processo = (os.getpid(), f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+    return _processo[1]
+
+
+def invalidar_enquetes(enquete_ids):
+    """
+    Publica o evento para os demais processos e limpa as entradas das enquetes no cache
+    deste processo. Chamada dentro de uma transação, as duas coisas valem no commit dela.
+    """
+    ids = sorted(set(enquete_ids))
+    if not ids:
+        return
+    EventoCache.objects.create(enquetes=ids, processo=processo_atual())
+    transaction.on_commit(partial(cache.invalidar_enquetes, ids))
+
+
+def limpar_antigos(forcar=False):
+    global _ultima_limpeza
+    agora = time.monotonic()
+    if not forcar and agora - _ultima_limpeza < INTERVALO_LIMPEZA:
+        return 0
+    _ultima_limpeza = agora
+    limite = timezone.now() - timezone.timedelta(hours=configuracao()['RETENCAO_HORAS'])
+    removidos, _ = EventoCache.objects.filter(criado_em__lt=limite).delete()
+    return removidos
+
+
+class ConsumidorInvalidacao(threading.Thread):
+    """Thread em segundo plano que aplica ao cache local os eventos dos outros processos."""
+
+    def __init__(self, intervalo, lote, espera_lacuna):
+        super().__init__(name='consumidor-invalidacao', daemon=True)
+        self.intervalo = intervalo
+        self.lote = lote
+        self.espera_lacuna = espera_lacuna
+        self.parar = threading.Event()
+        self.lock = threading.Lock()
+        # Posicionado na primeira leitura (ver _posicionar), não na criação da thread
+        self.ultimo_id = None
+        self.indisponivel = False
+        self.lacunas = {}
+        self.consultas = 0
+        self.eventos = 0
+        self.enquetes_invalidadas = 0
+        self.pendentes = 0
+        self.atraso = 0.0
+        self.atraso_maximo = 0.0
+        self.ultima_consulta = None
+
+    def _registrar_lacunas(self, ids, agora):
+        esperado = self.ultimo_id + 1
+        for evento_id in ids:
+            if evento_id > self.ultimo_id:
+                for faltante in range(esperado, evento_id):
+                    self.lacunas.setdefault(faltante, agora)
+                esperado = evento_id + 1
+        for evento_id in ids:
+            self.lacunas.pop(evento_id, None)
+        for evento_id, desde in list(self.lacunas.items()):
+            if agora - desde > self.espera_lacuna:
+                del self.lacunas[evento_id]
+
+    def _posicionar(self):
+        """
+        Eventos anteriores ao início não interessam: o cache deste processo ainda estava
+        vazio. Sem a tabela (banco ainda não migrado), tenta de novo na próxima leitura.
+        """
+        try:
+            ultimo_id = EventoCache.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+        except DatabaseError:
+            if not self.indisponivel:
+                logger.warning("Outbox de invalidação indisponível (migrate pendente?); tentando a cada %ss", self.intervalo)
+                self.indisponivel = True
+            return False
+        with self.lock:
+            self.ultimo_id = ultimo_id
+        return True
+
+    def consumir(self):
+        """Lê e aplica um lote de eventos; retorna quantos foram lidos."""
+        if self.ultimo_id is None and not self._posicionar():
+            return 0
+        filtro = Q(id__gt=self.ultimo_id)
+        if self.lacunas:
+            filtro |= Q(id__in=list(self.lacunas))
+        eventos = list(
+            EventoCache.objects.filter(filtro).order_by('id').values_list('id', 'enquetes', 'processo', 'criado_em')[:self.lote]
+        )
+        agora = time.monotonic()
+        proprio = processo_atual()
+        enquetes = set()
+        for _, ids, processo, _ in eventos:
+            if processo != proprio:
+                enquetes.update(ids)
+        if enquetes:
+            cache.invalidar_enquetes(enquetes)
+            recomendacoes.atualizar_enquetes(enquetes)
+
+        ids = [evento[0] for evento in eventos]
+        pendentes = 0
+        if len(eventos) == self.lote:
+            pendentes = EventoCache.objects.filter(id__gt=max(ids)).count()
+        with self.lock:
+            self._registrar_lacunas(ids, agora)
+            self.ultimo_id = max([self.ultimo_id, *ids])
+            self.consultas += 1
+            self.eventos += len(eventos)
+            self.enquetes_invalidadas += len(enquetes)
+            self.pendentes = pendentes
+            self.ultima_consulta = timezone.now()
+            if eventos:
+                self.atraso = (self.ultima_consulta - eventos[-1][3]).total_seconds()
+                self.atraso_maximo = max(self.atraso_maximo, self.atraso)
+        return len(eventos)
+
+    def run(self):
+        if self.ultimo_id is None:
+            try:
+                self._posicionar()
+            finally:
+                close_old_connections()
+        while not self.parar.wait(self.intervalo):
+            try:
+                # Lote cheio: há fila, lê de novo sem esperar o intervalo
+                while self.consumir() == self.lote and not self.parar.is_set():
+                    pass
+                if self.ultimo_id is not None:
+                    limpar_antigos()
+            except Exception:
+                logger.exception("Falha ao consumir o outbox de invalidação")
+            finally:
+                close_old_connections()
+
+    def metricas(self):
+        with self.lock:
+            return {
+                'processo': processo_atual(),
+                'ultimo_id': self.ultimo_id,
+                'consultas': self.consultas,
+                'eventos_lidos': self.eventos,
+                'enquetes_invalidadas': self.enquetes_invalidadas,
+                'pendentes': self.pendentes,
+                'lacunas': len(self.lacunas),
+                'atraso_ms': round(self.atraso * 1000, 1),
+                'atraso_maximo_ms': round(self.atraso_maximo * 1000, 1),
+                'ultima_consulta': self.ultima_consulta,
+            }
+
+
+_consumidor = None
+_consumidor_lock = threading.Lock()
+
+
+def iniciar_consumidor():
+    """
+    Inicia o consumidor uma única vez por processo, posicionado no último evento já
+    gravado. Chamado por tarefas.py (primeira requisição WSGI/ASGI) e pelo lifespan da
+    FastAPI, antes de qualquer coisa ir para o cache.
+    """
+    global _consumidor
+    opcoes = configuracao()
+    if not opcoes['INTERVALO']:
+        return None
+    with _consumidor_lock:
+        if _consumidor is None:
+            _consumidor = ConsumidorInvalidacao(opcoes['INTERVALO'], opcoes['LOTE'], opcoes['ESPERA_LACUNA'])
+            _consumidor._posicionar()
+            _consumidor.start()
+    return _consumidor
+
+
+def parar_consumidor():
+    global _consumidor
+    with _consumidor_lock:
+        if _consumidor is not None:
+            _consumidor.parar.set()
+            _consumidor = None
+
+
+def metricas():
+    """Métricas do consumidor deste processo, mais o tamanho atual do outbox."""
+    consumidor = _consumidor
+    dados = consumidor.metricas() if consumidor is not None else {'processo': processo_atual(), 'ativo': False}
+    dados['ultimo_id_outbox'] = EventoCache.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+    if consumidor is not None:
+        dados['ativo'] = True
+    if dados.get('ultimo_id') is not None:
+        # Fila real no momento: eventos ainda não lidos por este processo
+        dados['pendentes'] = EventoCache.objects.filter(id__gt=dados['ultimo_id']).count()
+    return dados
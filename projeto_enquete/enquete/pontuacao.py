@@ -0,0 +1,207 @@
+"""
+Pontuação das enquetes usadas como autoavaliação, e rankings.
+
+A pontuação de uma submissão é a soma de Opcao.peso das opções escolhidas, no total e por
+tecnologia da pergunta, calculada em uma consulta agregada (SUM ... GROUP BY tecnologia) e
+guardada na própria Submissao. O placar (Pontuacao) de cada aluno por enquete, área e
+tecnologia é atualizado pela diferença em relação ao envio anterior, então reenviar a
+enquete não soma os pontos duas vezes.
+
+Numa enquete arquivada e reaberta, as respostas arquivadas da submissão que não foram
+substituídas pelo novo envio continuam somando. Vale o peso cadastrado no momento do envio. Depois de mudar pesos, trocar a área de uma
+enquete ou apagar respostas avulsas, `manage.py recalcular_pontuacao` refaz tudo com uma
+única consulta agregada.
+
+Os rankings são paginados por cursor (pontos, aluno) sobre o índice pontuacao_ranking_idx:
+cada página custa o mesmo, seja a primeira ou a milésima.
+"""
+import base64
+import binascii
+from collections import defaultdict
+
+from django.db.models import F, Q, Sum
+
+from .arquivamento import respostas_arquivadas_da_submissao
+from .historico import CursorInvalido, LIMITE_PADRAO
+from .models import ArquivoRespostas, Opcao, Pontuacao, Resposta, Submissao
+
+TAMANHO_LOTE = 1000
+
+
+def _somar_linhas(linhas):
+    """[(tecnologia_id, pontos)] -> (total, {"tecnologia_id": pontos}); chaves em texto, como no JSON."""
+    total, por_tecnologia = 0, {}
+    for tecnologia_id, pontos in linhas:
+        total += pontos
+        if tecnologia_id is not None:
+            por_tecnologia[str(tecnologia_id)] = por_tecnologia.get(str(tecnologia_id), 0) + pontos
+    return total, por_tecnologia
+
+
+def _aplicar(aluno_id, diferencas, criar=()):
+    """Soma as diferenças {(escopo, referencia_id): delta} no placar; as chaves em `criar` são criadas se faltarem."""
+    if criar:
+        Pontuacao.objects.bulk_create(
+            [Pontuacao(escopo=escopo, referencia_id=referencia_id, aluno_id=aluno_id) for escopo, referencia_id in criar],
+            ignore_conflicts=True,
+        )
+    for (escopo, referencia_id), delta in diferencas.items():
+        if delta:
+            Pontuacao.objects.filter(escopo=escopo, referencia_id=referencia_id, aluno_id=aluno_id).update(
+                pontos=F('pontos') + delta
+            )
+
+
+def _diferencas(enquete_id, area_id, total, por_tecnologia, sinal=1):
+    diferencas = {
+        (Pontuacao.ESCOPO_ENQUETE, enquete_id): sinal * total,
+        (Pontuacao.ESCOPO_AREA, area_id): sinal * total,
+    }
+    for tecnologia_id, pontos in por_tecnologia.items():
+        diferencas[(Pontuacao.ESCOPO_TECNOLOGIA, int(tecnologia_id))] = sinal * pontos
+    return diferencas
+
+
+def _linhas_arquivadas(submissao):
+    """[(tecnologia_id, peso)] das respostas arquivadas da submissão que não foram respondidas de novo."""
+    arquivo = ArquivoRespostas.objects.filter(enquete_id=submissao.enquete_id).first()
+    if arquivo is None:
+        return []
+    respondidas = set(Resposta.objects.filter(submissao_id=submissao.pk).values_list('pergunta_id', flat=True))
+    opcao_ids = [
+        opcao_id
+        for pergunta_id, opcao_id, _ in respostas_arquivadas_da_submissao(arquivo, submissao.pk)
+        if pergunta_id not in respondidas
+    ]
+    if not opcao_ids:
+        return []
+    return list(Opcao.objects.filter(id__in=opcao_ids).values_list('pergunta__tecnologia', 'peso'))
+
+
+def registrar_submissao(submissao):
+    """
+    Recalcula os pontos da submissão a partir das respostas gravadas e aplica a diferença
+    ao placar do aluno. Chamada por gravar_respostas, dentro da transação do envio.
+    """
+    linhas = list(
+        Resposta.objects.filter(submissao_id=submissao.pk)
+        .order_by()
+        .values('pergunta__tecnologia')
+        .annotate(pontos=Sum('opcao__peso'))
+        .values_list('pergunta__tecnologia', 'pontos')
+    )
+    total, por_tecnologia = _somar_linhas(linhas + _linhas_arquivadas(submissao))
+    # O upsert da submissão não devolve os pontos do envio anterior
+    anterior = Submissao.objects.select_for_update().filter(pk=submissao.pk).values('pontos', 'pontos_tecnologias').get()
+    Submissao.objects.filter(pk=submissao.pk).update(pontos=total, pontos_tecnologias=por_tecnologia)
+    submissao.pontos, submissao.pontos_tecnologias = total, por_tecnologia
+    if submissao.aluno_id is None:
+        return
+
+    enquete = submissao.enquete
+    novas = _diferencas(enquete.pk, enquete.area_id, total, por_tecnologia)
+    diferencas = dict(novas)
+    for chave, pontos in _diferencas(enquete.pk, enquete.area_id, anterior['pontos'], anterior['pontos_tecnologias'], -1).items():
+        diferencas[chave] = diferencas.get(chave, 0) + pontos
+    # Só as chaves do envio atual são criadas: uma tecnologia que saiu da enquete apenas perde os pontos
+    _aplicar(submissao.aluno_id, diferencas, criar=novas)
+
+
+def remover_submissao(submissao):
+    """Desconta do placar os pontos de uma submissão que vai ser apagada (sinal pre_delete)."""
+    if submissao.aluno_id is None:
+        return
+    area_id = submissao.enquete.area_id
+    _aplicar(
+        submissao.aluno_id,
+        _diferencas(submissao.enquete_id, area_id, submissao.pontos, submissao.pontos_tecnologias, -1),
+    )
+    # O aluno tem uma única submissão por enquete: sem ela, ele sai do ranking da enquete
+    Pontuacao.objects.filter(
+        escopo=Pontuacao.ESCOPO_ENQUETE, referencia_id=submissao.enquete_id, aluno_id=submissao.aluno_id
+    ).delete()
+
+
+def recalcular():
+    """
+    Refaz os pontos de todas as submissões e o placar inteiro com os pesos atuais, em uma
+    consulta agregada. Enquetes arquivadas (respostas no arquivo colunar) mantêm os pontos
+    guardados nas submissões. Retorna {nome: registros atualizados}.
+    """
+    arquivadas = ArquivoRespostas.objects.values('enquete_id')
+    por_submissao = defaultdict(list)
+    linhas = (
+        Resposta.objects.exclude(submissao__enquete__in=arquivadas)
+        .order_by()
+        .values('submissao_id', 'pergunta__tecnologia')
+        .annotate(pontos=Sum('opcao__peso'))
+        .values_list('submissao_id', 'pergunta__tecnologia', 'pontos')
+    )
+    for submissao_id, tecnologia_id, pontos in linhas:
+        por_submissao[submissao_id].append((tecnologia_id, pontos))
+
+    ids_arquivadas = set(arquivadas.values_list('enquete_id', flat=True))
+    alteradas, placar = [], defaultdict(int)
+    submissoes = Submissao.objects.order_by().values_list(
+        'id', 'aluno_id', 'enquete_id', 'enquete__area_id', 'pontos', 'pontos_tecnologias'
+    )
+    for submissao_id, aluno_id, enquete_id, area_id, pontos, pontos_tecnologias in submissoes.iterator(chunk_size=TAMANHO_LOTE):
+        if enquete_id not in ids_arquivadas:
+            novos = _somar_linhas(por_submissao.get(submissao_id, ()))
+            if novos != (pontos, pontos_tecnologias):
+                pontos, pontos_tecnologias = novos
+                alteradas.append(Submissao(id=submissao_id, pontos=pontos, pontos_tecnologias=pontos_tecnologias))
+        if aluno_id is not None:
+            for chave, delta in _diferencas(enquete_id, area_id, pontos, pontos_tecnologias).items():
+                placar[(*chave, aluno_id)] += delta
+
+    Submissao.objects.bulk_update(alteradas, ['pontos', 'pontos_tecnologias'], batch_size=TAMANHO_LOTE)
+    Pontuacao.objects.all().delete()
+    Pontuacao.objects.bulk_create(
+        [
+            Pontuacao(escopo=escopo, referencia_id=referencia_id, aluno_id=aluno_id, pontos=pontos)
+            for (escopo, referencia_id, aluno_id), pontos in placar.items()
+        ],
+        batch_size=TAMANHO_LOTE,
+    )
+    return {'Submissões': len(alteradas), 'Pontuações': len(placar)}
+
+
+def codificar_cursor(pontos, aluno_id, posicao):
+    valor = f"{pontos}:{aluno_id}:{posicao}"
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        pontos, aluno_id, posicao = base64.urlsafe_b64decode(cursor + preenchimento).decode().split(':')
+        return int(pontos), int(aluno_id), int(posicao)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorInvalido("Cursor de paginação inválido.")
+
+
+def pagina_ranking(escopo, referencia_id, cursor=None, limite=LIMITE_PADRAO):
+    """
+    Alunos por pontos (maior primeiro; empates pelo id do aluno). Retorna `results`
+    ([{'posicao', 'aluno', 'nome', 'pontos'}]) e `proximo_cursor` (None na última página).
+    """
+    pontuacoes = Pontuacao.objects.filter(escopo=escopo, referencia_id=referencia_id)
+    posicao = 0
+    if cursor:
+        pontos, aluno_id, posicao = decodificar_cursor(cursor)
+        pontuacoes = pontuacoes.filter(Q(pontos__lt=pontos) | Q(pontos=pontos, aluno_id__gt=aluno_id))
+    linhas = list(
+        pontuacoes.order_by('-pontos', 'aluno_id').values('aluno_id', 'aluno__nome', 'pontos')[:limite + 1]
+    )
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo_cursor = codificar_cursor(linhas[-1]['pontos'], linhas[-1]['aluno_id'], posicao + limite)
+    return {
+        'results': [
+            {'posicao': posicao + indice, 'aluno': linha['aluno_id'], 'nome': linha['aluno__nome'], 'pontos': linha['pontos']}
+            for indice, linha in enumerate(linhas, start=1)
+        ],
+        'proximo_cursor': proximo_cursor,
+    }
@@ -0,0 +1,85 @@
+"""
+Renderização do questionário de responder_enquete sem os widgets do Django.
+
+O form.as_p de cada RespostaForm renderiza um RadioSelect/CheckboxSelectMultiple (um
+template por opção) e consulta as opções de cada pergunta. Aqui a árvore da enquete vem do
+cache de leitura (serializacao.enquetes_em_cache) e todo o questionário sai de um único
+template, carregado uma vez por processo.
+
+Os nomes dos campos são os mesmos do RespostaForm com prefix (`pergunta_<id>-pergunta_<id>`)
+e os valores são os ids das opções, então o POST continua sendo validado pelos formulários.
+
+Comparação com form.as_p: python manage.py benchmark_questionario
+"""
+from functools import lru_cache
+
+from django.template.loader import get_template
+
+from . import serializacao
+from .models import Pergunta
+
+TEMPLATE = 'enquete/_questionario.html'
+
+TIPOS_INPUT = {
+    Pergunta.UNICA_ESCOLHA: 'radio',
+    Pergunta.MULTIPLA_ESCOLHA: 'checkbox',
+}
+
+
+def nome_campo(pergunta_id):
+    """Nome do campo no POST: o RespostaForm usa prefix e nome de campo iguais."""
+    return f'pergunta_{pergunta_id}-pergunta_{pergunta_id}'
+
+
+@lru_cache(maxsize=None)
+def _template():
+    # Cacheado mesmo com DEBUG (sem o loader em cache o template seria relido a cada página)
+    return get_template(TEMPLATE)
+
+
+def montar(enquete):
+    """
+    Árvore do questionário: perguntas ativas (por id) com as opções ativas (por ordem).
+    Os nomes e ids dos inputs já vêm calculados; a árvore não depende da requisição.
+    """
+    dados = serializacao.enquetes_em_cache([enquete.id]).get(enquete.id)
+    if dados is not None:
+        perguntas = dados['perguntas']
+    else:
+        # Enquete fora do cache de leitura (inativa): mesma montagem, sem gravar no cache
+        perguntas = serializacao.montar_perguntas(enquete.perguntas.filter(ativa=True))
+
+    arvore = []
+    for pergunta in perguntas:
+        nome = nome_campo(pergunta['id'])
+        tipo_input = TIPOS_INPUT.get(pergunta['tipo'])
+        arvore.append({
+            'id': pergunta['id'],
+            'texto': pergunta['texto'],
+            'nome': nome,
+            'tipo_input': tipo_input,
+            # Como o RadioSelect: `required` nos radios; o CheckboxSelectMultiple não usa
+            'obrigatoria': tipo_input == 'radio',
+            'opcoes': [
+                {'valor': str(opcao['id']), 'texto': opcao['texto'], 'dom_id': f'id_{nome}_{posicao}'}
+                for posicao, opcao in enumerate(pergunta['opcoes'])
+            ] if tipo_input else [],
+        })
+    return arvore
+
+
+def renderizar(arvore, dados=None, erros=None):
+    """
+    HTML do questionário. `dados` (request.POST) marca as opções já escolhidas e
+    `erros` ({nome do campo: [mensagens]}) é exibido abaixo de cada pergunta.
+    """
+    erros = erros or {}
+    perguntas = [
+        {
+            **pergunta,
+            'selecionadas': set(dados.getlist(pergunta['nome'])) if dados is not None else (),
+            'erros': erros.get(pergunta['nome'], ()),
+        }
+        for pergunta in arvore
+    ]
+    return _template().render({'perguntas': perguntas})
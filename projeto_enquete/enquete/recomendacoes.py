@@ -0,0 +1,117 @@
+"""
+Recomendação de enquetes a partir de Aluno.tecnologias_interesse.
+
+O índice invertido {tecnologia_id: {enquete_id}} das enquetes ativas fica no cache
+(chave_indice_recomendacoes) e é montado com uma única consulta na tabela
+enquete_tecnologias. Quando uma enquete muda (criação, edição, tecnologias, desativação
+ou exclusão), só as entradas dela são refeitas e a versão do índice muda.
+
+A pontuação de uma enquete é quantas tecnologias de interesse do aluno ela cobre; empates
+ficam com a mais recente. Enquetes já respondidas pelo aluno ficam de fora. A lista de cada
+aluno fica no cache junto com a versão do índice usada: vale até o índice mudar ou até o
+aluno alterar os interesses ou responder uma enquete.
+"""
+import time
+from collections import defaultdict
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import serializacao
+from .cache import TIMEOUT_ENQUETE, chave_indice_recomendacoes, chave_recomendacoes
+from .models import Enquete, Submissao
+
+# Enquetes guardadas por aluno; os endpoints devolvem no máximo isso
+LIMITE_RECOMENDACOES = 20
+
+EnqueteTecnologia = Enquete.tecnologias.through
+
+
+def _montar_indice():
+    tecnologias = defaultdict(set)
+    for tecnologia_id, enquete_id in (
+        EnqueteTecnologia.objects.filter(enquete__ativa=True).values_list('tecnologia_id', 'enquete_id')
+    ):
+        tecnologias[tecnologia_id].add(enquete_id)
+    return {'versao': time.time_ns(), 'tecnologias': dict(tecnologias)}
+
+
+def obter_indice():
+    indice = cache.get(chave_indice_recomendacoes())
+    if indice is None:
+        indice = _montar_indice()
+        cache.set(chave_indice_recomendacoes(), indice, TIMEOUT_ENQUETE)
+    return indice
+
+
+def _atualizar_enquetes(ids):
+    indice = cache.get(chave_indice_recomendacoes())
+    if indice is None:
+        return
+    tecnologias = {tecnologia_id: enquetes - ids for tecnologia_id, enquetes in indice['tecnologias'].items()}
+    for tecnologia_id, enquete_id in (
+        EnqueteTecnologia.objects.filter(enquete_id__in=ids, enquete__ativa=True).values_list('tecnologia_id', 'enquete_id')
+    ):
+        tecnologias.setdefault(tecnologia_id, set()).add(enquete_id)
+    tecnologias = {tecnologia_id: enquetes for tecnologia_id, enquetes in tecnologias.items() if enquetes}
+    cache.set(chave_indice_recomendacoes(), {'versao': time.time_ns(), 'tecnologias': tecnologias}, TIMEOUT_ENQUETE)
+
+
+# As alterações abaixo só valem depois do commit: antes dele outra requisição poderia
+# remontar o índice (ou a lista do aluno) sem ver a mudança e guardá-lo assim no cache
+
+def atualizar_enquetes(enquete_ids):
+    """
+    Refaz no índice as entradas das enquetes informadas (uma consulta). Sem índice no
+    cache não há o que atualizar: ele é montado já atualizado na próxima leitura.
+    """
+    if enquete_ids:
+        transaction.on_commit(partial(_atualizar_enquetes, set(enquete_ids)))
+
+
+def descartar_indice():
+    """Remonta o índice na próxima leitura (com nova versão, o que invalida as listas de todos os alunos)."""
+    transaction.on_commit(partial(cache.delete, chave_indice_recomendacoes()))
+
+
+def invalidar_aluno(aluno_id):
+    transaction.on_commit(partial(cache.delete, chave_recomendacoes(aluno_id)))
+
+
+def enquetes_recomendadas(aluno, limite=LIMITE_RECOMENDACOES):
+    """Recomendações com id, título, descrição e área de cada enquete (uma consulta values())."""
+    itens = recomendar(aluno, limite)
+    queryset = Enquete.objects.filter(id__in=[item['enquete'] for item in itens], ativa=True)
+    esparso = ({'id', 'titulo', 'descricao', 'area_id'}, set())
+    enquetes = {enquete['id']: enquete for enquete in serializacao.montar_enquetes(queryset, esparso)}
+    # Enquete desativada entre a leitura do índice e esta consulta fica de fora
+    return [
+        {**enquetes[item['enquete']], 'pontuacao': item['pontuacao'], 'tecnologias': item['tecnologias']}
+        for item in itens if item['enquete'] in enquetes
+    ]
+
+
+def recomendar(aluno, limite=LIMITE_RECOMENDACOES):
+    """
+    [{'enquete': id, 'pontuacao': tecnologias em comum, 'tecnologias': [ids em comum]}],
+    da mais para a menos relevante.
+    """
+    indice = obter_indice()
+    guardadas = cache.get(chave_recomendacoes(aluno.pk))
+    if guardadas is not None and guardadas['versao'] == indice['versao']:
+        return guardadas['itens'][:limite]
+
+    respondidas = set(Submissao.objects.filter(aluno=aluno).values_list('enquete_id', flat=True))
+    em_comum = defaultdict(list)
+    for tecnologia_id in aluno.tecnologias_interesse.order_by('id').values_list('id', flat=True):
+        for enquete_id in indice['tecnologias'].get(tecnologia_id, ()):
+            if enquete_id not in respondidas:
+                em_comum[enquete_id].append(tecnologia_id)
+    melhores = sorted(em_comum.items(), key=lambda item: (-len(item[1]), -item[0]))[:LIMITE_RECOMENDACOES]
+    itens = [
+        {'enquete': enquete_id, 'pontuacao': len(tecnologias), 'tecnologias': tecnologias}
+        for enquete_id, tecnologias in melhores
+    ]
+    cache.set(chave_recomendacoes(aluno.pk), {'versao': indice['versao'], 'itens': itens}, TIMEOUT_ENQUETE)
+    return itens[:limite]
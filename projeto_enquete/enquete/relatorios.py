@@ -0,0 +1,65 @@
+from itertools import groupby
+
+import django
+
+from .apuracao import contar_votos, participacao_por_nivel, total_respondentes
+from .models import Enquete, Opcao
+
+
+def iniciar_worker():
+    """Inicializador dos processos do pool: cada worker configura o Django e abre a própria conexão."""
+    django.setup()
+
+
+def gerar_relatorio_enquete(enquete_id):
+    """
+    Resumo de uma enquete: distribuição das respostas por pergunta e participação por nível.
+    Executado nos processos do pool; usa um número fixo de consultas por enquete.
+    """
+    enquete = Enquete.objects.select_related('area').get(pk=enquete_id)
+    votos = contar_votos(enquete_id)
+    niveis = participacao_por_nivel(enquete_id)
+
+    perguntas = {
+        pergunta.id: pergunta
+        for pergunta in enquete.perguntas.order_by('id').only('id', 'texto', 'tipo', 'ativa')
+    }
+    opcoes = (
+        Opcao.objects.filter(pergunta__enquete_id=enquete_id)
+        .order_by('pergunta_id', 'ordem', 'id')
+        .values('id', 'texto', 'pergunta_id')
+        .iterator()
+    )
+
+    dados_perguntas = []
+    for pergunta_id, opcoes_pergunta in groupby(opcoes, key=lambda opcao: opcao['pergunta_id']):
+        pergunta = perguntas[pergunta_id]
+        opcoes_pergunta = list(opcoes_pergunta)
+        total = sum(votos[opcao['id']] for opcao in opcoes_pergunta)
+        dados_perguntas.append({
+            'id': pergunta.id,
+            'texto': pergunta.texto,
+            'tipo': pergunta.tipo,
+            'ativa': pergunta.ativa,
+            'total_respostas': total,
+            'opcoes': [
+                {
+                    'id': opcao['id'],
+                    'texto': opcao['texto'],
+                    'votos': votos[opcao['id']],
+                    'percentual': round(votos[opcao['id']] * 100 / total, 1) if total else 0,
+                }
+                for opcao in opcoes_pergunta
+            ],
+        })
+
+    return {
+        'id': enquete.id,
+        'titulo': enquete.titulo,
+        'ativa': enquete.ativa,
+        'area': {'id': enquete.area_id, 'nome': enquete.area.nome, 'slug': enquete.area.slug or f'area-{enquete.area_id}'},
+        'total_respondentes': total_respondentes(enquete_id),
+        'total_participantes': sum(niveis.values()),
+        'participacao_por_nivel': niveis,
+        'perguntas': dados_perguntas,
+    }
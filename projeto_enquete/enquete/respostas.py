@@ -0,0 +1,130 @@
+from itertools import groupby
+
+from . import pontuacao, recomendacoes, series
+from .arquivamento import respostas_arquivadas_da_submissao
+from .models import ArquivoRespostas, Opcao, Pergunta, Resposta, Submissao
+
+
+def _obter_submissao(aluno, enquete, origem):
+    submissao = Submissao(aluno=aluno, enquete=enquete, origem=origem)
+    if aluno is None:
+        submissao.save()
+        return submissao
+    # Um INSERT ... ON CONFLICT: reenviar a enquete reaproveita a submissão do aluno
+    Submissao.objects.bulk_create(
+        [submissao],
+        update_conflicts=True,
+        unique_fields=['aluno', 'enquete'],
+        update_fields=['origem', 'atualizada_em'],
+    )
+    if submissao.pk is None:
+        # Bancos que não devolvem o id no upsert (ex.: MySQL)
+        submissao = Submissao.objects.get(aluno=aluno, enquete=enquete)
+    return submissao
+
+
+def gravar_respostas(aluno, enquete, respostas, origem):
+    """
+    Grava as respostas já validadas de uma submissão com semântica de upsert e retorna a
+    Submissao que as agrupa.
+
+    `respostas` é uma lista de (pergunta, [opcoes]); cada opção escolhida vira uma linha de
+    Resposta, seja a pergunta de única ou de múltipla escolha. Para alunos identificados,
+    uma nova resposta à mesma pergunta substitui a anterior: as opções desmarcadas são
+    apagadas e as demais gravadas com ON CONFLICT (submissao, pergunta, opcao), sem duplicar
+    linhas. Os pontos da submissão e o placar do aluno (pontuacao.py) e as respostas por
+    hora da enquete (series.py) são atualizados em seguida. Deve ser chamada dentro de
+    transaction.atomic().
+    """
+    # Se a mesma pergunta vier repetida no lote, vale a última resposta
+    por_pergunta = {pergunta.id: (pergunta, opcoes) for pergunta, opcoes in respostas}
+    submissao = _obter_submissao(aluno, enquete, origem)
+
+    linhas = []
+    for pergunta, opcoes in por_pergunta.values():
+        if pergunta.tipo == Pergunta.UNICA_ESCOLHA:
+            opcoes = opcoes[:1]
+        elif pergunta.tipo != Pergunta.MULTIPLA_ESCOLHA:
+            continue
+        linhas.extend(
+            Resposta(submissao=submissao, aluno=aluno, pergunta=pergunta, opcao=opcao) for opcao in opcoes
+        )
+
+    anteriores = []
+    if aluno is not None:
+        # Datas das linhas já gravadas da submissão, para as séries aplicarem só a diferença
+        anteriores = list(Resposta.objects.filter(submissao=submissao).values_list('pergunta_id', 'data_resposta'))
+    if aluno is not None and por_pergunta:
+        # Cada opção pertence a uma única pergunta, então um só DELETE cobre todas
+        Resposta.objects.filter(submissao=submissao, pergunta_id__in=list(por_pergunta)).exclude(
+            opcao_id__in=[linha.opcao_id for linha in linhas]
+        ).delete()
+
+    if linhas:
+        Resposta.objects.bulk_create(
+            linhas,
+            update_conflicts=True,
+            unique_fields=['submissao', 'pergunta', 'opcao'],
+            update_fields=['data_resposta'],
+        )
+    pontuacao.registrar_submissao(submissao)
+    series.registrar_envio(
+        enquete.pk,
+        [data for _, data in anteriores],
+        [data for pergunta_id, data in anteriores if pergunta_id not in por_pergunta] + [linha.data_resposta for linha in linhas],
+    )
+    if aluno is not None:
+        # A enquete respondida sai das recomendações do aluno
+        recomendacoes.invalidar_aluno(aluno.pk)
+    return submissao
+
+
+def _agrupar_por_pergunta(pares):
+    """[(pergunta, opcao)] ordenados por pergunta -> [(pergunta, [opcoes])]."""
+    return [
+        (grupo[0][0], [opcao for _, opcao in grupo])
+        for grupo in (list(itens) for _, itens in groupby(pares, key=lambda par: par[0].id))
+    ]
+
+
+def carregar_submissao(submissoes, submissao_id):
+    """
+    Uma submissão com todas as respostas em uma única consulta (JOIN com pergunta e opção).
+    `submissoes` restringe quais submissões podem ser lidas. Retorna (submissao, respostas),
+    onde respostas é uma lista de (pergunta, [opcoes]); (None, []) se a submissão não existe.
+    Respostas de enquetes arquivadas são completadas com o arquivo colunar.
+    """
+    linhas = list(
+        Resposta.objects.filter(submissao__in=submissoes.filter(pk=submissao_id))
+        .select_related('submissao__enquete__arquivo_respostas', 'pergunta', 'opcao')
+    )
+    if linhas:
+        submissao = linhas[0].submissao
+    else:
+        submissao = submissoes.filter(pk=submissao_id).select_related('enquete__arquivo_respostas').first()
+        if submissao is None:
+            return None, []
+    pares = [(linha.pergunta, linha.opcao) for linha in linhas]
+
+    try:
+        arquivo = submissao.enquete.arquivo_respostas
+    except ArquivoRespostas.DoesNotExist:
+        arquivo = None
+    if arquivo is not None:
+        # Perguntas respondidas de novo depois do arquivamento valem pela versão das tabelas
+        respondidas = {pergunta.id for pergunta, _ in pares}
+        arquivadas = [
+            (pergunta_id, opcao_id)
+            for pergunta_id, opcao_id, _ in respostas_arquivadas_da_submissao(arquivo, submissao.pk)
+            if pergunta_id not in respondidas
+        ]
+        if arquivadas:
+            perguntas = Pergunta.objects.in_bulk({pergunta_id for pergunta_id, _ in arquivadas})
+            opcoes = Opcao.objects.in_bulk({opcao_id for _, opcao_id in arquivadas})
+            pares.extend(
+                (perguntas[pergunta_id], opcoes[opcao_id]) for pergunta_id, opcao_id in arquivadas
+                if pergunta_id in perguntas and opcao_id in opcoes
+            )
+
+    pares.sort(key=lambda par: (par[0].id, par[1].ordem, par[1].id))
+    return submissao, _agrupar_por_pergunta(pares)
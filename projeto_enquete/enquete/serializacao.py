@@ -0,0 +1,174 @@
+"""
+Montagem de enquetes e perguntas como dicionários para a API FastAPI.
+
+Usa no máximo uma consulta values() por nível (enquetes, perguntas, opções), seja qual
+for o tamanho da lista. Com `fields`/`expand` (mesma semântica do ?fields=/?expand= da
+API DRF) só as colunas pedidas são lidas e os níveis não expandidos nem são consultados:
+uma lista de navegação (?fields=id,titulo) custa uma única consulta.
+"""
+from django.core.cache import cache
+
+from .cache import TIMEOUT_ENQUETE, chave_enquete
+from .models import Enquete, Opcao, Pergunta, Submissao
+
+# Máximo de ids aceitos por GET /enquetes/batch (FastAPI e DRF)
+LIMITE_LOTE = 50
+
+CAMPOS_ENQUETE = ('id', 'titulo', 'descricao', 'ativa', 'area_id')
+CAMPOS_PERGUNTA = ('id', 'texto', 'tipo', 'ativa', 'tecnologia_id')
+CAMPOS_OPCAO = ('id', 'texto', 'ativa', 'ordem', 'peso')
+
+# Representação completa, usada quando nem `fields` nem `expand` são informados
+COMPLETO_ENQUETE = (set(), {'perguntas', 'perguntas.opcoes'})
+COMPLETO_PERGUNTA = (set(), {'opcoes'})
+
+
+def ler_esparso(fields, expand):
+    """Converte os parâmetros (texto separado por vírgulas) em (campos, expandir), ou None se ambos ausentes."""
+    if fields is None and expand is None:
+        return None
+    return tuple(
+        {nome.strip() for nome in (valor or '').split(',') if nome.strip()}
+        for valor in (fields, expand)
+    )
+
+
+def ler_ids(texto, limite=LIMITE_LOTE):
+    """
+    "1,2,3" -> [1, 2, 3], sem repetições e na ordem recebida. ValueError se houver valor
+    que não é inteiro, se a lista estiver vazia ou se passar de `limite`.
+    """
+    try:
+        ids = list(dict.fromkeys(int(valor) for valor in (texto or '').split(',') if valor.strip()))
+    except ValueError:
+        raise ValueError("'ids' deve ser uma lista de inteiros separados por vírgula.")
+    if not ids:
+        raise ValueError("Informe ao menos um id em 'ids'.")
+    if len(ids) > limite:
+        raise ValueError(f"No máximo {limite} ids por requisição.")
+    return ids
+
+
+def por_id(ids, encontrados):
+    """
+    Resposta dos endpoints em lote a partir de {id: objeto}: {'resultados': {id: objeto ou
+    None}, 'nao_encontradas': [ids]}, na ordem dos ids pedidos.
+    """
+    return {
+        'resultados': {enquete_id: encontrados.get(enquete_id) for enquete_id in ids},
+        'nao_encontradas': [enquete_id for enquete_id in ids if enquete_id not in encontrados],
+    }
+
+
+def _subexpansao(expandir, relacao):
+    prefixo = f'{relacao}.'
+    return {caminho[len(prefixo):] for caminho in expandir if caminho.startswith(prefixo)}
+
+
+def _expandir(relacao, campos, expandir):
+    return relacao in expandir or relacao in campos
+
+
+def _colunas(disponiveis, campos):
+    return [nome for nome in disponiveis if not campos or nome in campos]
+
+
+def _recortar(linha, saida):
+    return {nome: linha[nome] for nome in saida}
+
+
+def opcoes_por_pergunta(pergunta_ids, somente_ativas=True):
+    """{pergunta_id: [opção]} em uma consulta, ordenadas por `ordem`."""
+    agrupadas = {pergunta_id: [] for pergunta_id in pergunta_ids}
+    if not agrupadas:
+        return agrupadas
+    opcoes = Opcao.objects.filter(pergunta_id__in=pergunta_ids)
+    if somente_ativas:
+        opcoes = opcoes.filter(ativa=True)
+    for linha in opcoes.order_by('ordem', 'id').values('pergunta_id', *CAMPOS_OPCAO):
+        agrupadas[linha.pop('pergunta_id')].append(linha)
+    return agrupadas
+
+
+def _perguntas(queryset, esparso, somente_opcoes_ativas):
+    """Lista de (enquete_id, pergunta): a enquete é lida sempre, para o agrupamento em montar_enquetes."""
+    campos, expandir = esparso
+    saida = _colunas(CAMPOS_PERGUNTA, campos)
+    linhas = list(queryset.values(*dict.fromkeys(saida + ['id', 'enquete_id'])))
+    resultado = [(linha['enquete_id'], _recortar(linha, saida)) for linha in linhas]
+    if _expandir('opcoes', campos, expandir):
+        opcoes = opcoes_por_pergunta([linha['id'] for linha in linhas], somente_opcoes_ativas)
+        for linha, (_, pergunta) in zip(linhas, resultado):
+            pergunta['opcoes'] = opcoes[linha['id']]
+    return resultado
+
+
+def montar_perguntas(queryset, esparso=None, somente_opcoes_ativas=True):
+    """Perguntas do queryset como dicionários; `esparso` vem de ler_esparso()."""
+    esparso = esparso if esparso is not None else COMPLETO_PERGUNTA
+    return [pergunta for _, pergunta in _perguntas(queryset, esparso, somente_opcoes_ativas)]
+
+
+def montar_enquetes(queryset, esparso=None, somente_ativas=True, manter_id=False):
+    """
+    Enquetes do queryset como dicionários, na ordem do queryset. Com `somente_ativas`,
+    as perguntas e opções aninhadas são só as ativas. `manter_id` inclui o id mesmo
+    quando ele não está em `fields` (usado para indexar as respostas em lote).
+    """
+    campos, expandir = esparso if esparso is not None else COMPLETO_ENQUETE
+    saida = _colunas(CAMPOS_ENQUETE, campos)
+    if manter_id and 'id' not in saida:
+        saida.insert(0, 'id')
+    linhas = list(queryset.values(*dict.fromkeys(saida + ['id'])))
+    enquetes = [_recortar(linha, saida) for linha in linhas]
+    if linhas and _expandir('perguntas', campos, expandir):
+        ids = [linha['id'] for linha in linhas]
+        perguntas = Pergunta.objects.filter(enquete_id__in=ids)
+        if somente_ativas:
+            perguntas = perguntas.filter(ativa=True)
+        por_enquete = {enquete_id: [] for enquete_id in ids}
+        for enquete_id, pergunta in _perguntas(perguntas, (set(), _subexpansao(expandir, 'perguntas')), somente_ativas):
+            por_enquete[enquete_id].append(pergunta)
+        for linha, enquete in zip(linhas, enquetes):
+            enquete['perguntas'] = por_enquete[linha['id']]
+    return enquetes
+
+
+def enquetes_em_cache(ids):
+    """
+    {id: árvore completa} das enquetes ativas pedidas, pelo cache de leitura (chave_enquete).
+    As ausentes no cache são montadas de uma vez e gravadas; inexistentes ou inativas
+    ficam de fora do resultado. A invalidação é feita pelos sinais (ver signals.py).
+    """
+    chaves = {chave_enquete(enquete_id): enquete_id for enquete_id in ids}
+    encontradas = {chaves[chave]: dados for chave, dados in cache.get_many(list(chaves)).items()}
+    faltantes = [enquete_id for enquete_id in ids if enquete_id not in encontradas]
+    if faltantes:
+        montadas = montar_enquetes(Enquete.objects.filter(id__in=faltantes, ativa=True))
+        novas = {dados['id']: dados for dados in montadas}
+        cache.set_many({chave_enquete(enquete_id): dados for enquete_id, dados in novas.items()}, TIMEOUT_ENQUETE)
+        encontradas.update(novas)
+    return encontradas
+
+
+def enquetes_recentes(limite):
+    """
+    Ids das `limite` enquetes ativas com submissões mais recentes, completados pelas
+    criadas mais recentemente. Lê só as últimas submissões pela chave primária, sem
+    agregar a tabela inteira.
+    """
+    recentes = Submissao.objects.filter(enquete__ativa=True).order_by('-id').values_list('enquete_id', flat=True)
+    ids = list(dict.fromkeys(recentes[:limite * 20]))[:limite]
+    if len(ids) < limite:
+        ids += list(
+            Enquete.objects.filter(ativa=True).exclude(id__in=ids)
+            .values_list('id', flat=True)[:limite - len(ids)]
+        )
+    return ids
+
+
+def preaquecer(limite):
+    """Carrega no cache de leitura as enquetes mais ativas; retorna quantas foram carregadas."""
+    if limite <= 0:
+        return 0
+    return len(enquetes_em_cache(enquetes_recentes(limite)))
@@ -0,0 +1,172 @@
+"""
+Séries de respostas por período (por enquete e por área) a partir de RespostasPorHora.
+
+Cada hora guarda as linhas de Resposta com data_resposta nela e quantas submissões têm
+linhas nela (respondentes). Cada envio aplica só a diferença (ver gravar_respostas): um
+reenvio move as linhas substituídas para a hora atual e só conta o respondente de novo se
+a submissão ainda não tinha linhas nessa hora. As séries por dia e por semana agregam
+essas linhas no banco, então um semestre de uma enquete custa no máximo algumas centenas
+de linhas lidas, sem varrer Resposta.data_resposta nem os arquivos colunares.
+
+`manage.py consolidar_series` reconstrói a tabela a partir das respostas gravadas
+(tabelas e arquivos colunares), com os mesmos números da atualização incremental.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .arquivamento import LeitorArquivo, caminho_arquivo
+from .models import ArquivoRespostas, Resposta, RespostasPorHora
+
+GRANULARIDADES = {
+    'hora': None,
+    'dia': TruncDay,
+    'semana': TruncWeek,
+}
+GRANULARIDADE_PADRAO = 'dia'
+TAMANHO_LOTE = 1000
+
+_MICROS_POR_HORA = 3600 * 1000000
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def truncar_hora(data):
+    return data.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def registrar_envio(enquete_id, antes, depois):
+    """
+    Aplica um envio às horas da enquete. `antes` e `depois` são as datas (data_resposta)
+    das linhas de Resposta da submissão antes e depois do envio.
+    """
+    antes = Counter(truncar_hora(data) for data in antes)
+    depois = Counter(truncar_hora(data) for data in depois)
+    diferencas = {}
+    for hora in antes.keys() | depois.keys():
+        respostas = depois[hora] - antes[hora]
+        respondentes = (hora in depois) - (hora in antes)
+        if respostas or respondentes:
+            diferencas[hora] = (respostas, respondentes)
+    RespostasPorHora.objects.bulk_create(
+        [RespostasPorHora(enquete_id=enquete_id, hora=hora) for hora in diferencas if hora in depois],
+        ignore_conflicts=True,
+    )
+    for hora, (respostas, respondentes) in diferencas.items():
+        RespostasPorHora.objects.filter(enquete_id=enquete_id, hora=hora).update(
+            respostas=F('respostas') + respostas,
+            respondentes=F('respondentes') + respondentes,
+        )
+    # Hora sem nenhuma submissão depois do reenvio some, como na consolidação
+    esvaziadas = [hora for hora, (_, respondentes) in diferencas.items() if respondentes < 0]
+    if esvaziadas:
+        RespostasPorHora.objects.filter(enquete_id=enquete_id, hora__in=esvaziadas, respondentes__lte=0).delete()
+
+
+def ler_periodo(inicio, fim):
+    """
+    ?inicio=/?fim= (data ou data e hora ISO 8601) -> (datetime ou None, datetime ou None).
+    Uma data em `fim` inclui o dia inteiro. ValueError se algum valor for inválido.
+    """
+    limites = []
+    for nome, valor, dias in (('inicio', inicio, 0), ('fim', fim, 1)):
+        if not valor:
+            limites.append(None)
+            continue
+        try:
+            # parse_datetime também aceita só a data (meia-noite), então a data é testada antes
+            dia = parse_date(valor)
+            data = datetime.combine(dia + timedelta(days=dias), dt_time.min) if dia else parse_datetime(valor)
+        except ValueError:
+            data = None
+        if data is None:
+            raise ValueError(f"'{nome}' deve ser uma data (AAAA-MM-DD) ou data e hora ISO 8601.")
+        if timezone.is_naive(data):
+            data = timezone.make_aware(data)
+        limites.append(data)
+    return tuple(limites)
+
+
+def serie(filtros, granularidade=GRANULARIDADE_PADRAO, inicio=None, fim=None):
+    """
+    [{'inicio', 'respostas', 'respondentes'}] em ordem cronológica, das RespostasPorHora
+    que atendem `filtros` (ex.: {'enquete_id': 1} ou {'enquete__area_id': 2}). Dias e
+    semanas seguem o fuso horário atual; `fim` é exclusivo.
+    """
+    if granularidade not in GRANULARIDADES:
+        raise ValueError(f"'granularidade' deve ser uma de: {', '.join(GRANULARIDADES)}.")
+    linhas = RespostasPorHora.objects.filter(**filtros)
+    if inicio is not None:
+        linhas = linhas.filter(hora__gte=truncar_hora(inicio))
+    if fim is not None:
+        linhas = linhas.filter(hora__lt=fim)
+    truncar = GRANULARIDADES[granularidade]
+    periodo = truncar('hora') if truncar else F('hora')
+    return [
+        {'inicio': linha['periodo'], 'respostas': linha['total_respostas'], 'respondentes': linha['total_respondentes']}
+        for linha in linhas.order_by()
+        .values(periodo=periodo)
+        .annotate(total_respostas=Sum('respostas'), total_respondentes=Sum('respondentes'))
+        .order_by('periodo')
+    ]
+
+
+def _horas_arquivadas(arquivo, horas):
+    """Soma ao dicionário {hora: [respostas, {submissões}]} as linhas do arquivo colunar."""
+    with LeitorArquivo(caminho_arquivo(arquivo)) as leitor:
+        for submissao_id, micros in zip(leitor.coluna('submissao_id'), leitor.coluna('data_resposta')):
+            hora = _EPOCA + timedelta(microseconds=micros - micros % _MICROS_POR_HORA)
+            horas[hora][0] += 1
+            horas[hora][1].add(submissao_id)
+
+
+def consolidar(enquete_ids=None):
+    """
+    Reconstrói RespostasPorHora das enquetes informadas (todas, por padrão) a partir das
+    respostas gravadas: um GROUP BY por hora em Resposta e a leitura das colunas
+    submissao_id/data_resposta dos arquivos colunares. Retorna a quantidade de linhas.
+    """
+    respostas = Resposta.objects.order_by()
+    arquivos = ArquivoRespostas.objects.all()
+    if enquete_ids is not None:
+        respostas = respostas.filter(pergunta__enquete_id__in=enquete_ids)
+        arquivos = arquivos.filter(enquete_id__in=enquete_ids)
+    arquivos = dict(arquivos.values_list('enquete_id', 'arquivo'))
+
+    contagens = {}
+    linhas = (
+        respostas.exclude(pergunta__enquete_id__in=list(arquivos))
+        .values(enquete=F('pergunta__enquete_id'), hora=TruncHour('data_resposta', tzinfo=dt_timezone.utc))
+        .annotate(total=Count('id'), envios=Count('submissao', distinct=True))
+        .values_list('enquete', 'hora', 'total', 'envios')
+    )
+    for enquete_id, hora, total, envios in linhas:
+        contagens[(enquete_id, hora)] = (total, envios)
+
+    # Enquetes arquivadas: arquivo e respostas posteriores (enquete reaberta) contados juntos,
+    # para um envio com linhas nos dois não virar dois respondentes
+    for enquete_id, arquivo in arquivos.items():
+        horas = defaultdict(lambda: [0, set()])
+        _horas_arquivadas(arquivo, horas)
+        for submissao_id, data in respostas.filter(pergunta__enquete_id=enquete_id).values_list('submissao_id', 'data_resposta'):
+            hora = horas[truncar_hora(data)]
+            hora[0] += 1
+            hora[1].add(submissao_id)
+        for hora, (total, submissoes) in horas.items():
+            contagens[(enquete_id, hora)] = (total, len(submissoes))
+
+    existentes = RespostasPorHora.objects.all()
+    if enquete_ids is not None:
+        existentes = existentes.filter(enquete_id__in=enquete_ids)
+    existentes.delete()
+    RespostasPorHora.objects.bulk_create(
+        [
+            RespostasPorHora(enquete_id=enquete_id, hora=hora, respostas=total, respondentes=envios)
+            for (enquete_id, hora), (total, envios) in contagens.items()
+        ],
+        batch_size=TAMANHO_LOTE,
+    )
+    return len(contagens)
@@ -1,11 +1,121 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Aluno
+from .models import Aluno, Area, ArquivoRespostas, Enquete, Pergunta, Opcao, Submissao
+from . import contadores
+from .outbox import invalidar_enquetes
+from . import arquivamento, busca, pontuacao, recomendacoes
 
 @receiver(post_save, sender=User)
 def create_or_update_aluno_profile(sender, instance, created, **kwargs):
     if created:
         Aluno.objects.create(user=instance, nome=instance.username) 
     #instance.aluno.save()
-pass   
\ No newline at end of file
+pass
+
+@receiver([post_save, post_delete], sender=Enquete)
+def invalidar_cache_enquete(sender, instance, **kwargs):
+    invalidar_enquetes([instance.pk])
+
+@receiver([post_save, post_delete], sender=Pergunta)
+def invalidar_cache_pergunta(sender, instance, **kwargs):
+    invalidar_enquetes([instance.enquete_id])
+
+@receiver([post_save, post_delete], sender=Opcao)
+def invalidar_cache_opcao(sender, instance, **kwargs):
+    enquete_id = Pergunta.objects.filter(pk=instance.pergunta_id).values_list('enquete_id', flat=True).first()
+    if enquete_id:
+        invalidar_enquetes([enquete_id])
+
+# Área editada: as enquetes dela são invalidadas em todos os processos, para quem guardar
+# dados da área junto das enquetes (hoje as árvores só têm o area_id)
+@receiver(post_save, sender=Area)
+def invalidar_cache_area(sender, instance, created, **kwargs):
+    if not created:
+        invalidar_enquetes(instance.enquete_set.values_list('id', flat=True))
+
+# Mantém o índice de busca textual (enquete/busca.py) sincronizado
+@receiver(post_save, sender=Enquete)
+def indexar_enquete(sender, instance, **kwargs):
+    busca.indexar_enquete(instance)
+
+@receiver(post_delete, sender=Enquete)
+def remover_enquete_do_indice(sender, instance, **kwargs):
+    busca.remover(busca.TIPO_ENQUETE, instance.pk)
+
+@receiver(post_save, sender=Pergunta)
+def indexar_pergunta(sender, instance, **kwargs):
+    busca.indexar_pergunta(instance)
+
+@receiver(post_delete, sender=Pergunta)
+def remover_pergunta_do_indice(sender, instance, **kwargs):
+    busca.remover(busca.TIPO_PERGUNTA, instance.pk)
+
+# Contadores desnormalizados de Area, Enquete e Pergunta (ver contadores.py)
+@receiver(post_init, sender=Enquete)
+@receiver(post_init, sender=Pergunta)
+@receiver(post_init, sender=Opcao)
+def guardar_estado_contador(sender, instance, **kwargs):
+    contadores.guardar_estado(instance)
+
+@receiver(post_save, sender=Enquete)
+@receiver(post_save, sender=Pergunta)
+@receiver(post_save, sender=Opcao)
+def atualizar_contadores(sender, instance, created, **kwargs):
+    contadores.registrar_save(instance, created)
+
+@receiver(post_delete, sender=Enquete)
+@receiver(post_delete, sender=Pergunta)
+@receiver(post_delete, sender=Opcao)
+def decrementar_contadores(sender, instance, **kwargs):
+    contadores.registrar_delete(instance)
+
+@receiver(post_delete, sender=ArquivoRespostas)
+def apagar_arquivo_respostas(sender, instance, **kwargs):
+    arquivamento.caminho_arquivo(instance.arquivo).unlink(missing_ok=True)
+
+# Submissão apagada (inclusive em cascata, com a enquete ou o aluno) sai do placar
+@receiver(pre_delete, sender=Submissao)
+def descontar_pontuacao(sender, instance, **kwargs):
+    pontuacao.remover_submissao(instance)
+
+# Índice de recomendações (recomendacoes.py): entradas da enquete refeitas a cada mudança
+@receiver([post_save, post_delete], sender=Enquete)
+def atualizar_indice_recomendacoes(sender, instance, **kwargs):
+    recomendacoes.atualizar_enquetes([instance.pk])
+
+@receiver(m2m_changed, sender=Enquete.tecnologias.through)
+def atualizar_indice_tecnologias(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # tecnologia.enquete_set.clear(): depois dele as enquetes afetadas já não são conhecidas
+        instance._enquetes_antes_clear = list(instance.enquete_set.values_list('id', flat=True))
+        return
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        enquete_ids = [instance.pk]
+    elif pk_set:
+        enquete_ids = pk_set
+    else:
+        enquete_ids = instance.__dict__.pop('_enquetes_antes_clear', [])
+    recomendacoes.atualizar_enquetes(enquete_ids)
+    # O índice dos outros processos é refeito por eles ao ler o evento
+    invalidar_enquetes(enquete_ids)
+
+@receiver(m2m_changed, sender=Aluno.tecnologias_interesse.through)
+def invalidar_recomendacoes_aluno(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recomendacoes.invalidar_aluno(instance.pk)
+    elif pk_set:
+        for aluno_id in pk_set:
+            recomendacoes.invalidar_aluno(aluno_id)
+    else:
+        # Novo índice, nova versão: as listas guardadas de todos os alunos deixam de valer
+        recomendacoes.descartar_indice()
+
+@receiver(post_delete, sender=Submissao)
+def invalidar_recomendacoes_submissao(sender, instance, **kwargs):
+    if instance.aluno_id is not None:
+        recomendacoes.invalidar_aluno(instance.aluno_id)
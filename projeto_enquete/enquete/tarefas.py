@@ -0,0 +1,32 @@
+"""
+Tarefas em segundo plano de cada processo servidor: o agendador de expiração
+(expiracao.py) e o consumidor do outbox de invalidação (outbox.py).
+
+Os pontos de entrada WSGI e ASGI só registram iniciar_no_primeiro_request(): as threads
+sobem quando o servidor atende a primeira requisição, não na importação da aplicação.
+Assim comandos que carregam a aplicação (runserver, checks, um deploy que importa antes
+do `migrate`) não consultam o banco nem deixam threads rodando. A FastAPI usa o lifespan.
+"""
+from django.core.signals import request_started
+
+from .expiracao import iniciar_agendador, parar_agendador
+from .outbox import iniciar_consumidor, parar_consumidor
+
+
+def iniciar():
+    iniciar_agendador()
+    iniciar_consumidor()
+
+
+def parar():
+    parar_agendador()
+    parar_consumidor()
+
+
+def _iniciar_na_requisicao(sender, **kwargs):
+    request_started.disconnect(_iniciar_na_requisicao, dispatch_uid=__name__)
+    iniciar()
+
+
+def iniciar_no_primeiro_request():
+    request_started.connect(_iniciar_na_requisicao, dispatch_uid=__name__)
@@ -1,3 +1,378 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from enquete import busca
+from enquete.admissao import ControladorAdmissao, Rejeitada
+from enquete.apuracao import contar_votos
+from enquete.arquivamento import LeitorArquivo, arquivar_enquete
+from enquete.management.commands.medir_inicializacao import SCRIPT
+from enquete.historico import pagina_historico
+from enquete.models import Aluno, Area, ArquivoRespostas, Enquete, Opcao, Pergunta, Pontuacao, Resposta, RespostasPorHora, Submissao
+from enquete.respostas import gravar_respostas
+
+# Banco próprio do teste: o worker roda em outro processo e não enxerga o banco de testes
+SETTINGS_TESTE = """
+from projeto_enquete.settings import *
+DATABASES['default']['NAME'] = {banco!r}
+ARQUIVO_RESPOSTAS_DIR = {diretorio!r}
+"""
+
+POPULAR = """
+import django
+django.setup()
+from django.core.management import call_command
+from enquete.models import Area, Enquete, Opcao, Pergunta
+call_command('migrate', verbosity=0)
+area = Area.objects.create(nome='Inicialização')
+for numero in range({enquetes}):
+    enquete = Enquete.objects.create(titulo=f'Enquete {{numero}}', area=area, ativa=True)
+    pergunta = Pergunta.objects.create(enquete=enquete, texto='Pergunta', tipo=Pergunta.UNICA_ESCOLHA)
+    Opcao.objects.create(pergunta=pergunta, texto='Opção')
+"""
+
+
+@tag('lento')
+class InicializacaoFastAPITests(SimpleTestCase):
+    """
+    Inicialização a frio de um worker FastAPI, em um processo novo (ver medir_inicializacao).
+    Só a estrutura da medição é verificada; os tempos dependem da máquina. Sobe processos:
+    fica de fora com `manage.py test --exclude-tag lento`.
+    """
+    enquetes = 3
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.temporario = tempfile.TemporaryDirectory()
+        diretorio = Path(cls.temporario.name)
+        (diretorio / 'settings_inicializacao.py').write_text(SETTINGS_TESTE.format(
+            banco=str(diretorio / 'db.sqlite3'), diretorio=str(diretorio / 'arquivo_respostas'),
+        ))
+        cls.ambiente = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'settings_inicializacao',
+            'PYTHONPATH': os.pathsep.join([str(diretorio), str(settings.BASE_DIR), os.environ.get('PYTHONPATH', '')]),
+        }
+        subprocess.run(
+            [sys.executable, '-c', POPULAR.format(enquetes=cls.enquetes)],
+            env=cls.ambiente, cwd=settings.BASE_DIR, check=True, capture_output=True,
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temporario.cleanup()
+        super().tearDownClass()
+
+    def test_lifespan_preenche_inicializacao_e_aquece_cache(self):
+        script = SCRIPT.format(diretorio=str(Path(settings.BASE_DIR) / 'fastapi_app'))
+        processo = subprocess.run(
+            [sys.executable, '-c', script], env=self.ambiente, cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        self.assertEqual(processo.returncode, 0, processo.stderr[-2000:])
+        tempos = json.loads(processo.stdout.strip().splitlines()[-1])
+        for chave in ('importacao_ms', 'lifespan_ms', 'conexoes_ms', 'cache_ms', 'total_ms'):
+            self.assertIn(chave, tempos)
+        self.assertEqual(tempos['enquetes_em_cache'], self.enquetes)
+
+    def test_comando_informa_enquetes_em_cache(self):
+        with mock.patch.dict(os.environ, self.ambiente):
+            saida = StringIO()
+            call_command('medir_inicializacao', repeticoes=1, stdout=saida)
+        self.assertIn(f'{self.enquetes} enquetes', saida.getvalue())
+
+
+class EnqueteComRespostasMixin:
+    """Uma enquete com uma pergunta de única e uma de múltipla escolha, com pesos."""
+
+    def setUp(self):
+        super().setUp()
+        self.area = Area.objects.create(nome='Web')
+        self.enquete = Enquete.objects.create(titulo='Python básico', area=self.area, ativa=True)
+        self.unica = Pergunta.objects.create(enquete=self.enquete, texto='Linguagem?', tipo=Pergunta.UNICA_ESCOLHA)
+        self.multipla = Pergunta.objects.create(enquete=self.enquete, texto='Frameworks?', tipo=Pergunta.MULTIPLA_ESCOLHA)
+        self.opcoes_unica = [
+            Opcao.objects.create(pergunta=self.unica, texto=texto, peso=peso) for texto, peso in (('py', 1), ('js', 2))
+        ]
+        self.opcoes_multipla = [
+            Opcao.objects.create(pergunta=self.multipla, texto=texto, peso=peso)
+            for texto, peso in (('django', 2), ('fastapi', 3), ('flask', 4))
+        ]
+        self.aluno = Aluno.objects.create(nome='Ana', email='ana@example.com')
+
+    def responder(self, respostas, aluno=None):
+        with transaction.atomic():
+            return gravar_respostas(aluno or self.aluno, self.enquete, respostas, Submissao.ORIGEM_API)
+
+
+class ArquivoTemporarioMixin:
+    """Arquivos de respostas arquivadas em um diretório temporário."""
+
+    def setUp(self):
+        super().setUp()
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        configuracao = override_settings(ARQUIVO_RESPOSTAS_DIR=Path(self.diretorio.name))
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+
+class EnqueteArquivadaReabertaTests(ArquivoTemporarioMixin, EnqueteComRespostasMixin, TestCase):
+
+    def test_reenvio_substitui_so_as_perguntas_respondidas_de_novo(self):
+        py, js = self.opcoes_unica
+        django_, fastapi, _ = self.opcoes_multipla
+        submissao = self.responder([(self.unica, [py]), (self.multipla, [django_, fastapi])])
+        self.assertEqual(Submissao.objects.get(pk=submissao.pk).pontos, 6)
+
+        arquivar_enquete(self.enquete.pk)
+        Enquete.objects.filter(pk=self.enquete.pk).update(ativa=True)
+        self.responder([(self.unica, [js])])
+
+        # A pergunta de múltipla escolha arquivada continua valendo; a de única escolha é a nova
+        self.assertEqual(contar_votos(self.enquete.pk), {js.pk: 1, django_.pk: 1, fastapi.pk: 1})
+        self.assertEqual(Submissao.objects.get(pk=submissao.pk).pontos, 7)
+        for escopo, referencia_id in ((Pontuacao.ESCOPO_ENQUETE, self.enquete.pk), (Pontuacao.ESCOPO_AREA, self.area.pk)):
+            self.assertEqual(
+                Pontuacao.objects.get(aluno=self.aluno, escopo=escopo, referencia_id=referencia_id).pontos, 7
+            )
+
+
+class RespostaApiTests(EnqueteComRespostasMixin, TestCase):
+    """Envio de respostas pela ação responder da API DRF."""
+
+    def setUp(self):
+        super().setUp()
+        # O perfil de Aluno é criado junto com o usuário (signals.py)
+        self.aluno = User.objects.create_user('ana', password='x').aluno
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.aluno.user)
+        self.url = f'/api/enquetes/{self.enquete.pk}/responder/'
+        # Balde de tokens novo a cada teste: o controlador de admissão é global ao processo
+        controlador = mock.patch('enquete.admissao._controlador', ControladorAdmissao())
+        controlador.start()
+        self.addCleanup(controlador.stop)
+
+    def enviar(self, unica, multipla, chave=None):
+        corpo = {'respostas': [
+            {'pergunta_id': self.unica.pk, 'opcoes_ids': unica.pk},
+            {'pergunta_id': self.multipla.pk, 'opcoes_ids': [opcao.pk for opcao in multipla]},
+        ]}
+        cabecalhos = {'HTTP_IDEMPOTENCY_KEY': chave} if chave else {}
+        return self.cliente.post(self.url, corpo, format='json', **cabecalhos)
+
+    def test_mesma_chave_devolve_o_resultado_original(self):
+        py, _ = self.opcoes_unica
+        primeira = self.enviar(py, self.opcoes_multipla[:1], chave='envio-1')
+        segunda = self.enviar(py, self.opcoes_multipla[:1], chave='envio-1')
+
+        self.assertEqual(primeira.status_code, 201)
+        self.assertEqual((segunda.status_code, segunda.json()), (201, primeira.json()))
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(Submissao.objects.count(), 1)
+        self.assertEqual(Resposta.objects.count(), 2)
+
+    def test_mesma_chave_com_outro_corpo_e_recusada(self):
+        py, js = self.opcoes_unica
+        self.assertEqual(self.enviar(py, self.opcoes_multipla[:1], chave='envio-1').status_code, 201)
+
+        resposta = self.enviar(js, self.opcoes_multipla[:1], chave='envio-1')
+        self.assertEqual(resposta.status_code, 422)
+        self.assertEqual(contar_votos(self.enquete.pk), {py.pk: 1, self.opcoes_multipla[0].pk: 1})
+
+    def test_novo_envio_substitui_as_respostas_anteriores(self):
+        py, js = self.opcoes_unica
+        django_, fastapi, flask = self.opcoes_multipla
+        self.assertEqual(self.enviar(py, [django_, fastapi]).status_code, 201)
+        self.assertEqual(self.enviar(js, [flask]).status_code, 201)
+
+        self.assertEqual(
+            set(Resposta.objects.filter(aluno=self.aluno).values_list('opcao_id', flat=True)), {js.pk, flask.pk}
+        )
+        self.assertEqual(contar_votos(self.enquete.pk), {js.pk: 1, flask.pk: 1})
+        # Placar pelos pesos da versão atual (2 + 4), sem somar o primeiro envio
+        for escopo, referencia_id in ((Pontuacao.ESCOPO_ENQUETE, self.enquete.pk), (Pontuacao.ESCOPO_AREA, self.area.pk)):
+            self.assertEqual(
+                Pontuacao.objects.get(aluno=self.aluno, escopo=escopo, referencia_id=referencia_id).pontos, 6
+            )
+        # Série por hora: as linhas substituídas saem da contagem e o aluno conta uma vez
+        hora = RespostasPorHora.objects.get(enquete=self.enquete)
+        self.assertEqual((hora.respostas, hora.respondentes), (2, 1))
+
+
+class ContadoresTests(EnqueteComRespostasMixin, TestCase):
+    def test_contadores_acompanham_criacao_status_e_remocao(self):
+        self.area.refresh_from_db()
+        self.enquete.refresh_from_db()
+        self.assertEqual((self.area.num_enquetes, self.area.num_enquetes_ativas), (1, 1))
+        self.assertEqual((self.enquete.num_perguntas, self.enquete.num_perguntas_ativas), (2, 2))
+
+        self.multipla.ativa = False
+        self.multipla.save()
+        self.opcoes_multipla[0].delete()
+        Enquete.objects.create(titulo='Rascunho', area=self.area, ativa=False)
+
+        self.area.refresh_from_db()
+        self.enquete.refresh_from_db()
+        self.multipla.refresh_from_db()
+        self.assertEqual((self.area.num_enquetes, self.area.num_enquetes_ativas), (2, 1))
+        self.assertEqual((self.enquete.num_perguntas, self.enquete.num_perguntas_ativas), (2, 1))
+        self.assertEqual((self.multipla.num_opcoes, self.multipla.num_opcoes_ativas), (2, 2))
+
+
+class HistoricoArquivadoTests(ArquivoTemporarioMixin, EnqueteComRespostasMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        inicio = timezone.now() - timedelta(days=30)
+        # Três enquetes respondidas em dias diferentes; as duas mais antigas arquivadas
+        self.enquetes = [self.enquete] + [
+            Enquete.objects.create(titulo=f'Enquete {numero}', area=self.area, ativa=True) for numero in (2, 3)
+        ]
+        for dia, enquete in enumerate(self.enquetes):
+            if enquete is not self.enquete:
+                pergunta = Pergunta.objects.create(enquete=enquete, texto='Usa?', tipo=Pergunta.MULTIPLA_ESCOLHA)
+                opcoes = [Opcao.objects.create(pergunta=pergunta, texto=texto) for texto in ('sim', 'às vezes')]
+                with transaction.atomic():
+                    submissao = gravar_respostas(self.aluno, enquete, [(pergunta, opcoes)], Submissao.ORIGEM_API)
+            else:
+                submissao = self.responder([(self.unica, self.opcoes_unica[:1]), (self.multipla, self.opcoes_multipla[:2])])
+            Resposta.objects.filter(submissao=submissao).update(data_resposta=inicio + timedelta(days=dia))
+        for enquete in self.enquetes[:2]:
+            arquivar_enquete(enquete.pk)
+
+    def paginas(self, limite):
+        linhas, cursor = [], None
+        while True:
+            pagina = pagina_historico(self.aluno.pk, cursor, limite)
+            linhas += [(linha['arquivada'], linha['pergunta'], linha['opcao']) for linha in pagina['results']]
+            cursor = pagina['proximo_cursor']
+            if cursor is None:
+                return linhas
+
+    def test_paginas_intercalam_arquivadas_na_ordem(self):
+        completo = self.paginas(limite=50)
+        self.assertEqual(len(completo), 7)
+        self.assertEqual([arquivada for arquivada, _, _ in completo], [False, False] + [True] * 5)
+        for limite in (1, 2, 3):
+            self.assertEqual(self.paginas(limite), completo)
+        # Arquivos gravados antes das colunas de intervalo são sempre lidos
+        ArquivoRespostas.objects.update(primeira_resposta=None, ultima_resposta=None)
+        self.assertEqual(self.paginas(limite=2), completo)
+
+    def test_pagina_so_abre_os_arquivos_do_intervalo(self):
+        aberturas, cursor = [], None
+        for _ in range(3):
+            with mock.patch('enquete.arquivamento.LeitorArquivo', wraps=LeitorArquivo) as leitor:
+                pagina = pagina_historico(self.aluno.pk, cursor, limite=1)
+            aberturas.append(leitor.call_count)
+            cursor = pagina['proximo_cursor']
+        # Página 1: as tabelas já têm limite + 1 linhas, mais novas que os dois arquivos.
+        # Páginas 2 e 3: o arquivo mais novo completa a página; o mais antigo não é aberto.
+        self.assertEqual(aberturas, [0, 1, 1])
+
+
+class AdmissaoTests(SimpleTestCase):
+    def test_recusa_por_saturacao_devolve_o_token(self):
+        controlador = ControladorAdmissao(
+            MAX_ESCRITAS_SIMULTANEAS=1, ESPERA_MAXIMA=0, TAXA_POR_CLIENTE=0, RAJADA_POR_CLIENTE=2,
+        )
+        controlador.entrar('ocupante')
+        for _ in range(3):
+            with self.assertRaises(Rejeitada) as recusa:
+                controlador.entrar('cliente')
+            self.assertEqual(recusa.exception.status_code, 503)
+        controlador.sair()
+
+        # A rajada continua inteira depois das recusas por saturação
+        for _ in range(2):
+            with controlador.admitir('cliente'):
+                pass
+        with self.assertRaises(Rejeitada) as recusa:
+            controlador.entrar('cliente')
+        self.assertEqual(recusa.exception.status_code, 429)
+
+
+class BuscaTests(TestCase):
+    def setUp(self):
+        area = Area.objects.create(nome='Dados')
+        self.titulo = Enquete.objects.create(titulo='Programação em Python', area=area, ativa=True)
+        self.pergunta = Enquete.objects.create(titulo='Ferramentas', area=area, ativa=True)
+        self.inativa = Enquete.objects.create(titulo='Python avançado', area=area, ativa=False)
+        Enquete.objects.create(titulo='Bancos de dados', area=area, ativa=True)
+        self.texto = Pergunta.objects.create(
+            enquete=self.pergunta, texto='Qual versão do Python você usa?', tipo=Pergunta.UNICA_ESCOLHA
+        )
+
+    def test_filtros_do_queryset_valem_antes_da_ordenacao(self):
+        encontradas = busca.filtrar_enquetes(Enquete.objects.filter(ativa=True), 'pyth')
+        # Título vale mais que o texto das perguntas; a inativa fica de fora
+        self.assertEqual(list(encontradas), [self.titulo, self.pergunta])
+        self.assertEqual(encontradas.count(), 2)
+        self.assertEqual(list(encontradas[1:]), [self.pergunta])
+
+    def test_perguntas_sem_acento(self):
+        self.assertEqual(list(busca.filtrar_perguntas(Pergunta.objects.all(), 'versao python')), [self.texto])
+        self.assertFalse(busca.filtrar_perguntas(Pergunta.objects.filter(enquete=self.titulo), 'python').exists())
+
+
+class RankingTests(EnqueteComRespostasMixin, TestCase):
+    def test_ranking_exige_autenticacao(self):
+        self.responder([(self.unica, self.opcoes_unica[:1])])
+        url = f'/api/enquetes/{self.enquete.pk}/ranking/'
+        cliente = APIClient()
+        self.assertEqual(cliente.get(url).status_code, 403)
+
+        cliente.force_authenticate(User.objects.create_user('bia', password='x'))
+        resposta = cliente.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(
+            resposta.json()['results'], [{'posicao': 1, 'aluno': self.aluno.pk, 'nome': 'Ana', 'pontos': 1}]
+        )
+
+
+# Sem collectstatic nos testes: o storage com manifesto não acharia os arquivos do admin
+@override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}})
+class MultiplaEscolhaRespostaAdminTests(EnqueteComRespostasMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.cliente = Client()
+        self.cliente.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+
+    def responder_alunos(self, inicio, fim):
+        django_, fastapi, flask = self.opcoes_multipla
+        for numero in range(inicio, fim):
+            aluno = Aluno.objects.create(nome=f'Aluno {numero}', email=f'aluno{numero}@example.com')
+            self.responder([(self.multipla, [flask, django_, fastapi][:numero % 3 + 1])], aluno=aluno)
+
+    def consultas_da_listagem(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.cliente.get('/admin/enquete/multiplaescolharesposta/')
+        self.assertEqual(resposta.status_code, 200)
+        return resposta, len(consultas)
+
+    def test_opcoes_da_pagina_em_uma_consulta(self):
+        self.responder_alunos(0, 3)
+        _, poucas_linhas = self.consultas_da_listagem()
+        self.responder_alunos(3, 9)
+        resposta, muitas_linhas = self.consultas_da_listagem()
+
+        self.assertEqual(muitas_linhas, poucas_linhas)
+        self.assertContains(resposta, 'django, fastapi, flask', count=3)
+        self.assertContains(resposta, 'django, flask', count=3)
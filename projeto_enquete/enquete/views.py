@@ -3,12 +3,18 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse, reverse_lazy
 from django.views import generic
 from django.forms import formset_factory
-from .models import Enquete, Pergunta, Opcao, Area, Resposta, MultiplaEscolhaResposta, Aluno
+from .models import Enquete, Pergunta, Opcao, Area, Aluno, Submissao
 from .forms import EnqueteForm, OpcaoForm, PerguntaForm, AreaForm, RespostaForm
+from .respostas import gravar_respostas
+from . import questionario, recomendacoes
+from .admissao import limitar_escritas
 from django.contrib import messages
 from django.db import IntegrityError, transaction
 #from django.contrib.auth.decorators import login_required
 
+# Recomendações exibidas no topo da lista de enquetes
+LIMITE_RECOMENDADAS_LISTA = 5
+
 def home(request):
     return render(request, 'enquete/home.html')
 
@@ -43,7 +49,12 @@ class AreaDeleteView(generic.DeleteView):
 
 def enquete_list(request):
     enquetes = Enquete.objects.all()
-    return render(request, 'enquete/enquete_list.html', {'enquetes': enquetes})
+    recomendadas = []
+    if request.user.is_authenticated:
+        aluno = Aluno.objects.filter(user=request.user).first()
+        if aluno is not None:
+            recomendadas = recomendacoes.enquetes_recomendadas(aluno, LIMITE_RECOMENDADAS_LISTA)
+    return render(request, 'enquete/enquete_list.html', {'enquetes': enquetes, 'recomendadas': recomendadas})
 
 def enquete_detail(request, pk):
     enquete = get_object_or_404(Enquete, pk=pk)
@@ -172,8 +183,12 @@ def opcao_delete(request, pk):
         return redirect('enquete:pergunta_detail', pk=pergunta_id)
     return render(request, 'enquete/confirm_delete.html', {'object': opcao})
 
+@limitar_escritas
 def responder_enquete(request, enquete_id):
     enquete = get_object_or_404(Enquete, pk=enquete_id)
+    if not enquete.aceita_respostas:
+        messages.error(request, f"A enquete '{enquete.titulo}' está encerrada e não aceita mais respostas.")
+        return redirect('enquete:enquete_detail', pk=enquete.id)
     perguntas = enquete.perguntas.filter(ativa=True).order_by('id') 
 
     forms_for_template = []
@@ -202,6 +217,7 @@ def responder_enquete(request, enquete_id):
                             messages.error(request, f"Erro ao tentar obter ou criar perfil de aluno: {e}. As respostas serão salvas sem vinculação a um aluno específico.")
                             aluno = None 
 
+                    respostas_validadas = []
                     for item in forms_for_template:
                         pergunta_atual = item['pergunta']
                         form_atual = item['form']
@@ -211,23 +227,18 @@ def responder_enquete(request, enquete_id):
                         if pergunta_atual.tipo == Pergunta.UNICA_ESCOLHA:
                             opcao_selecionada = form_atual.cleaned_data.get(campo_dinamico_nome)
                             if opcao_selecionada: 
-                                Resposta.objects.create(
-                                    pergunta=pergunta_atual,
-                                    opcao=opcao_selecionada,
-                                    aluno=aluno 
-                                )
+                                respostas_validadas.append((pergunta_atual, [opcao_selecionada]))
 
                         elif pergunta_atual.tipo == Pergunta.MULTIPLA_ESCOLHA:
                             opcoes_selecionadas = form_atual.cleaned_data.get(campo_dinamico_nome)
                             if opcoes_selecionadas: 
-                                multipla_resposta = MultiplaEscolhaResposta.objects.create(
-                                    pergunta=pergunta_atual,
-                                    aluno=aluno 
-                                )
-                                multipla_resposta.opcoes.set(opcoes_selecionadas) 
+                                respostas_validadas.append((pergunta_atual, list(opcoes_selecionadas)))
 
                         else:
                             messages.warning(request, f"Tipo de pergunta '{pergunta_atual.tipo}' desconhecido para: {pergunta_atual.texto}. Nenhuma resposta foi processada para esta pergunta.")
+
+                    # Uma submissão e um único upsert de respostas: reenviar a enquete substitui as anteriores
+                    gravar_respostas(aluno, enquete, respostas_validadas, Submissao.ORIGEM_WEB)
                 
                 messages.success(request, "Enquete respondida com sucesso! Obrigado pela sua participação.")
                 return redirect(reverse('enquete:processar_resposta', args=[enquete_id]))
@@ -242,14 +253,20 @@ def responder_enquete(request, enquete_id):
         if not all_forms_valid:
             messages.error(request, "Houve erros ao salvar suas respostas. Por favor, verifique os campos destacados e tente novamente.")
 
-    else: 
-        for pergunta in perguntas:
-            form = RespostaForm(pergunta=pergunta, prefix=f'pergunta_{pergunta.id}')
-            forms_for_template.append({'pergunta': pergunta, 'form': form})
+    # Os formulários só validam o POST; o HTML sai do renderizador do questionário
+    erros = {
+        questionario.nome_campo(item['pergunta'].id): [erro for lista in item['form'].errors.values() for erro in lista]
+        for item in forms_for_template if item['form'].errors
+    }
+    html = questionario.renderizar(
+        questionario.montar(enquete),
+        request.POST if request.method == 'POST' else None,
+        erros,
+    )
 
     context = {
         'enquete': enquete,
-        'perguntas_forms': forms_for_template, 
+        'questionario': html,
     }
     return render(request, 'enquete/responder_enquete.html', context)
 
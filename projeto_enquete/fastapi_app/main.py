@@ -1,7 +1,15 @@
 import os
 import sys
+import time
+import asyncio
+import logging
 from pathlib import Path
 from enum import Enum
+from contextlib import asynccontextmanager
+
+# Tempo de importação deste módulo (django.setup() incluso), exposto em app.state.inicializacao.
+# Perfil detalhado: python manage.py medir_inicializacao
+_inicio_importacao = time.perf_counter()
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, ".."))
@@ -13,37 +21,46 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'projeto_enquete.settings')
 import django
 django.setup()
 
-from fastapi import FastAPI, HTTPException, status, Query
+from fastapi import FastAPI, HTTPException, status, Query, Header, Depends, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Optional
 from pydantic import BaseModel, Field
-from enquete.models import Enquete, Pergunta, Opcao, Resposta, MultiplaEscolhaResposta, Aluno, Area # Import Area
+from enquete.models import Enquete, Pergunta, Opcao, Aluno, Area, Submissao # Import Area
+from django.conf import settings
 from django.db import transaction
-from asgiref.sync import sync_to_async
+from enquete import banco_async, busca, idempotencia, outbox, serializacao, tarefas
+from enquete.admissao import Rejeitada, obter_controlador
+from enquete.respostas import gravar_respostas
+
+logger = logging.getLogger(__name__)
+
+TEMPO_IMPORTACAO = time.perf_counter() - _inicio_importacao
 
 # Pydantic Data Models
+# Campos opcionais: com ?fields=/?expand= só o que foi pedido é devolvido (response_model_exclude_unset)
 class OpcaoBase(BaseModel):
-    id: int
-    texto: str
-    ativa: bool
-    ordem: int
-    peso: int
+    id: Optional[int] = None
+    texto: Optional[str] = None
+    ativa: Optional[bool] = None
+    ordem: Optional[int] = None
+    peso: Optional[int] = None
 
 class PerguntaBase(BaseModel):
-    id: int
-    texto: str
-    tipo: str
-    ativa: bool
+    id: Optional[int] = None
+    texto: Optional[str] = None
+    tipo: Optional[str] = None
+    ativa: Optional[bool] = None
     tecnologia_id: Optional[int] = None
-    opcoes: List[OpcaoBase] = []
+    opcoes: Optional[List[OpcaoBase]] = None
 
 class EnqueteBase(BaseModel):
-    id: int
-    titulo: str
-    descricao: str
-    ativa: bool
+    id: Optional[int] = None
+    titulo: Optional[str] = None
+    descricao: Optional[str] = None
+    ativa: Optional[bool] = None
     area_id: Optional[int] = None
-    perguntas: List[PerguntaBase] = []
+    perguntas: Optional[List[PerguntaBase]] = None
 
 class RespostaItem(BaseModel):
     pergunta_id: int
@@ -65,7 +82,48 @@ class TipoPergunta(str, Enum):
     multipla_escolha = "multipla_escolha"
     texto = "texto"
 
+async def aquecer():
+    """
+    Abre as conexões de todas as threads do executor do ORM e carrega no cache de leitura
+    as enquetes mais ativas (FASTAPI_PREAQUECER_ENQUETES), para que as primeiras
+    requisições do worker não paguem por isso.
+    """
+    inicio = time.perf_counter()
+    await asyncio.to_thread(banco_async.obter_executor().aquecer_conexoes)
+    conexoes = time.perf_counter() - inicio
+    preaquecidas = await banco_async.executar(
+        serializacao.preaquecer, getattr(settings, 'FASTAPI_PREAQUECER_ENQUETES', 50)
+    )
+    return {
+        'conexoes_ms': round(conexoes * 1000, 1),
+        'cache_ms': round((time.perf_counter() - inicio - conexoes) * 1000, 1),
+        'enquetes_em_cache': preaquecidas,
+    }
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    inicio = time.perf_counter()
+    # Agendador de expiração e consumidor do outbox. Antes do aquecimento: o que for para o
+    # cache a partir daqui já é invalidado pelos outros processos
+    await asyncio.to_thread(tarefas.iniciar)
+    try:
+        aquecimento = await aquecer()
+    except Exception:
+        # Sem aquecimento o worker continua funcional, só mais lento nas primeiras requisições
+        logger.exception("Falha no aquecimento do worker")
+        aquecimento = {}
+    app.state.inicializacao = {
+        'importacao_ms': round(TEMPO_IMPORTACAO * 1000, 1),
+        'lifespan_ms': round((time.perf_counter() - inicio) * 1000, 1),
+        **aquecimento,
+    }
+    logger.info("Worker pronto: %s", app.state.inicializacao)
+    yield
+    tarefas.parar()
+    await asyncio.to_thread(banco_async.encerrar_executor)
+
 app = FastAPI(
+    lifespan=lifespan,
     title="API de Enquetes",
     description="API para gerenciar enquetes, perguntas e respostas.",
     version="1.0.0",
@@ -79,111 +137,94 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(Rejeitada)
+async def recusar_sobrecarga(request: Request, exc: Rejeitada):
+    """Executor do ORM saturado (enquete/banco_async.py): recusa rápida em vez de acumular fila."""
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers={"Retry-After": str(exc.retry_after)})
+
+@app.get("/metricas/banco")
+async def metricas_banco():
+    """Uso do executor do ORM: conexões ocupadas, fila, recusas e tempo de espera por uma conexão."""
+    return banco_async.obter_executor().metricas()
+
+@app.get("/metricas/invalidacao")
+async def metricas_invalidacao():
+    """Consumidor do outbox de invalidação deste worker: último evento lido, atraso e eventos pendentes."""
+    return await banco_async.executar(outbox.metricas)
+
+def parametros_esparsos(
+    fields: Optional[str] = Query(None, description="Campos devolvidos, separados por vírgula (ex.: id,titulo)"),
+    expand: Optional[str] = Query(None, description="Relações aninhadas a incluir (ex.: perguntas,perguntas.opcoes)"),
+):
+    """
+    Dependência das leituras: mesma semântica do ?fields=/?expand= da API DRF. Sem nenhum
+    dos dois a resposta é a completa; relações não expandidas não são consultadas.
+    """
+    return serializacao.ler_esparso(fields, expand)
+
+def limitar_escritas(request: Request):
+    """
+    Dependência dos endpoints de escrita: limite global de escritas simultâneas
+    e balde de tokens por IP de origem, compartilhados com as views Django do processo.
+    """
+    controlador = obter_controlador()
+    cliente = f"ip:{request.client.host if request.client else ''}"
+    try:
+        controlador.entrar(cliente)
+    except Rejeitada as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    try:
+        yield
+    finally:
+        controlador.sair()
+
 @app.get("/")
 async def read_root():
     return {"message": "Bem-vindo à API de Enquetes!"}
 
+# Declarada antes de /enquetes/{enquete_id} para que "batch" não seja lido como id
+@app.get("/enquetes/batch")
+async def get_enquetes_batch(ids: str = Query(..., description="Ids separados por vírgula"), esparso=Depends(parametros_esparsos)):
+    """
+    Várias enquetes ativas em uma requisição, com as mesmas consultas de uma só.
+    Retorna {"resultados": {id: enquete ou null}, "nao_encontradas": [ids]}.
+    """
+    try:
+        enquete_ids = serializacao.ler_ids(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if esparso is None:
+        return serializacao.por_id(enquete_ids, await banco_async.executar(serializacao.enquetes_em_cache, enquete_ids))
+    enquetes = await banco_async.executar(
+        serializacao.montar_enquetes, Enquete.objects.filter(id__in=enquete_ids, ativa=True), esparso, manter_id=True
+    )
+    return serializacao.por_id(enquete_ids, {enquete['id']: enquete for enquete in enquetes})
+
 # 1 Endpoint com Path Parameter
-@app.get("/enquetes/{enquete_id}", response_model=EnqueteBase)
-async def get_enquete_by_id(enquete_id: int):
+@app.get("/enquetes/{enquete_id}", response_model=EnqueteBase, response_model_exclude_unset=True)
+async def get_enquete_by_id(enquete_id: int, esparso=Depends(parametros_esparsos)):
     """
     Retorna uma enquete específica pelo seu ID.
+    A representação completa vem do cache de leitura; ?fields=/?expand= consultam o banco.
     """
-    try:
-        enquete = await sync_to_async(Enquete.objects.get)(id=enquete_id, ativa=True)
-        
-        perguntas_data = []
-        perguntas_qs = await sync_to_async(enquete.perguntas.all.filter)(ativa=True)
-        for pergunta in await sync_to_async(list)(perguntas_qs):
-            opcoes_data = []
-            opcoes_qs = await sync_to_async(pergunta.opcao_set.filter)(ativa=True)
-            for opcao in await sync_to_async(list)(opcoes_qs.order_by('ordem')):
-                opcoes_data.append(
-                    OpcaoBase(
-                        id=opcao.id,
-                        texto=opcao.texto,
-                        ativa=opcao.ativa,
-                        ordem=opcao.ordem,
-                        peso=opcao.peso
-                    )
-                )
-            
-            # Safely access tecnologia.id
-            tecnologia_id = None
-            if await sync_to_async(hasattr)(pergunta, 'tecnologia'):
-                tecnologia = await sync_to_async(getattr)(pergunta, 'tecnologia', None)
-                if tecnologia:
-                    tecnologia_id = tecnologia.id
-
-            perguntas_data.append(
-                PerguntaBase(
-                    id=pergunta.id,
-                    texto=pergunta.texto,
-                    tipo=pergunta.tipo,
-                    ativa=pergunta.ativa,
-                    tecnologia_id=tecnologia_id,
-                    opcoes=opcoes_data
-                )
-            )
-        
-        # Safely access area.id
-        area_id = None
-        if await sync_to_async(hasattr)(enquete, 'area'):
-            area = await sync_to_async(getattr)(enquete, 'area', None)
-            if area:
-                area_id = area.id
-
-        return EnqueteBase(
-            id=enquete.id,
-            titulo=enquete.titulo,
-            descricao=enquete.descricao,
-            ativa=enquete.ativa,
-            area_id=area_id,
-            perguntas=perguntas_data
+    if esparso is None:
+        enquetes = list((await banco_async.executar(serializacao.enquetes_em_cache, [enquete_id])).values())
+    else:
+        enquetes = await banco_async.executar(
+            serializacao.montar_enquetes, Enquete.objects.filter(id=enquete_id, ativa=True), esparso
         )
-    except Enquete.DoesNotExist:
+    if not enquetes:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Enquete não encontrada ou inativa.")
+    return enquetes[0]
 
 # 1 Endpoint com Path Parameter com Enum
-@app.get("/perguntas/tipo/{tipo_pergunta}", response_model=List[PerguntaBase])
-async def get_perguntas_by_type(tipo_pergunta: TipoPergunta):
+@app.get("/perguntas/tipo/{tipo_pergunta}", response_model=List[PerguntaBase], response_model_exclude_unset=True)
+async def get_perguntas_by_type(tipo_pergunta: TipoPergunta, esparso=Depends(parametros_esparsos)):
     """
     Retorna perguntas filtradas por um tipo específico usando Enum.
     """
-    perguntas_qs = await sync_to_async(Pergunta.objects.filter)(tipo=tipo_pergunta.value, ativa=True)
-    perguntas_data = []
-    for pergunta in await sync_to_async(list)(perguntas_qs):
-        opcoes_data = []
-        opcoes_qs = await sync_to_async(pergunta.opcao_set.filter)(ativa=True)
-        for opcao in await sync_to_async(list)(opcoes_qs.order_by('ordem')):
-            opcoes_data.append(
-                OpcaoBase(
-                    id=opcao.id,
-                    texto=opcao.texto,
-                    ativa=opcao.ativa,
-                    ordem=opcao.ordem,
-                    peso=opcao.peso
-                )
-            )
-        
-        # Safely access tecnologia.id
-        tecnologia_id = None
-        if await sync_to_async(hasattr)(pergunta, 'tecnologia'):
-            tecnologia = await sync_to_async(getattr)(pergunta, 'tecnologia', None)
-            if tecnologia:
-                tecnologia_id = tecnologia.id
-
-        perguntas_data.append(
-            PerguntaBase(
-                id=pergunta.id,
-                texto=pergunta.texto,
-                tipo=pergunta.tipo,
-                ativa=pergunta.ativa,
-                tecnologia_id=tecnologia_id,
-                opcoes=opcoes_data
-            )
-        )
-    return perguntas_data
+    perguntas_qs = Pergunta.objects.filter(tipo=tipo_pergunta.value.upper(), ativa=True)
+    return await banco_async.executar(serializacao.montar_perguntas, perguntas_qs, esparso)
 
 # 1 Endpoint com Path Parameter com Path
 @app.get("/arquivos/{file_path:path}")
@@ -205,204 +246,152 @@ async def get_user_item(user_id: int, item_id: Optional[int] = None):
 
 # 2 Endpoint com Múltiplos Query Parameters
 @app.get("/enquetes/", response_model=dict) # Use dict for response_model as it's a custom structure
-async def get_enquetes(skip: int = 0, limit: int = 10, search: Optional[str] = Query(None, min_length=3)):
+async def get_enquetes(
+    skip: int = 0,
+    limit: int = 10,
+    search: Optional[str] = Query(None, min_length=3),
+    esparso=Depends(parametros_esparsos),
+):
     """
     Retorna uma lista de enquetes com paginação e busca.
+    A busca usa o índice textual (título, descrição e perguntas) e ordena por relevância.
     """
-    enquetes_qs = await sync_to_async(Enquete.objects.filter)(ativa=True)
+    enquetes_qs = Enquete.objects.filter(ativa=True)
     if search:
-        enquetes_qs = await sync_to_async(enquetes_qs.filter)(titulo__icontains=search)
-    
-    total_enquetes = await sync_to_async(enquetes_qs.count)()
-    
-    # Apply slicing within sync_to_async
-    enquetes_list = await sync_to_async(lambda qs, s, l: list(qs[s : s + l]))(enquetes_qs, skip, limit)
-
-    enquetes_data = []
-    for enquete in enquetes_list:
-        perguntas_data = []
-        perguntas_qs = await sync_to_async(lambda: enquete.perguntas.filter(ativa=True))()
-        for pergunta in await sync_to_async(list)(perguntas_qs):
-            opcoes_data = []
-            opcoes_qs = await sync_to_async(pergunta.opcao_set.filter)(ativa=True)
-            for opcao in await sync_to_async(list)(opcoes_qs.order_by('ordem')):
-                opcoes_data.append(
-                    OpcaoBase(
-                        id=opcao.id,
-                        texto=opcao.texto,
-                        ativa=opcao.ativa,
-                        ordem=opcao.ordem,
-                        peso=opcao.peso
-                    )
-                )
-            
-            # Safely access tecnologia.id
-            tecnologia_id = None
-            if await sync_to_async(hasattr)(pergunta, 'tecnologia'):
-                tecnologia = await sync_to_async(getattr)(pergunta, 'tecnologia', None)
-                if tecnologia:
-                    tecnologia_id = tecnologia.id
-
-            perguntas_data.append(
-                PerguntaBase(
-                    id=pergunta.id,
-                    texto=pergunta.texto,
-                    tipo=pergunta.tipo,
-                    ativa=pergunta.ativa,
-                    tecnologia_id=tecnologia_id,
-                    opcoes=opcoes_data
-                )
-            )
-        
-        # Safely access area.id
-        area_id = None
-        if await sync_to_async(hasattr)(enquete, 'area'):
-            area = await sync_to_async(getattr)(enquete, 'area', None)
-            if area:
-                area_id = area.id
-
-        enquetes_data.append(
-            EnqueteBase(
-                id=enquete.id,
-                titulo=enquete.titulo,
-                descricao=enquete.descricao,
-                ativa=enquete.ativa,
-                area_id=area_id,
-                perguntas=perguntas_data
-            )
-        )
+        enquetes_qs = await banco_async.executar(busca.filtrar_enquetes, enquetes_qs, search)
+
+    total_enquetes = await banco_async.executar(enquetes_qs.count)
+    enquetes_data = await banco_async.executar(serializacao.montar_enquetes, enquetes_qs[skip:skip + limit], esparso)
     return {"total": total_enquetes, "skip": skip, "limit": limit, "data": enquetes_data}
 
 # Outro Endpoint com Múltiplos Query Parameters
-@app.get("/perguntas/", response_model=List[PerguntaBase])
-async def get_perguntas(ativa: Optional[bool] = None, tecnologia_id: Optional[int] = None):
+@app.get("/perguntas/", response_model=List[PerguntaBase], response_model_exclude_unset=True)
+async def get_perguntas(
+    ativa: Optional[bool] = None,
+    tecnologia_id: Optional[int] = None,
+    esparso=Depends(parametros_esparsos),
+):
     """
     Retorna uma lista de perguntas, filtrando por status de ativação e/ou tecnologia.
     """
-    perguntas_qs = await sync_to_async(Pergunta.objects.all)()
+    perguntas_qs = Pergunta.objects.all()
 
     if ativa is not None:
-        perguntas_qs = await sync_to_async(perguntas_qs.filter)(ativa=ativa)
-    
+        perguntas_qs = perguntas_qs.filter(ativa=ativa)
+
     if tecnologia_id is not None:
-        perguntas_qs = await sync_to_async(perguntas_qs.filter)(tecnologia__id=tecnologia_id)
-    
-    perguntas_data = []
-    for pergunta in await sync_to_async(list)(perguntas_qs):
-        opcoes_data = []
-        opcoes_qs = await sync_to_async(pergunta.opcao_set.all)()
-        for opcao in await sync_to_async(list)(opcoes_qs.order_by('ordem')):
-            opcoes_data.append(
-                OpcaoBase(
-                    id=opcao.id,
-                    texto=opcao.texto,
-                    ativa=opcao.ativa,
-                    ordem=opcao.ordem,
-                    peso=opcao.peso
-                )
-            )
-        
-        # Safely access tecnologia.id
-        tecnologia_id_val = None
-        if await sync_to_async(hasattr)(pergunta, 'tecnologia'):
-            tecnologia = await sync_to_async(getattr)(pergunta, 'tecnologia', None)
-            if tecnologia:
-                tecnologia_id_val = tecnologia.id
-
-        perguntas_data.append(
-            PerguntaBase(
-                id=pergunta.id,
-                texto=pergunta.texto,
-                tipo=pergunta.tipo,
-                ativa=pergunta.ativa,
-                tecnologia_id=tecnologia_id_val,
-                opcoes=opcoes_data
-            )
-        )
-    return perguntas_data
+        perguntas_qs = perguntas_qs.filter(tecnologia__id=tecnologia_id)
+
+    return await banco_async.executar(serializacao.montar_perguntas, perguntas_qs, esparso, somente_opcoes_ativas=False)
 
 # 2 Endpoint que recebem Body e validam com os Data Models (Pydantic)
-@app.post("/areas/")
+@app.post("/areas/", dependencies=[Depends(limitar_escritas)])
 async def create_area(area: NewArea):
     """
     Cria uma nova área de programação.
     """
     try:
-        await sync_to_async(Area.objects.create)(nome=area.nome, descricao=area.descricao)
+        await banco_async.executar(Area.objects.create, nome=area.nome, descricao=area.descricao)
         return {"message": f"Área '{area.nome}' criada com sucesso!", "data": area.dict()}
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@app.put("/enquetes/{enquete_id}/descricao")
+@app.put("/enquetes/{enquete_id}/descricao", dependencies=[Depends(limitar_escritas)])
 async def update_enquete_description(enquete_id: int, update_data: UpdateDescription):
     """
     Atualiza a descrição de uma enquete existente.
     """
     try:
-        enquete = await sync_to_async(Enquete.objects.get)(id=enquete_id)
+        enquete = await banco_async.executar(Enquete.objects.get, id=enquete_id)
         enquete.descricao = update_data.descricao
-        await sync_to_async(enquete.save)() # Descomente para salvar no banco de dados
+        await banco_async.executar(enquete.save) # Descomente para salvar no banco de dados
         return {"message": f"Descrição da enquete {enquete_id} atualizada com sucesso para '{update_data.descricao}'"}
     except Enquete.DoesNotExist:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Enquete não encontrada.")
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@app.post("/enquetes/{enquete_id}/responder")
-async def responder_enquete(enquete_id: int, payload: RespostaEnquetePayload):
+def processar_respostas(enquete, aluno, respostas):
+    """
+    Valida todas as respostas e só então grava. Retorna (status_code, corpo).
+    Deve ser chamada dentro de transaction.atomic().
+    """
+    # Conferido só em novas execuções: uma nova tentativa com a mesma Idempotency-Key
+    # recebe o resultado original mesmo depois de a enquete encerrar
+    if not enquete.aceita_respostas:
+        return status.HTTP_403_FORBIDDEN, {"detail": "Enquete encerrada: não aceita mais respostas."}
+    respostas_validadas = []
+    for resposta_item in respostas:
+        pergunta_id = resposta_item.pergunta_id
+        opcoes_selecionadas_ids = resposta_item.opcoes_ids
+
+        try:
+            pergunta = Pergunta.objects.get(id=pergunta_id, enquete=enquete)
+        except Pergunta.DoesNotExist:
+            return status.HTTP_400_BAD_REQUEST, {"detail": f"Pergunta {pergunta_id} não encontrada para a enquete {enquete.id}."}
+
+        if pergunta.tipo == Pergunta.UNICA_ESCOLHA:
+            if not isinstance(opcoes_selecionadas_ids, int):
+                return status.HTTP_400_BAD_REQUEST, {"detail": f"Resposta inválida para pergunta de única escolha ({pergunta.id}): 'opcoes_ids' deve ser um inteiro."}
+            try:
+                opcao = Opcao.objects.get(id=opcoes_selecionadas_ids, pergunta=pergunta, ativa=True)
+            except Opcao.DoesNotExist:
+                return status.HTTP_400_BAD_REQUEST, {"detail": f"Opção {opcoes_selecionadas_ids} inválida ou inativa para a pergunta {pergunta.id}."}
+            respostas_validadas.append((pergunta, [opcao]))
+
+        elif pergunta.tipo == Pergunta.MULTIPLA_ESCOLHA:
+            if not isinstance(opcoes_selecionadas_ids, list) or not all(isinstance(i, int) for i in opcoes_selecionadas_ids):
+                return status.HTTP_400_BAD_REQUEST, {"detail": f"Resposta inválida para pergunta de múltipla escolha ({pergunta.id}): 'opcoes_ids' deve ser uma lista de inteiros."}
+
+            opcoes = list(Opcao.objects.filter(id__in=opcoes_selecionadas_ids, pergunta=pergunta, ativa=True))
+            if len(opcoes) != len(opcoes_selecionadas_ids):
+                return status.HTTP_400_BAD_REQUEST, {"detail": f"Uma ou mais opções selecionadas para a pergunta {pergunta.id} são inválidas ou inativas."}
+            respostas_validadas.append((pergunta, opcoes))
+        else:
+            return status.HTTP_400_BAD_REQUEST, {"detail": f"Tipo de pergunta desconhecido: {pergunta.tipo}"}
+
+    # Respostas anteriores do aluno são substituídas por upsert
+    submissao = gravar_respostas(aluno, enquete, respostas_validadas, Submissao.ORIGEM_FASTAPI)
+
+    return status.HTTP_200_OK, {"message": "Respostas da enquete registradas com sucesso!", "submissao_id": submissao.id}
+
+@app.post("/enquetes/{enquete_id}/responder", dependencies=[Depends(limitar_escritas)])
+async def responder_enquete(
+    enquete_id: int,
+    payload: RespostaEnquetePayload,
+    idempotency_key: Optional[str] = Header(None, alias=idempotencia.HEADER),
+):
     """
     Recebe as respostas de uma enquete e as processa.
+    Com o cabeçalho Idempotency-Key, novas tentativas devolvem o resultado original.
     """
     try:
-        enquete = await sync_to_async(Enquete.objects.get)(id=enquete_id)
+        enquete = await banco_async.executar(Enquete.objects.get, id=enquete_id)
     except Enquete.DoesNotExist:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Enquete não encontrada.")
 
-    aluno_fastapi = await sync_to_async(Aluno.objects.first)()
+    aluno_fastapi = await banco_async.executar(Aluno.objects.first)
     if not aluno_fastapi:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nenhum aluno cadastrado para registrar respostas.")
 
-    async def process_responses_sync():
-        with transaction.atomic():
-            for resposta_item in payload.respostas:
-                pergunta_id = resposta_item.pergunta_id
-                opcoes_selecionadas_ids = resposta_item.opcoes_ids
-
-                try:
-                    pergunta = await sync_to_async(Pergunta.objects.get)(id=pergunta_id, enquete=enquete)
-                except Pergunta.DoesNotExist:
-                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Pergunta {pergunta_id} não encontrada para a enquete {enquete_id}.")
-
-                if await sync_to_async(Resposta.objects.filter(aluno=aluno_fastapi, pergunta=pergunta).exists)() or \
-                   await sync_to_async(MultiplaEscolhaResposta.objects.filter(aluno=aluno_fastapi, pergunta=pergunta).exists)():
-                    if pergunta.tipo == Pergunta.UNICA_ESCOLHA:
-                        await sync_to_async(Resposta.objects.filter(aluno=aluno_fastapi, pergunta=pergunta).delete)()
-                    elif pergunta.tipo == Pergunta.MULTIPLA_ESCOLHA:
-                        await sync_to_async(MultiplaEscolhaResposta.objects.filter(aluno=aluno_fastapi, pergunta=pergunta).delete)()
-
-                if pergunta.tipo == Pergunta.UNICA_ESCOLHA:
-                    if not isinstance(opcoes_selecionadas_ids, int):
-                        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Resposta inválida para pergunta de única escolha ({pergunta.id}): 'opcoes_ids' deve ser um inteiro.")
-                    try:
-                        opcao = await sync_to_async(Opcao.objects.get)(id=opcoes_selecionadas_ids, pergunta=pergunta, ativa=True)
-                    except Opcao.DoesNotExist:
-                        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Opção {opcoes_selecionadas_ids} inválida ou inativa para a pergunta {pergunta.id}.")
-
-                    await sync_to_async(Resposta.objects.create)(aluno=aluno_fastapi, pergunta=pergunta, opcao=opcao)
-
-                elif pergunta.tipo == Pergunta.MULTIPLA_ESCOLHA:
-                    if not isinstance(opcoes_selecionadas_ids, list) or not all(isinstance(i, int) for i in opcoes_selecionadas_ids):
-                        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Resposta inválida para pergunta de múltipla escolha ({pergunta.id}): 'opcoes_ids' deve ser uma lista de inteiros.")
-
-                    opcoes = await sync_to_async(Opcao.objects.filter)(id__in=opcoes_selecionadas_ids, pergunta=pergunta, ativa=True)
-                    if await sync_to_async(len)(opcoes) != len(opcoes_selecionadas_ids):
-                        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Uma ou mais opções selecionadas para a pergunta {pergunta.id} são inválidas ou inativas.")
-
-                    multipla_resposta = await sync_to_async(MultiplaEscolhaResposta.objects.create)(aluno=aluno_fastapi, pergunta=pergunta)
-                    await sync_to_async(multipla_resposta.opcoes.set)(opcoes)
-                else:
-                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Tipo de pergunta desconhecido: {pergunta.tipo}")
-    
-    await process_responses_sync()
-
-    return {"message": "Respostas da enquete registradas com sucesso!"}
\ No newline at end of file
+    def process_responses_sync():
+        if not idempotency_key:
+            with transaction.atomic():
+                return processar_respostas(enquete, aluno_fastapi, payload.respostas) + (False,)
+        escopo = f"fastapi:responder:{enquete.id}:{aluno_fastapi.id}"
+        return idempotencia.executar(
+            escopo, idempotency_key, payload.model_dump(),
+            lambda: processar_respostas(enquete, aluno_fastapi, payload.respostas),
+        )
+
+    try:
+        if idempotency_key:
+            idempotencia.validar_chave(idempotency_key)
+        status_code, corpo, reexecutado = await banco_async.executar(process_responses_sync)
+    except idempotencia.ChaveInvalida as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except idempotencia.ConflitoIdempotencia as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    headers = {idempotencia.HEADER_REEXECUCAO: "true"} if reexecutado else None
+    return JSONResponse(status_code=status_code, content=corpo, headers=headers)
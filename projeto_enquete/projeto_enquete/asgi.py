@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'projeto_enquete.settings')
 
 application = get_asgi_application()
+
+# Agendador de expiração e consumidor do outbox sobem com a primeira requisição
+from enquete import tarefas
+tarefas.iniciar_no_primeiro_request()
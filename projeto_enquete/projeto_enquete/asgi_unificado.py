@@ -0,0 +1,42 @@
+"""
+ASGI unificado: Django e a API FastAPI no mesmo processo.
+
+A API FastAPI fica montada em FASTAPI_PREFIXO (padrão /fastapi) e todo o resto vai para o
+Django (site, admin e API DRF). Em relação a rodar `projeto_enquete.asgi` e
+`fastapi_app.main` em servidores separados, cada worker carrega settings e modelos uma
+vez só e as duas aplicações compartilham o cache local: uma alteração feita pelo Django
+invalida imediatamente o cache de leitura usado pela FastAPI. As conexões com o banco não
+são compartilhadas: as views do Django usam a thread do sync_to_async e a FastAPI o pool
+limitado de banco_async.ExecutorBanco (até MAX_CONEXOES conexões por worker).
+
+O lifespan é o da FastAPI (tarefas em segundo plano e aquecimento do cache); o Django não
+trata eventos de lifespan. Uso:
+
+    uvicorn projeto_enquete.asgi_unificado:application --workers 4
+
+Comparação com os dois servidores separados: python manage.py benchmark_asgi
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'projeto_enquete.settings')
+
+django_application = get_asgi_application()
+
+from django.conf import settings
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from fastapi_app.main import app as fastapi_application
+
+PREFIXO = getattr(settings, 'FASTAPI_PREFIXO', '/fastapi')
+
+application = Starlette(
+    routes=[
+        Mount(PREFIXO, app=fastapi_application),
+        Mount('', app=django_application),
+    ],
+    lifespan=fastapi_application.router.lifespan_context,
+)
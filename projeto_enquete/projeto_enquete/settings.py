@@ -68,6 +68,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Conexões reaproveitadas entre requisições, testadas antes do reuso
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -108,6 +111,21 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Destino do collectstatic; gere com `python manage.py preparar_estaticos` (ver enquete/estaticos.py)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'enquete.estaticos.EstaticosOtimizados',
+    },
+}
+
+# Largura máxima (px) das imagens otimizadas no build dos estáticos
+ESTATICOS_LARGURA_MAXIMA = 1920
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -123,3 +141,46 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
+
+# Tempo de retenção dos resultados associados ao cabeçalho Idempotency-Key
+IDEMPOTENCIA_TTL_SEGUNDOS = 60 * 60 * 24
+
+# Controle de admissão dos endpoints de escrita (ver enquete/admissao.py).
+# Os limites valem por processo.
+ADMISSAO = {
+    'MAX_ESCRITAS_SIMULTANEAS': 4,
+    'ESPERA_MAXIMA': 0.05,
+    'TAXA_POR_CLIENTE': 0.5,
+    'RAJADA_POR_CLIENTE': 5,
+}
+
+# Intervalo do agendador que desativa enquetes expiradas (0 desativa o agendador;
+# nesse caso use o comando `expirar_enquetes` via cron)
+EXPIRACAO_INTERVALO_SEGUNDOS = 60
+
+# Diretório dos arquivos colunares com as respostas de enquetes encerradas
+# (comando `arquivar_respostas`, ver enquete/arquivamento.py)
+ARQUIVO_RESPOSTAS_DIR = BASE_DIR / 'arquivo_respostas'
+
+# Enquetes carregadas no cache de leitura quando um worker FastAPI inicia (0 desativa)
+FASTAPI_PREAQUECER_ENQUETES = 50
+
+# Prefixo da API FastAPI no ASGI unificado (projeto_enquete/asgi_unificado.py)
+FASTAPI_PREFIXO = '/fastapi'
+
+# Executor do ORM da API FastAPI (ver enquete/banco_async.py). MAX_CONEXOES limita as
+# conexões abertas por processo: ajuste ao que o banco suporta dividido pelos workers.
+BANCO_ASYNC = {
+    'MAX_CONEXOES': 8,
+    'FILA_MAXIMA': 64,
+    'ESPERA_MAXIMA': 2.0,
+}
+
+# Outbox de invalidação do cache entre processos (ver enquete/outbox.py). Cada processo lê
+# os eventos a cada INTERVALO segundos (0 desativa); RETENCAO_HORAS define quando são apagados
+OUTBOX_INVALIDACAO = {
+    'INTERVALO': 1.0,
+    'LOTE': 500,
+    'ESPERA_LACUNA': 30,
+    'RETENCAO_HORAS': 24,
+}
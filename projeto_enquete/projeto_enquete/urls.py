@@ -1,10 +1,13 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
-from enquete import views
+from django.urls import path, include, re_path
+from enquete import estaticos, views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('enquete.urls')),
     path('api/', include('enquete.api.urls')),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
+    # Estáticos coletados (STATIC_ROOT), com variantes comprimidas e cache imutável
+    re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<caminho>.+)$', estaticos.servir),
 ]
\ No newline at end of file